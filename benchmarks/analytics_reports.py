@@ -0,0 +1,163 @@
+"""Benchmark the vectorized multi-period reports against plain Python.
+
+Seeds a fresh database with a multi-year expense history for one user, then
+times loading it into NumPy columns and computing each report in
+src/utils/expense_columns.py (rolling average, month-over-month,
+category x month pivot, per-category percentiles). The same reports are
+computed row by row in Python from the same rows, and both results are
+checked to agree.
+
+Usage:
+    python benchmarks/analytics_reports.py [--rows 200000] [--years 5] [--repeat 3] [--json out.json]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+CATEGORIES = ['Food & Dining', 'Transportation', 'Shopping', 'Entertainment', 'Bills & Utilities',
+              'Healthcare', 'Travel', 'Education', 'Other']
+WINDOW = 30
+PERCENTILES = [50, 90, 99]
+
+
+def make_rows(count, years, seed=7):
+    rng = random.Random(seed)
+    first = date(2024 - years + 1, 1, 1)
+    span = (date(2024, 12, 31) - first).days
+    return [
+        {'amount': round(rng.lognormvariate(3, 1), 2), 'category': rng.choice(CATEGORIES), 'payment_method': 'Card',
+         'date': (first + timedelta(days=rng.randint(0, span))).isoformat()}
+        for _ in range(count)
+    ]
+
+
+def python_reports(rows):
+    """The same reports computed one row at a time, in cents"""
+    daily = {}
+    monthly = {}
+    cells = {}
+    by_category = {}
+    for day, amount, category in rows:
+        daily[day] = daily.get(day, 0) + amount
+        month = day[:7]
+        monthly[month] = monthly.get(month, 0) + amount
+        cells[(category, month)] = cells.get((category, month), 0) + amount
+        by_category.setdefault(category, []).append(amount)
+
+    first, last = date.fromisoformat(min(daily)), date.fromisoformat(max(daily))
+    rolling = []
+    day = first
+    while day <= last:
+        window = [daily.get((day - timedelta(days=k)).isoformat(), 0) for k in range(WINDOW)]
+        rolling.append(sum(window) / WINDOW)
+        day += timedelta(days=1)
+
+    months = sorted(monthly)
+    changes = [monthly[b] - monthly[a] for a, b in zip(months, months[1:])]
+
+    percentiles = {}
+    for category, amounts in by_category.items():
+        amounts.sort()
+        values = []
+        for q in PERCENTILES:
+            position = (len(amounts) - 1) * q / 100
+            below = int(position)
+            above = min(below + 1, len(amounts) - 1)
+            values.append(amounts[below] + (amounts[above] - amounts[below]) * (position - below))
+        percentiles[category] = values
+    return rolling, changes, cells, percentiles
+
+
+def timed(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--years', type=int, default=5)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--json', help='also write the report to this file')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='reports-')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'reports.db')}"
+    os.environ['RECEIPT_STORE_DIR'] = os.path.join(workdir, 'receipts')
+    from sqlalchemy import select
+    from src.main import create_app
+    from src.models.expense import Expense
+    from src.models.migrations import run_migrations
+    from src.models.user import db
+    from src.utils import expense_columns as ec
+
+    app = create_app()
+    with app.app_context():
+        run_migrations()
+    body = '\n'.join(json.dumps(row) for row in make_rows(args.rows, args.years))
+    app.test_client().post('/api/expenses/import', data=body, content_type='application/x-ndjson')
+
+    report = {'rows': args.rows, 'years': args.years, 'timings_ms': {}}
+    with app.app_context():
+        def load():
+            ec._cache.clear()
+            return ec.load_columns(db.session, 1)
+
+        columns, load_s = timed(load, args.repeat)
+        rows, fetch_s = timed(lambda: [
+            (day.isoformat(), amount, category) for day, amount, category in
+            db.session.execute(select(Expense.date, Expense.amount_cents, Expense.category).where(Expense.user_id == 1))
+        ], args.repeat)
+
+        vectorized, numpy_s = timed(lambda: (
+            ec.rolling_average(columns, WINDOW),
+            ec.month_over_month(columns),
+            ec.category_month_pivot(columns),
+            ec.category_percentiles(columns, PERCENTILES),
+        ), args.repeat)
+        python, python_s = timed(lambda: python_reports(rows), args.repeat)
+
+    rolling, months, pivot, percentiles = vectorized
+    py_rolling, py_changes, py_cells, py_percentiles = python
+    agree = (
+        all(abs(a['rolling_average'] * 100 - b) < 0.51 for a, b in zip(rolling, py_rolling))
+        and all(round(a['change'] * 100) == b for a, b in zip(months[1:], py_changes))
+        and all(round(total * 100) == py_cells.get((row['category'], period), 0)
+                for row in pivot['rows'] for period, total in zip(pivot['periods'], row['totals']))
+        and all(abs(v * 100 - w) < 0.51 for entry in percentiles
+                for v, w in zip(entry['percentiles'].values(), py_percentiles[entry['category']]))
+    )
+
+    report['timings_ms'] = {
+        'load_columns': round(load_s * 1000, 1),
+        'fetch_rows': round(fetch_s * 1000, 1),
+        'reports_numpy': round(numpy_s * 1000, 1),
+        'reports_python': round(python_s * 1000, 1),
+    }
+    report['speedup'] = round((fetch_s + python_s) / (load_s + numpy_s), 1)
+    report['agree'] = agree
+    print(f"{args.rows} expenses over {args.years} years")
+    print(f"  numpy:  load {report['timings_ms']['load_columns']} ms + reports {report['timings_ms']['reports_numpy']} ms")
+    print(f"  python: fetch {report['timings_ms']['fetch_rows']} ms + reports {report['timings_ms']['reports_python']} ms")
+    print(f"  speedup {report['speedup']}x, results agree: {agree}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
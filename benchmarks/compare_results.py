@@ -0,0 +1,59 @@
+"""Compare two load-test reports and fail on performance regressions.
+
+Reads result files written by benchmarks/load_test.py --json and checks
+every scenario present in both: throughput may not drop, and p95 latency
+may not rise, by more than --max-regression (a fraction, 0.2 = 20%). A
+scenario that had no errors in the baseline must not have any now. Exits 1
+if anything regressed, so CI can keep a baseline file and run:
+    python benchmarks/compare_results.py baseline.json current.json
+
+Usage:
+    python benchmarks/compare_results.py BASELINE CURRENT [--max-regression 0.2]
+"""
+import argparse
+import json
+import sys
+
+
+def compare(baseline, current, max_regression=0.2):
+    """Return (scenario, metric, baseline value, current value) for every regression"""
+    regressions = []
+    for name, before in baseline.get('scenarios', {}).items():
+        after = current.get('scenarios', {}).get(name)
+        if after is None:
+            continue
+        if before['req_per_s'] and after['req_per_s'] < before['req_per_s'] * (1 - max_regression):
+            regressions.append((name, 'req_per_s', before['req_per_s'], after['req_per_s']))
+        if before['p95_ms'] and after['p95_ms'] and after['p95_ms'] > before['p95_ms'] * (1 + max_regression):
+            regressions.append((name, 'p95_ms', before['p95_ms'], after['p95_ms']))
+        if not before['errors'] and after['errors']:
+            regressions.append((name, 'errors', before['errors'], after['errors']))
+    return regressions
+
+
+def print_regressions(regressions, max_regression):
+    if not regressions:
+        print(f'No regressions beyond {max_regression:.0%}')
+        return
+    for name, metric, before, after in regressions:
+        print(f'REGRESSION {name} {metric}: {before} -> {after}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('baseline')
+    parser.add_argument('current')
+    parser.add_argument('--max-regression', type=float, default=0.2)
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    regressions = compare(baseline, current, args.max_regression)
+    print_regressions(regressions, args.max_regression)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
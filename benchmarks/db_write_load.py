@@ -0,0 +1,167 @@
+"""Load-test concurrent expense writes against SQLite, untuned vs tuned.
+
+Starts several worker processes, like gunicorn workers, each with its own
+app and engine on a fresh, seeded database file. They all create expenses
+through POST /api/expenses at the same time, reading a page of the list
+after every write, while reader processes keep streaming full exports.
+Runs once with SQLITE_TUNING=0 (SQLite defaults: rollback journal,
+synchronous=FULL, 5 s lock timeout) and once with the WAL/PRAGMA tuning from
+src/models/engine.py, then reports writes per second, latency and failed
+requests such as "database is locked".
+
+Usage:
+    python benchmarks/db_write_load.py [--workers 4] [--writes 100] [--readers 2] [--seed 10000] [--json out.json]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+MODES = {
+    'untuned': {'SQLITE_TUNING': '0'},
+    'tuned': {'SQLITE_TUNING': '1'},
+}
+
+
+def _configure(workdir, mode):
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'load.db')}"
+    os.environ['RECEIPT_STORE_DIR'] = os.path.join(workdir, 'receipts')
+    os.environ.update(MODES[mode])
+
+
+def prepare(workdir, mode, seed):
+    """Create the schema once, so workers do not race on CREATE TABLE, and load seed rows"""
+    _configure(workdir, mode)
+    from src.main import app
+    from src.models.migrations import run_migrations
+
+    with app.app_context():
+        run_migrations()
+    rows = '\n'.join(
+        json.dumps({'amount': 5 + i % 100, 'category': 'Seed', 'payment_method': 'Cash',
+                    'date': f'2023-{i % 12 + 1:02d}-{i % 28 + 1:02d}'})
+        for i in range(seed)
+    )
+    app.test_client().post('/api/expenses/import', data=rows, content_type='application/x-ndjson')
+
+
+def reader(workdir, mode, barrier, stop):
+    """Stream full exports in a loop, holding long read transactions like a report or backup would"""
+    _configure(workdir, mode)
+    from src.main import app
+
+    client = app.test_client()
+    barrier.wait()
+    while not stop.is_set():
+        response = client.get('/api/expenses/export?format=ndjson')
+        for _ in response.response:
+            if stop.is_set():
+                break
+        response.close()
+
+
+def worker(workdir, mode, writes, barrier, results):
+    _configure(workdir, mode)
+    from src.main import app
+
+    app.logger.disabled = True  # failed requests are counted below, not logged
+    client = app.test_client()
+    latencies = []
+    errors = {}
+    barrier.wait()
+    for i in range(writes):
+        start = time.perf_counter()
+        try:
+            response = client.post('/api/expenses', json={
+                'amount': 10 + i % 50, 'category': ('Food', 'Travel', 'Bills')[i % 3],
+                'payment_method': 'Card', 'date': f'2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}'
+            })
+            status = response.status_code
+        except Exception as e:
+            status = type(e).__name__
+        latencies.append(time.perf_counter() - start)
+        if status != 201:
+            errors[str(status)] = errors.get(str(status), 0) + 1
+        client.get('/api/expenses?limit=20')
+    results.put({'latencies': latencies, 'errors': errors, 'finished': time.perf_counter()})
+
+
+def run_mode(mode, workers, writes, readers, seed):
+    workdir = tempfile.mkdtemp(prefix=f'load-{mode}-')
+    context = multiprocessing.get_context('spawn')
+    try:
+        setup = context.Process(target=prepare, args=(workdir, mode, seed))
+        setup.start()
+        setup.join()
+
+        barrier = context.Barrier(workers + readers + 1)
+        results = context.Queue()
+        stop = context.Event()
+        writer_processes = [
+            context.Process(target=worker, args=(workdir, mode, writes, barrier, results))
+            for _ in range(workers)
+        ]
+        reader_processes = [
+            context.Process(target=reader, args=(workdir, mode, barrier, stop))
+            for _ in range(readers)
+        ]
+        for process in writer_processes + reader_processes:
+            process.start()
+        barrier.wait()
+        start = time.perf_counter()
+        outcomes = [results.get() for _ in writer_processes]
+        stop.set()
+        for process in writer_processes + reader_processes:
+            process.join()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    elapsed = max(outcome['finished'] for outcome in outcomes) - start
+    latencies = sorted(latency for outcome in outcomes for latency in outcome['latencies'])
+    errors = {}
+    for outcome in outcomes:
+        for status, count in outcome['errors'].items():
+            errors[status] = errors.get(status, 0) + count
+    succeeded = len(latencies) - sum(errors.values())
+    return {
+        'writes_per_s': round(succeeded / elapsed, 1),
+        'succeeded': succeeded,
+        'failed': errors,
+        'p50_ms': round(latencies[len(latencies) // 2] * 1000, 1),
+        'p99_ms': round(latencies[int(len(latencies) * 0.99)] * 1000, 1),
+        'elapsed_s': round(elapsed, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--writes', type=int, default=100, help='expenses created per worker')
+    parser.add_argument('--readers', type=int, default=2, help='processes streaming full exports meanwhile')
+    parser.add_argument('--seed', type=int, default=10000, help='rows loaded before the test')
+    parser.add_argument('--modes', default='untuned,tuned')
+    parser.add_argument('--json', help='also write the report to this file')
+    args = parser.parse_args()
+
+    report = {'workers': args.workers, 'writes_per_worker': args.writes, 'readers': args.readers,
+              'seed_rows': args.seed, 'modes': {}}
+    for mode in args.modes.split(','):
+        result = run_mode(mode, args.workers, args.writes, args.readers, args.seed)
+        report['modes'][mode] = result
+        print(f"{mode:>8}: {result['writes_per_s']} writes/s, p50 {result['p50_ms']} ms, p99 {result['p99_ms']} ms, "
+              f"failed {result['failed'] or 'none'} ({result['elapsed_s']} s)")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
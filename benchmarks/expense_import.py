@@ -0,0 +1,142 @@
+"""Benchmark POST /api/expenses/import throughput.
+
+Builds a seeded NDJSON and CSV body of --rows expenses and imports each into
+a fresh database:
+    client      in process through Flask's test client (parsing, validation
+                and SQLite inserts, no HTTP)
+    gunicorn    over HTTP to gunicorn's gthread worker (gunicorn.conf.py),
+                which hands the view a bare wsgi.input
+Reports rows per second for each, checks every row was imported and the
+rollups still verify, and flags results under the --target rate.
+
+Usage:
+    python benchmarks/expense_import.py [--rows 200000] [--modes client,gunicorn] [--target 50000] [--json out.json]
+"""
+import argparse
+import csv
+import http.client
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+from http_serving import free_port, start_server
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+CATEGORIES = ['Food & Dining', 'Transportation', 'Shopping', 'Entertainment', 'Bills & Utilities',
+              'Healthcare', 'Travel', 'Education', 'Other']
+CONTENT_TYPES = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+
+
+def make_rows(count, seed=11):
+    rng = random.Random(seed)
+    return [
+        {'amount': f'{rng.lognormvariate(3, 1):.2f}', 'category': rng.choice(CATEGORIES),
+         'payment_method': rng.choice(['Card', 'Cash', 'Bank Transfer']), 'description': f'Expense {i}',
+         'date': f'{rng.randint(2020, 2024)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}'}
+        for i in range(count)
+    ]
+
+
+def make_body(rows, import_format):
+    if import_format == 'ndjson':
+        return ''.join(json.dumps(row) + '\n' for row in rows).encode()
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=list(rows[0]))
+    writer.writeheader()
+    writer.writerows(rows)
+    return out.getvalue().encode()
+
+
+def import_client(workdir, body, import_format):
+    from src.main import create_app
+    from src.models.migrations import run_migrations
+    from src.models.rollup import verify_rollups
+    from src.models.user import db
+
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(workdir, 'import.db')}",
+        'RECEIPT_STORE_DIR': os.path.join(workdir, 'receipts'),
+        'METRICS_DIR': os.path.join(workdir, 'metrics'),
+    })
+    with app.app_context():
+        run_migrations()
+    start = time.perf_counter()
+    result = app.test_client().post('/api/expenses/import', data=body,
+                                    content_type=CONTENT_TYPES[import_format]).get_json()
+    seconds = time.perf_counter() - start
+    with app.app_context():
+        result['rollups_ok'] = not verify_rollups()
+        db.engine.dispose()
+    return result, seconds
+
+
+def import_gunicorn(workdir, body, import_format):
+    port = free_port()
+    server = start_server('gthread', port, workdir)
+    try:
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=600)
+        start = time.perf_counter()
+        connection.request('POST', '/api/expenses/import', body, {'Content-Type': CONTENT_TYPES[import_format]})
+        result = json.loads(connection.getresponse().read())
+        seconds = time.perf_counter() - start
+    finally:
+        server.terminate()
+        server.wait()
+    # Rollups are checked against the same file once the server has stopped
+    from src.main import create_app
+    from src.models.rollup import verify_rollups
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        'METRICS_DIR': os.path.join(workdir, 'metrics'),
+    })
+    with app.app_context():
+        result['rollups_ok'] = not verify_rollups()
+    return result, seconds
+
+
+MODES = {'client': import_client, 'gunicorn': import_gunicorn}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--modes', default='client,gunicorn')
+    parser.add_argument('--target', type=int, default=50000, help='rows per second to flag results against')
+    parser.add_argument('--json', help='also write the report to this file')
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    report = {'rows': args.rows, 'target_rows_per_s': args.target, 'results': {}}
+    for import_format in ('ndjson', 'csv'):
+        body = make_body(rows, import_format)
+        for mode in args.modes.split(','):
+            # Left in place: the app's background threads keep using it until exit
+            workdir = tempfile.mkdtemp(prefix=f'import-{mode}-')
+            result, seconds = MODES[mode](workdir, body, import_format)
+            report['results'][f'{import_format}/{mode}'] = {
+                'mb': round(len(body) / 1e6, 1),
+                'seconds': round(seconds, 2),
+                'rows_per_s': round(result['imported'] / seconds),
+                'complete': result['imported'] == args.rows and result['failed'] == 0,
+                'rollups_ok': result['rollups_ok'],
+            }
+
+    print(f"{args.rows} rows per import, target {args.target} rows/s")
+    for name, result in report['results'].items():
+        flag = 'ok' if result['rows_per_s'] >= args.target else 'BELOW TARGET'
+        print(f"  {name:<16}{result['mb']:>6} MB {result['seconds']:>7} s {result['rows_per_s']:>8} rows/s  "
+              f"complete={result['complete']} rollups_ok={result['rollups_ok']}  {flag}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
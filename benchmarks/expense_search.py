@@ -0,0 +1,114 @@
+"""Benchmark expense search: the FTS5 index against a LIKE scan.
+
+Generates a database with benchmarks/generate_data.py (1M expenses by default,
+or uses --database) and times, for each search string and a random user:
+    like        description LIKE '%term%' AND ... over the user's expenses,
+                newest first, first page (what a search without the index costs)
+    fts         GET /api/expenses/search?q=..., first page ranked by relevance
+    fts_date    the same search ordered by date
+Reports the median of --repeat runs in milliseconds and the number of
+matching expenses, and checks both approaches find the same first page when
+ordered by date.
+
+Usage:
+    python benchmarks/expense_search.py [--users 10] [--expenses 100000] [--repeat 5]
+                                        [--database app.db] [--json out.json]
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+from generate_data import generate
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Common words, prefixes typed so far, two words, rare words and a miss
+SEARCHES = ['coffee', 'gro', 'tax', 'rent share', 'elec', 'dentist', 'concert tick', 'zebra']
+PAGE_SIZE = 50
+
+
+def timed(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return result, round(statistics.median(times) * 1000, 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--expenses', type=int, default=100000, help='expenses per generated user')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--database', help='use this generated database instead of making a new one')
+    parser.add_argument('--json', help='also write the report to this file')
+    args = parser.parse_args()
+
+    database = args.database
+    if database is None:
+        database = os.path.join(tempfile.mkdtemp(prefix='search-'), 'app.db')
+        generated = generate(database, args.users, args.expenses)
+        print(f"generated {generated['expenses']} expenses for {generated['users']} users "
+              f"in {generated['seconds']} s")
+    os.environ['DATABASE_URL'] = f'sqlite:///{os.path.abspath(database)}'
+    os.environ.setdefault('RECEIPT_STORE_DIR', os.path.join(os.path.dirname(os.path.abspath(database)), 'receipts'))
+
+    from sqlalchemy import and_, func
+    from src.main import create_app
+    from src.models.expense import Expense
+    from src.models.expense_search import search_matches, search_terms
+    from src.models.migrations import run_migrations
+    from src.models.user import db
+
+    app = create_app()
+    client = app.test_client()
+    rng = random.Random(7)
+    report = {'expenses': None, 'repeat': args.repeat, 'searches': {}}
+    with app.app_context():
+        # Creates and backfills the index on a database generated before it existed
+        run_migrations()
+        report['expenses'] = db.session.query(Expense).count()
+
+        for search in SEARCHES:
+            user_id = rng.randint(1, args.users)
+            terms = search_terms(search)
+            like = db.session.query(Expense.id).filter(
+                Expense.user_id == user_id,
+                and_(*[Expense.description.ilike(f'%{term}%') for term in terms])
+            ).order_by(Expense.date.desc(), Expense.id.desc()).limit(PAGE_SIZE)
+            like_ids, like_ms = timed(lambda: [row.id for row in like], args.repeat)
+
+            query = {'q': search, 'user_id': user_id, 'fields': 'id', 'limit': PAGE_SIZE}
+            _, fts_ms = timed(lambda: client.get('/api/expenses/search', query_string=query).get_json(), args.repeat)
+            by_date, fts_date_ms = timed(
+                lambda: client.get('/api/expenses/search', query_string=dict(query, sort='date')).get_json(),
+                args.repeat)
+            found = search_matches(terms, user_id)
+            matches = db.session.query(func.count()).select_from(found).join(Expense, Expense.id == found.c.id).filter(
+                Expense.user_id == user_id).scalar()
+
+            report['searches'][search] = {
+                'user_id': user_id, 'matches': matches, 'like_ms': like_ms, 'fts_ms': fts_ms,
+                'fts_date_ms': fts_date_ms, 'agree': [row['id'] for row in by_date] == like_ids,
+            }
+
+    print(f"{report['expenses']} expenses, median of {args.repeat} runs, first page of {PAGE_SIZE}")
+    print(f"{'search':<14}{'matches':>9}{'like ms':>10}{'fts ms':>9}{'by date':>9}  agree")
+    for search, result in report['searches'].items():
+        print(f"{search:<14}{result['matches']:>9}{result['like_ms']:>10}{result['fts_ms']:>9}"
+              f"{result['fts_date_ms']:>9}  {result['agree']}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+"""Generate a synthetic expense database for benchmarks and load tests.
+
+Creates a fresh database (SQLite file by default) with the current schema,
+then bulk-loads N users with M expenses each through the same executemany
+path as the import endpoint, and rebuilds the rollup tables once at the end.
+The data is meant to look like real usage:
+    categories       weighted towards Food & Dining, Shopping and Transportation
+    amounts          log-normal around a per-category typical amount
+    payment methods  mostly cards, some cash and transfers; bills go by transfer
+    dates            spread over --years, busier on weekends and in December,
+                     with bills landing early in the month
+Output is deterministic for a given --seed.
+
+Usage:
+    python benchmarks/generate_data.py [--users 10] [--expenses 10000] [--years 3] [--seed 42]
+                                       [--database /tmp/expense-bench/app.db] [--force]
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from itertools import accumulate
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DEFAULT_DATABASE = os.path.join(tempfile.gettempdir(), 'expense-bench', 'app.db')
+LAST_DAY = date(2024, 12, 31)
+CHUNK_SIZE = 50000
+
+# category: (share of expenses, typical amount in dollars, spread of the log-normal)
+CATEGORIES = {
+    'Food & Dining': (0.30, 18, 0.7),
+    'Shopping': (0.14, 45, 1.0),
+    'Transportation': (0.14, 15, 0.8),
+    'Bills & Utilities': (0.08, 90, 0.6),
+    'Entertainment': (0.08, 30, 0.8),
+    'Personal Care': (0.06, 25, 0.7),
+    'Healthcare': (0.05, 60, 1.1),
+    'Travel': (0.04, 250, 1.0),
+    'Education': (0.03, 80, 0.9),
+    'Other': (0.08, 20, 1.2),
+}
+PAYMENT_METHODS = {'Credit Card': 0.40, 'Debit Card': 0.25, 'Digital Wallet': 0.15, 'Cash': 0.12, 'Bank Transfer': 0.08}
+# Day-of-week weights, Monday first
+WEEKDAY_WEIGHTS = (0.9, 0.9, 0.95, 1.0, 1.2, 1.5, 1.3)
+DESCRIPTIONS = {
+    'Food & Dining': ['Lunch', 'Groceries', 'Coffee', 'Dinner out', 'Takeaway'],
+    'Shopping': ['Clothes', 'Electronics', 'Household items', 'Gift'],
+    'Transportation': ['Fuel', 'Bus pass', 'Taxi', 'Parking'],
+    'Bills & Utilities': ['Electricity', 'Internet', 'Phone', 'Water', 'Rent share'],
+    'Entertainment': ['Movies', 'Concert', 'Streaming', 'Games'],
+    'Personal Care': ['Haircut', 'Toiletries', 'Gym'],
+    'Healthcare': ['Pharmacy', 'Doctor visit', 'Dentist'],
+    'Travel': ['Flight', 'Hotel', 'Train tickets'],
+    'Education': ['Course', 'Books', 'Workshop'],
+    'Other': ['Miscellaneous', 'Donation', 'Fees'],
+}
+
+
+def day_weights(first, span):
+    """Relative likelihood of an expense on each day of the range"""
+    weights = []
+    for offset in range(span):
+        day = first + timedelta(days=offset)
+        weight = WEEKDAY_WEIGHTS[day.weekday()]
+        if day.month == 12:
+            weight *= 1.4
+        weights.append(weight)
+    return weights
+
+
+def make_expenses(rng, user_id, count, first, span, weights):
+    """Yield `count` expense rows for one user, in the format insert_expense_rows takes"""
+    names = list(CATEGORIES)
+    categories = rng.choices(names, weights=[CATEGORIES[name][0] for name in names], k=count)
+    offsets = rng.choices(range(span), cum_weights=weights, k=count)
+    methods = rng.choices(list(PAYMENT_METHODS), weights=list(PAYMENT_METHODS.values()), k=count)
+    for category, offset, method in zip(categories, offsets, methods):
+        _, typical, spread = CATEGORIES[category]
+        cents = max(1, int(rng.lognormvariate(math.log(typical * 100), spread)))
+        day = first + timedelta(days=offset)
+        if category == 'Bills & Utilities':
+            # Bills are paid by transfer around the start of the month
+            day = day.replace(day=min(day.day, 5))
+            method = 'Bank Transfer'
+        yield {
+            'user_id': user_id,
+            'amount_cents': cents,
+            'currency': 'USD',
+            'category': category,
+            'description': rng.choice(DESCRIPTIONS[category]),
+            'date': day,
+            'payment_method': method,
+        }
+
+
+def generate(database, users, expenses, years=3, seed=42, force=False):
+    """Build the database and return {'users', 'expenses', 'seconds', 'database'}"""
+    if os.path.exists(database):
+        if not force:
+            raise FileExistsError(f'{database} exists; pass --force to replace it')
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(database + suffix):
+                os.remove(database + suffix)
+    os.makedirs(os.path.dirname(os.path.abspath(database)), exist_ok=True)
+    os.environ['DATABASE_URL'] = f'sqlite:///{os.path.abspath(database)}'
+    os.environ.setdefault('RECEIPT_STORE_DIR', os.path.join(os.path.dirname(os.path.abspath(database)), 'receipts'))
+
+    from src.main import create_app
+    from src.models.expense import Expense
+    from src.models.migrations import run_migrations
+    from src.models.rollup import rebuild_rollups
+    from src.models.user import User, db
+    from src.utils.expense_import import insert_expense_rows
+
+    start = time.perf_counter()
+    app = create_app()
+    rng = random.Random(seed)
+    first = date(LAST_DAY.year - years + 1, 1, 1)
+    span = (LAST_DAY - first).days + 1
+    weights = list(accumulate(day_weights(first, span)))
+    created_at = datetime(LAST_DAY.year, 12, 31, 23, 59)
+
+    with app.app_context():
+        run_migrations()
+        db.session.execute(User.__table__.insert(), [
+            {'id': n, 'username': f'user{n}', 'email': f'user{n}@example.com'} for n in range(1, users + 1)
+        ])
+        for user_id in range(1, users + 1):
+            chunk = []
+            for row in make_expenses(rng, user_id, expenses, first, span, weights):
+                chunk.append(row)
+                if len(chunk) >= CHUNK_SIZE:
+                    insert_expense_rows(db.session, Expense.__table__, chunk, created_at)
+                    chunk = []
+            if chunk:
+                insert_expense_rows(db.session, Expense.__table__, chunk, created_at)
+        db.session.commit()
+        # One aggregation over everything instead of per-row rollup upserts
+        rebuild_rollups()
+
+    return {'database': database, 'users': users, 'expenses': users * expenses,
+            'seconds': round(time.perf_counter() - start, 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--expenses', type=int, default=10000, help='expenses per user')
+    parser.add_argument('--years', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--database', default=DEFAULT_DATABASE)
+    parser.add_argument('--force', action='store_true', help='replace the database if it exists')
+    args = parser.parse_args()
+
+    try:
+        result = generate(args.database, args.users, args.expenses, args.years, args.seed, args.force)
+    except FileExistsError as e:
+        print(e)
+        return 1
+    print(f"{result['users']} users, {result['expenses']} expenses in {result['seconds']} s "
+          f"({result['expenses'] / result['seconds']:.0f} rows/s) -> {result['database']}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
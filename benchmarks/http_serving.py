@@ -0,0 +1,183 @@
+"""Benchmark the main API endpoints under each serving mode.
+
+Starts the app on a fresh database, seeded through the import endpoint, in
+each mode: Flask's development server (`python src/main.py`) and gunicorn
+with the sync, gthread and (when installed) gevent workers from
+gunicorn.conf.py. Keep-alive client threads then cycle through the main
+endpoints for a fixed time. Reports requests per second overall and
+p50/p99 latency per endpoint.
+
+The client runs on the same machine, so on small boxes it competes with the
+server for CPU; compare modes against each other, not against production.
+
+Usage:
+    python benchmarks/http_serving.py [--modes dev,sync,gthread,gevent] [--clients 16] [--seconds 10] [--json out.json]
+"""
+import argparse
+import http.client
+import importlib.util
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ENDPOINTS = [
+    ('health', 'GET', '/health', None),
+    ('list', 'GET', '/api/expenses?limit=50', None),
+    ('monthly', 'GET', '/api/metrics/monthly', None),
+    ('category', 'GET', '/api/metrics/category', None),
+    ('dashboard', 'GET', '/api/dashboard', None),
+    ('create', 'POST', '/api/expenses', {'amount': 12.5, 'category': 'Food & Dining', 'payment_method': 'Card'}),
+]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(mode, port, workdir):
+    env = dict(
+        os.environ,
+        PORT=str(port),
+        DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        RECEIPT_STORE_DIR=os.path.join(workdir, 'receipts'),
+    )
+    # The dev server does not migrate on start the way gunicorn does
+    subprocess.run([sys.executable, os.path.join(ROOT, 'src', 'manage.py'), 'migrate'],
+                   cwd=ROOT, env=env, stdout=subprocess.DEVNULL, check=True)
+    if mode == 'dev':
+        command = [sys.executable, os.path.join(ROOT, 'src', 'main.py')]
+    else:
+        env['GUNICORN_WORKER_CLASS'] = mode
+        command = [sys.executable, '-m', 'gunicorn', '-c', os.path.join(ROOT, 'gunicorn.conf.py')]
+    server = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            connection.request('GET', '/health')
+            if connection.getresponse().status == 200:
+                return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError(f'{mode} server did not start')
+
+
+def seed(port, rows):
+    body = '\n'.join(
+        json.dumps({'amount': 5 + i % 200, 'category': ('Food & Dining', 'Shopping', 'Transportation')[i % 3],
+                    'payment_method': 'Card', 'date': f'{2023 + i % 2}-{i % 12 + 1:02d}-{i % 28 + 1:02d}'})
+        for i in range(rows)
+    )
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+    connection.request('POST', '/api/expenses/import', body, {'Content-Type': 'application/x-ndjson'})
+    connection.getresponse().read()
+
+
+def client_loop(port, stop, samples, errors, offset):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    i = offset
+    while not stop.is_set():
+        name, method, path, payload = ENDPOINTS[i % len(ENDPOINTS)]
+        i += 1
+        body = json.dumps(payload) if payload else None
+        headers = {'Content-Type': 'application/json'} if payload else {}
+        start = time.perf_counter()
+        ok = False
+        # Retry once on a fresh connection, as browsers do when a worker recycled
+        # by max_requests closes an idle keep-alive connection
+        for _ in range(2):
+            try:
+                connection.request(method, path, body, headers)
+                response = connection.getresponse()
+                response.read()
+                ok = response.status < 400
+                break
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        elapsed = time.perf_counter() - start
+        if ok:
+            samples.setdefault(name, []).append(elapsed)
+        else:
+            errors[name] = errors.get(name, 0) + 1
+
+
+def run_mode(mode, clients, seconds, seed_rows):
+    workdir = tempfile.mkdtemp(prefix=f'serve-{mode}-')
+    port = free_port()
+    server = start_server(mode, port, workdir)
+    try:
+        seed(port, seed_rows)
+        stop = threading.Event()
+        per_thread = [({}, {}) for _ in range(clients)]
+        threads = [
+            threading.Thread(target=client_loop, args=(port, stop, samples, errors, n))
+            for n, (samples, errors) in enumerate(per_thread)
+        ]
+        for thread in threads:
+            thread.start()
+        time.sleep(seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+    finally:
+        server.terminate()
+        server.wait()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    endpoints = {}
+    total = 0
+    failed = 0
+    for name, _, _, _ in ENDPOINTS:
+        latencies = sorted(latency for samples, _ in per_thread for latency in samples.get(name, []))
+        errors = sum(errors.get(name, 0) for _, errors in per_thread)
+        total += len(latencies)
+        failed += errors
+        endpoints[name] = {
+            'requests': len(latencies),
+            'errors': errors,
+            'p50_ms': round(latencies[len(latencies) // 2] * 1000, 1) if latencies else None,
+            'p99_ms': round(latencies[int(len(latencies) * 0.99)] * 1000, 1) if latencies else None,
+        }
+    return {'req_per_s': round(total / seconds, 1), 'errors': failed, 'endpoints': endpoints}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--modes', default='dev,sync,gthread,gevent')
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--seed', type=int, default=5000, help='expenses loaded before the run')
+    parser.add_argument('--json', help='also write the report to this file')
+    args = parser.parse_args()
+
+    report = {'clients': args.clients, 'seconds': args.seconds, 'seed_rows': args.seed, 'modes': {}}
+    for mode in args.modes.split(','):
+        if mode == 'gevent' and importlib.util.find_spec('gevent') is None:
+            print(f'{mode:>8}: skipped (pip install gevent)')
+            continue
+        result = run_mode(mode, args.clients, args.seconds, args.seed)
+        report['modes'][mode] = result
+        print(f"{mode:>8}: {result['req_per_s']} req/s, {result['errors']} errors")
+        for name, stats in result['endpoints'].items():
+            print(f"{'':>10}{name:<9} p50 {stats['p50_ms']} ms, p99 {stats['p99_ms']} ms ({stats['requests']} requests)")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
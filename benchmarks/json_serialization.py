@@ -0,0 +1,114 @@
+"""Benchmark serializing expense rows to a JSON response body.
+
+Seeds a fresh database with one user's expenses, fetches them the way
+GET /api/expenses does (a column projection) and times turning the rows into
+a response body:
+    baseline    Expense.row_to_dict per row, then the standard library encoder
+                with Flask's default settings (what jsonify used to do)
+    fast        Expense.serialize_rows, then the app's JSON provider (orjson
+                when installed), dates written natively
+Both bodies are checked to decode to the same JSON. It then reports the body
+size and time per row for each Content-Encoding the app can send.
+
+Usage:
+    python benchmarks/json_serialization.py [--rows 5000] [--repeat 5] [--json out.json]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+CATEGORIES = ['Food & Dining', 'Transportation', 'Shopping', 'Entertainment', 'Bills & Utilities',
+              'Healthcare', 'Travel', 'Education', 'Other']
+
+
+def make_rows(count, seed=5):
+    rng = random.Random(seed)
+    first = date(2022, 1, 1)
+    return [
+        {'amount': round(rng.lognormvariate(3, 1), 2), 'category': rng.choice(CATEGORIES),
+         'payment_method': rng.choice(['Card', 'Cash', 'Bank Transfer']), 'description': f'Expense {i}',
+         'date': (first + timedelta(days=rng.randint(0, 1000))).isoformat()}
+        for i in range(count)
+    ]
+
+
+def timed(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', help='also write the report to this file')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='json-')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'json.db')}"
+    os.environ['RECEIPT_STORE_DIR'] = os.path.join(workdir, 'receipts')
+    from flask.json.provider import DefaultJSONProvider
+    from src.main import create_app
+    from src.models.expense import EXPENSE_FIELDS, Expense
+    from src.models.migrations import run_migrations
+    from src.models.user import db
+    from src.utils import compression, json_provider
+
+    app = create_app()
+    with app.app_context():
+        run_migrations()
+    body = '\n'.join(json.dumps(row) for row in make_rows(args.rows))
+    app.test_client().post('/api/expenses/import', data=body, content_type='application/x-ndjson')
+
+    fields = list(EXPENSE_FIELDS)
+    stdlib = DefaultJSONProvider(app)
+    report = {'rows': args.rows, 'encoder': 'orjson' if json_provider.orjson else 'json', 'ms_per_1000_rows': {},
+              'bytes': {}}
+    with app.app_context():
+        rows = db.session.query(*Expense.columns_for(fields + ['date', 'id'])).filter(Expense.user_id == 1).order_by(
+            Expense.date.desc(), Expense.id.desc()).all()
+
+        baseline, baseline_s = timed(
+            lambda: stdlib.dumps([Expense.row_to_dict(row, fields) for row in rows]).encode(), args.repeat)
+        fast, fast_s = timed(lambda: app.json.dumps(Expense.serialize_rows(rows, fields)).encode(), args.repeat)
+        agree = json.loads(baseline) == json.loads(fast)
+
+        per_1000 = 1000 / max(len(rows), 1) * 1000
+        report['ms_per_1000_rows'] = {'baseline': round(baseline_s * per_1000, 2), 'fast': round(fast_s * per_1000, 2)}
+        report['bytes']['identity'] = len(fast)
+        encodings = ['gzip'] + (['br'] if compression.brotli else [])
+        for encoding in encodings:
+            compressed, compress_s = timed(lambda: compression.compressor.compress(fast, encoding), args.repeat)
+            report['bytes'][encoding] = len(compressed)
+            report['ms_per_1000_rows'][f'{encoding}_compress'] = round(compress_s * per_1000, 2)
+    report['speedup'] = round(baseline_s / fast_s, 1)
+    report['agree'] = agree
+
+    print(f"{len(rows)} rows, encoder {report['encoder']}")
+    print(f"  baseline {report['ms_per_1000_rows']['baseline']} ms / 1000 rows")
+    print(f"  fast     {report['ms_per_1000_rows']['fast']} ms / 1000 rows ({report['speedup']}x, results agree: {agree})")
+    for encoding, size in report['bytes'].items():
+        cost = report['ms_per_1000_rows'].get(f'{encoding}_compress')
+        extra = f', +{cost} ms / 1000 rows to compress' if cost is not None else ''
+        print(f"  {encoding:<8} {size} bytes ({size / max(len(rows), 1):.0f} per row{extra})")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
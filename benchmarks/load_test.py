@@ -0,0 +1,287 @@
+"""Load-test the API with scripted scenarios and record the results as JSON.
+
+Generates a database with benchmarks/generate_data.py (or uses --database),
+starts gunicorn on it with gunicorn.conf.py (or targets a running server with
+--url), then runs each scenario for --seconds with --clients keep-alive
+client threads. Each client acts as a random generated user:
+    dashboard   the frontend's first load: monthly, category and trends metrics, first expense page
+    browse      expense list pages following the cursor, filtered by month and by category
+    users       the user list, the user summary page and a single user
+    record      add an expense, then reload the first page and the monthly metrics
+Reports requests per second per scenario and p50/p95/p99 latency per step.
+
+With --baseline, the run is compared to an earlier result file and the
+script exits 1 if any scenario regressed by more than --max-regression (see
+benchmarks/compare_results.py), so a CI job can run:
+    python benchmarks/load_test.py --json current.json --baseline baseline.json
+
+The client runs on the same machine as the server, so compare runs from the
+same box, not against production.
+
+Usage:
+    python benchmarks/load_test.py [--scenarios dashboard,browse,users,record] [--clients 8] [--seconds 10]
+                                   [--users 10] [--expenses 10000] [--database app.db | --url http://host:port]
+                                   [--json out.json] [--baseline old.json] [--max-regression 0.2]
+"""
+import argparse
+import http.client
+import json
+import math
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlencode, urlsplit
+
+from compare_results import compare, print_regressions
+from generate_data import CATEGORIES, generate
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PERCENTILES = (50, 95, 99)
+CONNECT_ATTEMPTS = 3
+
+
+def dashboard(client, user):
+    client.get('monthly', '/api/metrics/monthly', user_id=user)
+    client.get('category', '/api/metrics/category', user_id=user)
+    client.get('trends', '/api/metrics/trends', user_id=user)
+    client.get('list', '/api/expenses', user_id=user, limit=50)
+
+
+def browse(client, user):
+    response = client.get('list', '/api/expenses', user_id=user, limit=50)
+    cursor = response.headers.get('X-Next-Cursor') if response else None
+    if cursor:
+        client.get('list_next', '/api/expenses', user_id=user, limit=50, cursor=cursor)
+    month = f'{client.rng.randint(2022, 2024)}-{client.rng.randint(1, 12):02d}'
+    client.get('list_month', '/api/expenses', user_id=user, month=month)
+    client.get('list_category', '/api/expenses', user_id=user, category=client.rng.choice(list(CATEGORIES)))
+
+
+def users(client, user):
+    client.get('user_list', '/api/users')
+    client.get('user_summary', '/api/users/summary')
+    client.get('user', f'/api/users/{user}')
+
+
+def record(client, user):
+    client.post('create', '/api/expenses', {
+        'user_id': user, 'amount': round(client.rng.lognormvariate(3, 1), 2),
+        'category': client.rng.choice(list(CATEGORIES)), 'payment_method': 'Debit Card',
+        'description': 'Load test'
+    })
+    client.get('list', '/api/expenses', user_id=user, limit=50)
+    client.get('monthly', '/api/metrics/monthly', user_id=user)
+
+
+SCENARIOS = {'dashboard': dashboard, 'browse': browse, 'users': users, 'record': record}
+
+
+class Client:
+    """Keep-alive HTTP client recording the latency of every step"""
+
+    def __init__(self, host, port, seed):
+        self.host, self.port = host, port
+        self.rng = random.Random(seed)
+        self.connection = http.client.HTTPConnection(host, port, timeout=60)
+        self.samples = {}
+        self.errors = {}
+
+    def request(self, step, method, path, body=None):
+        headers = {'Accept-Encoding': 'gzip'}
+        if body is not None:
+            body = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+        start = time.perf_counter()
+        response = None
+        # Retry on a fresh connection when a worker recycled by max_requests closed this one;
+        # a new connection can still land on the exiting worker, so allow a couple of tries
+        for _ in range(CONNECT_ATTEMPTS):
+            try:
+                self.connection.request(method, path, body, headers)
+                response = self.connection.getresponse()
+                response.read()
+                break
+            except (OSError, http.client.HTTPException):
+                self.connection.close()
+                self.connection = http.client.HTTPConnection(self.host, self.port, timeout=60)
+                response = None
+        elapsed = time.perf_counter() - start
+        if response is not None and response.status < 400:
+            self.samples.setdefault(step, []).append(elapsed)
+            return response
+        self.errors[step] = self.errors.get(step, 0) + 1
+        return None
+
+    def get(self, step, path, **params):
+        return self.request(step, 'GET', f'{path}?{urlencode(params)}' if params else path)
+
+    def post(self, step, path, body):
+        return self.request(step, 'POST', path, body)
+
+
+def percentile(ordered, q):
+    """Nearest-rank percentile of a sorted list"""
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q / 100 * len(ordered)) - 1))]
+
+
+def run_scenario(name, host, port, clients, seconds, user_count):
+    scenario = SCENARIOS[name]
+    stop = threading.Event()
+    workers = [Client(host, port, seed=n) for n in range(clients)]
+    completed = [0] * clients
+
+    def loop(n):
+        client = workers[n]
+        while not stop.is_set():
+            scenario(client, client.rng.randint(1, user_count))
+            completed[n] += 1
+
+    threads = [threading.Thread(target=loop, args=(n,)) for n in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    steps = {}
+    requests = errors = 0
+    for step in dict.fromkeys(step for client in workers for step in list(client.samples) + list(client.errors)):
+        latencies = sorted(latency for client in workers for latency in client.samples.get(step, []))
+        failed = sum(client.errors.get(step, 0) for client in workers)
+        requests += len(latencies)
+        errors += failed
+        steps[step] = dict(
+            {'requests': len(latencies), 'errors': failed},
+            **{f'p{q}_ms': round(percentile(latencies, q) * 1000, 2) if latencies else None for q in PERCENTILES}
+        )
+    all_latencies = sorted(latency for client in workers for samples in client.samples.values() for latency in samples)
+    return dict(
+        {'iterations': sum(completed), 'requests': requests, 'errors': errors,
+         'req_per_s': round(requests / elapsed, 1)},
+        **{f'p{q}_ms': round(percentile(all_latencies, q) * 1000, 2) if all_latencies else None for q in PERCENTILES},
+        steps=steps
+    )
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(database, port):
+    env = dict(
+        os.environ,
+        PORT=str(port),
+        DATABASE_URL=f'sqlite:///{os.path.abspath(database)}',
+        RECEIPT_STORE_DIR=os.path.join(os.path.dirname(os.path.abspath(database)), 'receipts'),
+    )
+    server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', os.path.join(ROOT, 'gunicorn.conf.py')],
+                              cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            connection.request('GET', '/health')
+            if connection.getresponse().status == 200:
+                return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError('gunicorn did not start')
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--users', type=int, default=10, help='users to generate, or to pick from with --url')
+    parser.add_argument('--expenses', type=int, default=10000, help='expenses per generated user')
+    parser.add_argument('--database', help='use this generated database instead of making a new one')
+    parser.add_argument('--url', help='test a server that is already running instead of starting gunicorn')
+    parser.add_argument('--json', help='also write the report to this file')
+    parser.add_argument('--baseline', help='earlier report to compare against')
+    parser.add_argument('--max-regression', type=float, default=0.2,
+                        help='allowed fractional drop in req/s or rise in p95 before failing (default 0.2)')
+    args = parser.parse_args()
+
+    names = args.scenarios.split(',')
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(unknown)}")
+
+    report = {
+        'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'cpus': os.cpu_count(),
+        'clients': args.clients,
+        'seconds': args.seconds,
+        'scenarios': {},
+    }
+    server = None
+    if args.url:
+        target = urlsplit(args.url)
+        host, port = target.hostname, target.port or 80
+        report['target'] = args.url
+    else:
+        database = args.database
+        if database is None:
+            database = os.path.join(tempfile.mkdtemp(prefix='load-'), 'app.db')
+            generated = generate(database, args.users, args.expenses)
+            print(f"generated {generated['expenses']} expenses for {generated['users']} users "
+                  f"in {generated['seconds']} s")
+        report['data'] = {'users': args.users, 'expenses_per_user': args.expenses}
+        host, port = '127.0.0.1', free_port()
+        server = start_server(database, port)
+
+    try:
+        for name in names:
+            result = run_scenario(name, host, port, args.clients, args.seconds, args.users)
+            report['scenarios'][name] = result
+            print(f"{name:>10}: {result['req_per_s']} req/s, p50 {result['p50_ms']} ms, p95 {result['p95_ms']} ms, "
+                  f"p99 {result['p99_ms']} ms, {result['errors']} errors")
+            for step, stats in result['steps'].items():
+                print(f"{'':>12}{step:<14} p50 {stats['p50_ms']} ms, p95 {stats['p95_ms']} ms, "
+                      f"p99 {stats['p99_ms']} ms ({stats['requests']} requests, {stats['errors']} errors)")
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, report, args.max_regression)
+        print_regressions(regressions, args.max_regression)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
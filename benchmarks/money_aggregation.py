@@ -0,0 +1,135 @@
+"""Benchmark SUM/GROUP BY over float amounts vs integer cents.
+
+Loads the same synthetic expenses (a million by default) into two SQLite
+tables, one storing the amount as REAL, as expense.amount used to, and one
+storing integer cents, as expense.amount_cents does now. It then times the
+aggregations the analytics endpoints and rollup rebuilds run and checks every
+total against the exact sum computed from the generated cents:
+    total       SUM over everything
+    category    SUM, COUNT GROUP BY category
+    month       SUM, COUNT GROUP BY category, month
+For the float table it reports how many totals are off from the exact
+decimal, and by how much, before and after rounding to the cent.
+
+Usage:
+    python benchmarks/money_aggregation.py [--rows 1000000] [--repeat 3] [--json out.json]
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+CATEGORIES = ['Food & Dining', 'Transportation', 'Shopping', 'Entertainment', 'Bills & Utilities',
+              'Healthcare', 'Travel', 'Education', 'Other']
+
+QUERIES = {
+    'total': 'SELECT SUM({amount}) FROM {table}',
+    'category': 'SELECT category, SUM({amount}), COUNT(*) FROM {table} GROUP BY category',
+    'month': "SELECT category, substr(date, 1, 7), SUM({amount}), COUNT(*) FROM {table} GROUP BY 1, 2",
+}
+TABLES = {
+    'float': ('expense_float', 'amount', 'REAL'),
+    'cents': ('expense_cents', 'amount_cents', 'INTEGER'),
+}
+
+
+def make_rows(count, seed=11):
+    rng = random.Random(seed)
+    rows = []
+    for _ in range(count):
+        cents = int(rng.lognormvariate(7, 1.2)) + 1
+        day = f'{rng.randint(2015, 2024)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}'
+        rows.append((rng.choice(CATEGORIES), day, cents))
+    return rows
+
+
+def exact_totals(rows):
+    totals = {'total': {(): 0}, 'category': {}, 'month': {}}
+    for category, day, cents in rows:
+        totals['total'][()] += cents
+        totals['category'][(category,)] = totals['category'].get((category,), 0) + cents
+        key = (category, day[:7])
+        totals['month'][key] = totals['month'].get(key, 0) + cents
+    return totals
+
+
+def load(connection, rows):
+    for kind, (table, column, sql_type) in TABLES.items():
+        connection.execute(f'CREATE TABLE {table} (id INTEGER PRIMARY KEY, category TEXT, date TEXT, {column} {sql_type})')
+        if kind == 'float':
+            values = ((category, day, cents / 100) for category, day, cents in rows)
+        else:
+            values = rows
+        connection.executemany(f'INSERT INTO {table} (category, date, {column}) VALUES (?, ?, ?)', values)
+    connection.commit()
+
+
+def run_query(connection, kind, name):
+    table, column, _ = TABLES[kind]
+    results = {}
+    for row in connection.execute(QUERIES[name].format(table=table, amount=column)):
+        key_length = len(row) - (1 if name == 'total' else 2)
+        results[tuple(row[:key_length])] = row[key_length]
+    return results
+
+
+def check(kind, results, exact):
+    """Count totals that differ from the exact sum, raw and after rounding to the cent"""
+    wrong = wrong_rounded = 0
+    worst = 0.0
+    for key, want in exact.items():
+        have = results[key]
+        have_cents = have * 100 if kind == 'float' else have
+        if have_cents != want:
+            wrong += 1
+            worst = max(worst, abs(have_cents - want))
+        if round(have_cents) != want:
+            wrong_rounded += 1
+    return {'groups': len(exact), 'inexact': wrong, 'wrong_after_rounding': wrong_rounded,
+            'max_error_cents': float(f'{worst:.3g}')}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--json', help='also write the report to this file')
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    exact = exact_totals(rows)
+    report = {'rows': args.rows, 'queries': {}}
+    with tempfile.TemporaryDirectory(prefix='money-') as workdir:
+        connection = sqlite3.connect(os.path.join(workdir, 'money.db'))
+        load(connection, rows)
+
+        for name in QUERIES:
+            report['queries'][name] = {}
+            for kind in TABLES:
+                best = None
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    results = run_query(connection, kind, name)
+                    elapsed = time.perf_counter() - start
+                    best = elapsed if best is None else min(best, elapsed)
+                outcome = check(kind, results, exact[name])
+                outcome['ms'] = round(best * 1000, 1)
+                report['queries'][name][kind] = outcome
+        connection.close()
+
+    print(f'{args.rows} expenses')
+    for name, kinds in report['queries'].items():
+        for kind, outcome in kinds.items():
+            print(f"{name:>9} {kind:<6} {outcome['ms']:>8} ms  {outcome['inexact']}/{outcome['groups']} inexact, "
+                  f"{outcome['wrong_after_rounding']} wrong after rounding, max error {outcome['max_error_cents']} cents")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,181 @@
+"""Benchmark receipt text extraction and bulk categorization.
+
+Generates a seeded batch of receipt-like OCR texts and expense descriptions,
+then compares the original per-field regex/substring extraction (copied
+below unchanged) with the single-pass engine in src.utils.receipt_text.
+Reports how often each finds the printed TOTAL and how often the two agree,
+and checks both assign the same category to every description.
+
+Usage:
+    python benchmarks/receipt_text.py [--texts 5000] [--descriptions 100000] [--json out.json]
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils.receipt_text import (
+    CATEGORY_KEYWORDS, categorize_many, categorize_text, pick_amount, pick_date, scan_receipt_text
+)
+
+MERCHANTS = ['WALMART SUPERCENTER', 'CORNER CAFE', 'CITY PHARMACY', 'SHELL STATION', 'GREEN MARKET',
+             'PIZZA KITCHEN', 'ACME HARDWARE', 'DOWNTOWN CINEMA']
+WORDS = ['milk', 'bread', 'eggs', 'apples', 'soap', 'batteries', 'tickets', 'latte', 'refill', 'towels',
+         'charger', 'notebook', 'snacks', 'vitamins', 'printer paper', 'lunch', 'dinner with team']
+
+
+class LegacyExtractor:
+    """The extraction code ReceiptProcessor used before the single-pass engine, patterns unchanged"""
+
+    amount_patterns = [
+        r'\$?(\d+\.?\d{0,2})',
+        r'total[:\s]*\$?(\d+\.?\d{0,2})',
+        r'amount[:\s]*\$?(\d+\.?\d{0,2})',
+    ]
+    date_patterns = [
+        r'(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})',
+        r'(\d{4}[/-]\d{1,2}[/-]\d{1,2})',
+    ]
+
+    def extract_amount(self, text):
+        amounts = []
+        for pattern in self.amount_patterns:
+            for match in re.findall(pattern, text, re.IGNORECASE):
+                try:
+                    amount = float(match.replace('$', '').replace(',', ''))
+                    if 0.01 <= amount <= 10000:
+                        amounts.append(amount)
+                except ValueError:
+                    continue
+        return max(amounts) if amounts else None
+
+    def extract_date(self, text):
+        for pattern in self.date_patterns:
+            matches = re.findall(pattern, text)
+            if matches:
+                return matches[0]
+        return None
+
+    def extract_merchant(self, text):
+        for line in text.split('\n')[:5]:
+            line = line.strip()
+            if len(line) > 3 and line.isupper():
+                merchant = re.sub(r'[^\w\s&]', '', line).strip()
+                if len(merchant) > 2:
+                    return merchant
+        return None
+
+    def categorize_expense(self, merchant_name, text):
+        text_lower = text.lower()
+        merchant_lower = (merchant_name or '').lower()
+        categories = {
+            'Food & Dining': ['restaurant', 'cafe', 'coffee', 'pizza', 'burger', 'food', 'dining', 'kitchen', 'grill', 'bar'],
+            'Transportation': ['gas', 'fuel', 'station', 'uber', 'lyft', 'taxi', 'metro', 'bus', 'parking'],
+            'Shopping': ['store', 'shop', 'retail', 'mall', 'market', 'walmart', 'target', 'amazon'],
+            'Healthcare': ['pharmacy', 'hospital', 'clinic', 'medical', 'doctor', 'cvs', 'walgreens'],
+            'Entertainment': ['movie', 'theater', 'cinema', 'game', 'entertainment', 'netflix', 'spotify'],
+            'Bills & Utilities': ['electric', 'water', 'internet', 'phone', 'utility', 'bill'],
+        }
+        for category, keywords in categories.items():
+            for keyword in keywords:
+                if keyword in merchant_lower or keyword in text_lower:
+                    return category
+        return 'Other'
+
+
+def make_receipt(rng):
+    """A receipt text and the total printed on it"""
+    items = [(rng.choice(WORDS).upper(), round(rng.uniform(1, 60), 2)) for _ in range(rng.randint(3, 25))]
+    subtotal = round(sum(price for _, price in items), 2)
+    tax = round(subtotal * 0.08, 2)
+    lines = [rng.choice(MERCHANTS), f'{rng.randint(1, 9999)} MAIN ST', f'ANYTOWN, ST {rng.randint(10000, 99999)}', '']
+    lines += [f'{name:<20}${price:>8.2f}' for name, price in items]
+    lines += ['', f'{"SUBTOTAL":<20}${subtotal:>8.2f}', f'{"TAX":<20}${tax:>8.2f}',
+              f'{"TOTAL":<20}${subtotal + tax:>8.2f}', '',
+              f'{rng.randint(1, 12):02d}/{rng.randint(1, 28):02d}/2024 {rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}']
+    return '\n'.join(lines), round(subtotal + tax, 2)
+
+
+def make_description(rng):
+    keywords = [keyword for keywords in CATEGORY_KEYWORDS.values() for keyword in keywords]
+    words = rng.sample(WORDS, rng.randint(1, 3))
+    if rng.random() < 0.7:
+        words.insert(rng.randint(0, len(words)), rng.choice(keywords))
+    return ' '.join(words).capitalize()
+
+
+def legacy_extract(extractor, text):
+    merchant = extractor.extract_merchant(text)
+    return (extractor.extract_amount(text), extractor.extract_date(text), merchant,
+            extractor.categorize_expense(merchant, text))
+
+
+def engine_extract(text):
+    fields = scan_receipt_text(text)
+    return pick_amount(fields), pick_date(fields), fields.merchant, categorize_text(text, fields.merchant)
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def run(text_count, description_count):
+    rng = random.Random(42)
+    texts, totals = zip(*[make_receipt(rng) for _ in range(text_count)])
+    descriptions = [make_description(rng) for _ in range(description_count)]
+    legacy = LegacyExtractor()
+
+    legacy_fields, legacy_s = timed(lambda: [legacy_extract(legacy, text) for text in texts])
+    engine_fields, engine_s = timed(lambda: [engine_extract(text) for text in texts])
+    legacy_categories, legacy_cat_s = timed(lambda: [legacy.categorize_expense(None, d) for d in descriptions])
+    engine_categories, engine_cat_s = timed(lambda: categorize_many(descriptions))
+
+    return {
+        'texts': text_count,
+        'descriptions': description_count,
+        'extract_texts_per_s': {'legacy': round(text_count / legacy_s), 'engine': round(text_count / engine_s)},
+        'categorize_per_s': {'legacy': round(description_count / legacy_cat_s),
+                             'engine': round(description_count / engine_cat_s)},
+        # The legacy patterns take any number up to 10000 as an amount, so their largest
+        # "amount" is often a street number, zip code or year rather than the total; the
+        # engine prefers TOTAL lines and only reads $-prefixed or two-decimal numbers
+        'found_total': {'legacy': sum(f[0] == total for f, total in zip(legacy_fields, totals)) / text_count,
+                        'engine': sum(f[0] == total for f, total in zip(engine_fields, totals)) / text_count},
+        'same_amount': sum(a[0] == b[0] for a, b in zip(legacy_fields, engine_fields)) / text_count,
+        'same_date_merchant_category': sum(a[1:] == b[1:] for a, b in zip(legacy_fields, engine_fields)) / text_count,
+        'same_description_category': sum(a == b for a, b in zip(legacy_categories, engine_categories)) / description_count,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--texts', type=int, default=5000)
+    parser.add_argument('--descriptions', type=int, default=100000)
+    parser.add_argument('--json', help='also write the report to this file')
+    args = parser.parse_args()
+
+    report = run(args.texts, args.descriptions)
+    extract = report['extract_texts_per_s']
+    categorize = report['categorize_per_s']
+    print(f"extraction:     legacy {extract['legacy']} texts/s, engine {extract['engine']} texts/s "
+          f"({extract['engine'] / extract['legacy']:.1f}x)")
+    print(f"categorization: legacy {categorize['legacy']} descriptions/s, engine {categorize['engine']} descriptions/s "
+          f"({categorize['engine'] / categorize['legacy']:.1f}x)")
+    print(f"found the TOTAL: legacy {report['found_total']['legacy']:.3f}, engine {report['found_total']['engine']:.3f}")
+    print(f"agreement: amount {report['same_amount']:.3f}, date/merchant/category {report['same_date_merchant_category']:.3f}, "
+          f"description category {report['same_description_category']:.3f}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""Measure cold start: import time, app creation time and memory of a worker.
+
+Each sample runs in a fresh interpreter, like a newly booted dyno or a
+gunicorn worker recycled by max_requests. It times `import src.main`,
+`create_app()` and the first request to /health, records peak RSS, and lists
+which heavy OCR modules ended up loaded. A second scenario then imports the
+OCR processor, to show what those modules would cost every worker if they
+were loaded at boot.
+
+Works as a regression check: exits with status 1 when the median boot time
+or RSS goes over the limits, or when booting loads cv2, numpy, pytesseract,
+PIL or a database dialect that is not in use.
+
+Usage:
+    python benchmarks/startup.py [--samples 5] [--max-boot-ms 1500] [--max-rss-mb 100] [--json out.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Must not be imported by a worker that has not served an OCR request
+HEAVY_MODULES = ['cv2', 'numpy', 'pytesseract', 'PIL', 'sqlalchemy.dialects.postgresql']
+
+PROBE = '''
+import json, resource, sys, time
+start = time.perf_counter()
+import src.main
+imported = time.perf_counter()
+app = src.main.create_app()
+created = time.perf_counter()
+app.test_client().get('/health')
+served = time.perf_counter()
+if {with_ocr}:
+    import src.utils.ocr_processor
+loaded = time.perf_counter()
+print(json.dumps({{
+    'import_ms': (imported - start) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'first_request_ms': (served - created) * 1000,
+    'boot_ms': (served - start) * 1000,
+    'ocr_import_ms': (loaded - served) * 1000,
+    'rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'heavy_modules': [name for name in {heavy!r} if name in sys.modules],
+}}))
+'''
+
+
+def sample(with_ocr, workdir):
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'startup.db')}",
+               RECEIPT_STORE_DIR=os.path.join(workdir, 'receipts'))
+    code = PROBE.format(with_ocr=with_ocr, heavy=HEAVY_MODULES)
+    output = subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def summarize(samples):
+    summary = {
+        key: round(statistics.median(s[key] for s in samples), 1)
+        for key in ('import_ms', 'create_app_ms', 'first_request_ms', 'boot_ms', 'ocr_import_ms', 'rss_mb')
+    }
+    summary['heavy_modules'] = sorted({name for s in samples for name in s['heavy_modules']})
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--samples', type=int, default=5)
+    parser.add_argument('--max-boot-ms', type=float, default=1500, help='limit for the median import + create_app + first request')
+    parser.add_argument('--max-rss-mb', type=float, default=100, help='limit for the median peak RSS after the first request')
+    parser.add_argument('--json', help='also write the report to this file')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='startup-') as workdir:
+        boot = summarize([sample(False, workdir) for _ in range(args.samples)])
+        with_ocr = summarize([sample(True, workdir) for _ in range(args.samples)])
+
+    print(f"boot: {boot['boot_ms']} ms (import {boot['import_ms']} ms, create_app {boot['create_app_ms']} ms, "
+          f"first request {boot['first_request_ms']} ms), {boot['rss_mb']} MB RSS")
+    print(f"heavy modules at boot: {', '.join(boot['heavy_modules']) or 'none'}")
+    print(f"if OCR deps were loaded at boot: +{with_ocr['ocr_import_ms']} ms, {with_ocr['rss_mb']} MB RSS")
+
+    failures = []
+    if boot['boot_ms'] > args.max_boot_ms:
+        failures.append(f"boot {boot['boot_ms']} ms > {args.max_boot_ms} ms")
+    if boot['rss_mb'] > args.max_rss_mb:
+        failures.append(f"RSS {boot['rss_mb']} MB > {args.max_rss_mb} MB")
+    if boot['heavy_modules']:
+        failures.append(f"loaded at boot: {', '.join(boot['heavy_modules'])}")
+    print('OK' if not failures else 'FAIL: ' + '; '.join(failures))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'samples': args.samples, 'boot': boot, 'with_ocr': with_ocr, 'failures': failures}, f, indent=2)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
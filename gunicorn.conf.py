@@ -0,0 +1,96 @@
+"""Gunicorn settings for production.
+
+Run with: gunicorn -c gunicorn.conf.py
+
+GUNICORN_WORKER_CLASS picks the worker model:
+    gthread (default)  a few processes with a thread pool each; requests that
+                       wait on the database or an OCR long-poll release the GIL
+    sync               one request per process at a time
+    gevent             cooperative green threads for many idle long-polls;
+                       needs `pip install gevent` and is never preloaded
+Counts are derived from the CPU count and can be pinned with WEB_CONCURRENCY
+(set by Heroku from the dyno size) and GUNICORN_THREADS.
+"""
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+
+cpus = multiprocessing.cpu_count()
+
+wsgi_app = 'src.main:create_app()'
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+if worker_class == 'sync':
+    default_workers, default_threads = cpus * 2 + 1, 1
+elif worker_class == 'gthread':
+    default_workers, default_threads = cpus + 1, 4
+else:
+    default_workers, default_threads = cpus + 1, 1
+workers = int(os.environ.get('WEB_CONCURRENCY', default_workers))
+threads = int(os.environ.get('GUNICORN_THREADS', default_threads))
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 1000))
+
+# Long enough for the synchronous /api/process-receipt (up to 60 s) and the ?wait= long-poll of /api/ocr/jobs/<id>/result
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 90))
+graceful_timeout = 30
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+# Recycle workers now and then so slow leaks (e.g. in cv2) cannot grow without bound
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+# Build the app once in the master, then fork. gevent has to monkey-patch
+# before anything is imported, so it loads the app per worker. A SQLite
+# schema is migrated in on_starting; an external database in the release phase
+# (see Procfile).
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') != '0' and worker_class != 'gevent'
+
+# Each worker runs its own OCR process pool; split the CPUs between them so the
+# host runs about one tesseract per CPU rather than one per CPU per worker
+os.environ.setdefault('OCR_MAX_WORKERS', str(max(1, cpus // workers)))
+
+# Workers write their request metrics here and /metrics adds them up; see src/utils/metrics.py
+os.environ.setdefault('METRICS_DIR', os.path.join(tempfile.gettempdir(), f"expense-tracker-metrics-{os.environ.get('PORT', '5000')}"))
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG')  # e.g. '-' for stdout
+errorlog = '-'
+
+
+def post_fork(server, worker):
+    # Connections opened by the master while preloading must not be shared with the children
+    if not server.cfg.preload_app:
+        return
+    from src.models.user import db
+    app = server.app.wsgi()
+    with app.app_context():
+        db.engine.dispose(close=False)
+
+
+def on_starting(server):
+    from src.utils.metrics import reset_metrics_dir
+    reset_metrics_dir()
+    migrate_sqlite()
+
+
+def migrate_sqlite():
+    # A SQLite file ships in the slug, where Heroku's release phase cannot change it,
+    # so it is migrated before any worker starts. A separate process keeps the
+    # master free of app imports and database connections (gevent workers patch after fork).
+    if not os.environ.get('DATABASE_URL', 'sqlite').startswith('sqlite'):
+        return
+    root = os.path.dirname(os.path.abspath(__file__))
+    subprocess.run([sys.executable, os.path.join(root, 'src', 'manage.py'), 'migrate'], cwd=root, check=True)
+
+
+def worker_exit(server, worker):
+    # Write out the last requests' numbers before the master marks this worker's file dead
+    from src.utils.metrics import request_metrics
+    request_metrics.flush()
+
+
+def child_exit(server, worker):
+    from src.utils.metrics import mark_process_dead
+    mark_process_dead(worker.pid)
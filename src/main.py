@@ -3,44 +3,124 @@ import sys
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from flask import Flask, send_from_directory
-from flask_cors import CORS
-from src.models.user import db
-from src.models.expense import Expense  # Import to ensure table creation
-from src.routes.user import user_bp
-from src.routes.expense import expense_bp
-from src.routes.analytics import analytics_bp
-# from src.routes.ocr import ocr_bp  # Temporarily disabled for deployment
-
-app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
-app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'asdf#FGSgvasgf$5$WGT')
-
-# Enable CORS for all routes
-CORS(app, origins=["*"])
-
-app.register_blueprint(user_bp, url_prefix='/api')
-app.register_blueprint(expense_bp, url_prefix='/api')
-app.register_blueprint(analytics_bp, url_prefix='/api')
-# app.register_blueprint(ocr_bp, url_prefix='/api')  # Temporarily disabled for deployment
-
-# uncomment if you need to use database
-app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-# Initialize database
-with app.app_context():
-    db.init_app(app)
-    db.create_all()
-
-@app.route('/')
-def index():
-    return {"message": "Personal Finance Assistant API", "status": "running"}
-
-@app.route('/health')
-def health():
-    return {"status": "healthy"}
+from importlib import import_module
+from flask import Flask
+
+# (module, blueprint) pairs, imported when an app is created rather than when
+# this module is imported. Heavy OCR dependencies (cv2, numpy, pytesseract,
+# PIL) are imported inside the functions that use them, so registering the
+# OCR routes does not load them either.
+BLUEPRINTS = [
+    ('src.routes.user', 'user_bp'),
+    ('src.routes.expense', 'expense_bp'),
+    ('src.routes.analytics', 'analytics_bp'),
+    ('src.routes.ocr', 'ocr_bp'),
+    ('src.routes.receipt', 'receipt_bp'),
+]
+
+
+def create_app(config=None):
+    """Build and configure the Flask application; `config` overrides the environment-derived settings.
+
+    The schema is not created or migrated here; run `python src/manage.py migrate` first.
+    """
+    from flask_cors import CORS
+    from src.models.user import db
+    from src.models.engine import configure_engine, database_uri, engine_options, sqlite_pragmas
+    from src.utils.blob_store import blob_store
+    from src.utils.compression import compressor
+    from src.utils.json_provider import FastJSONProvider
+    from src.utils.metrics import request_metrics
+    from src.utils.ocr_cache import ocr_cache
+    from src.utils.ocr_queue import ocr_queue
+    from src.utils.response_cache import response_cache
+
+    app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
+    app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'asdf#FGSgvasgf$5$WGT')
+    # orjson-backed JSON with native date handling (stdlib fallback)
+    app.json = FastJSONProvider(app)
+
+    # Enable CORS for all routes
+    CORS(app, origins=["*"])
+
+    for module_name, blueprint_name in BLUEPRINTS:
+        app.register_blueprint(getattr(import_module(module_name), blueprint_name), url_prefix='/api')
+
+    # DATABASE_URL selects the database (e.g. PostgreSQL on Heroku); SQLite file otherwise
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri(os.path.join(os.path.dirname(__file__), 'database', 'app.db'))
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SQLITE_PRAGMAS'] = sqlite_pragmas()
+
+    # OCR runs in a process pool behind a bounded, database-backed job queue. Every web
+    # worker has its own pool, so the CPUs are split between the WEB_CONCURRENCY workers
+    web_workers = int(os.environ.get('WEB_CONCURRENCY', 1))
+    app.config['OCR_MAX_WORKERS'] = int(os.environ.get('OCR_MAX_WORKERS', max(1, (os.cpu_count() or 1) // web_workers)))
+    app.config['OCR_MAX_PENDING'] = int(os.environ.get('OCR_MAX_PENDING', 32))
+    app.config['OCR_MAX_ATTEMPTS'] = int(os.environ.get('OCR_MAX_ATTEMPTS', 3))
+    app.config['OCR_CACHE_MAX_BYTES'] = int(os.environ.get('OCR_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+
+    # Receipt images live in a content-addressed blob store outside the static folder
+    app.config['RECEIPT_STORE_DIR'] = os.environ.get('RECEIPT_STORE_DIR')
+    app.config['RECEIPT_MAX_BYTES'] = int(os.environ.get('RECEIPT_MAX_BYTES', 10 * 1024 * 1024))
+    # Largest body POST /api/expenses/import reads (it is streamed, so this caps the work, not memory)
+    app.config['IMPORT_MAX_BYTES'] = int(os.environ.get('IMPORT_MAX_BYTES', 512 * 1024 * 1024))
+
+    # Analytics responses are cached per user; ANALYTICS_CACHE_URL (redis://...) shares them between workers
+    app.config['ANALYTICS_CACHE_URL'] = os.environ.get('ANALYTICS_CACHE_URL')
+    app.config['ANALYTICS_CACHE_MAX_BYTES'] = int(os.environ.get('ANALYTICS_CACHE_MAX_BYTES', 8 * 1024 * 1024))
+
+    # Large JSON/text responses are gzip- or brotli-compressed for clients that accept it
+    app.config['COMPRESS_MIN_BYTES'] = int(os.environ.get('COMPRESS_MIN_BYTES', 1024))
+
+    # Per-request latency/SQL metrics on /metrics; workers share them through METRICS_DIR
+    app.config['METRICS_DIR'] = os.environ.get('METRICS_DIR')
+    # Opt-in log (and cProfile dumps) of requests slower than SLOW_REQUEST_MS
+    if os.environ.get('SLOW_REQUEST_MS'):
+        app.config['SLOW_REQUEST_MS'] = float(os.environ['SLOW_REQUEST_MS'])
+    app.config['SLOW_REQUEST_PROFILE_DIR'] = os.environ.get('SLOW_REQUEST_PROFILE_DIR')
+
+    app.config.update(config or {})
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config['SQLALCHEMY_DATABASE_URI']))
+
+    # Initialize database
+    with app.app_context():
+        db.init_app(app)
+        configure_engine(db.engine, app.config['SQLITE_PRAGMAS'])
+
+    blob_store.init_app(app)
+    ocr_cache.init_app(app)
+    ocr_queue.init_app(app)
+    response_cache.init_app(app)
+    # Registered before the compressor so it sees the compressed response size
+    request_metrics.init_app(app)
+    compressor.init_app(app)
+
+    @app.route('/')
+    def index():
+        return {"message": "Personal Finance Assistant API", "status": "running"}
+
+    @app.route('/health')
+    def health():
+        return {"status": "healthy"}
+
+    return app
+
+
+def __getattr__(name):
+    # `from src.main import app` (src/manage.py, scripts) builds the app on first
+    # use, so importing this module alone stays cheap; gunicorn calls create_app()
+    if name == 'app':
+        app = globals()['app'] = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 if __name__ == '__main__':
+    # Flask's development server; production runs under gunicorn -c gunicorn.conf.py
+    from src.models.migrations import run_migrations
+
+    app = create_app()
+    with app.app_context():
+        run_migrations()
     port = int(os.environ.get('PORT', 5000))
     app.run(host='0.0.0.0', port=port, debug=False)
-
@@ -0,0 +1,83 @@
+"""Maintenance commands.
+
+Usage:
+    python src/manage.py migrate
+    python src/manage.py migrate-release
+    python src/manage.py rebuild-rollups [user_id]
+    python src/manage.py verify-rollups [user_id]
+    python src/manage.py sweep-receipts
+    python src/manage.py rebuild-search
+"""
+import os
+import sys
+# DON'T CHANGE THIS !!!
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from src.main import create_app
+from src.models.migrations import run_migrations
+from src.models.user import db
+from src.models.expense_search import rebuild_search_index
+from src.models.rollup import rebuild_rollups, verify_rollups
+from src.utils.blob_store import blob_store
+
+
+def migrate():
+    added, created = run_migrations()
+    print(f"Added columns: {', '.join(added) if added else 'none'}")
+    print(f"Created indexes: {', '.join(created) if created else 'none'}")
+    return 0
+
+
+def migrate_release():
+    # The release phase's filesystem changes are discarded; the web dynos migrate
+    # their own copy of a bundled SQLite file on start (see gunicorn.conf.py)
+    if db.engine.dialect.name == 'sqlite':
+        print('SQLite database: skipped, migrated when the web process starts')
+        return 0
+    return migrate()
+
+
+def rebuild(user_id=None):
+    rebuild_rollups(user_id)
+    print('Rollups rebuilt')
+    return 0
+
+
+def verify(user_id=None):
+    mismatches = verify_rollups(user_id)
+    for table, key, want, have in mismatches:
+        print(f'{table} {key}: expected {want}, stored {have}')
+    print('OK' if not mismatches else f'{len(mismatches)} mismatching bucket(s)')
+    return 1 if mismatches else 0
+
+
+def sweep_receipts():
+    swept = blob_store.sweep_orphans()
+    print(f'Removed {swept} unattached receipt(s)')
+    return 0
+
+
+def rebuild_search():
+    rebuild_search_index()
+    print('Search index rebuilt')
+    return 0
+
+
+COMMANDS = {
+    'migrate': migrate,
+    'migrate-release': migrate_release,
+    'rebuild-rollups': rebuild,
+    'verify-rollups': verify,
+    'sweep-receipts': sweep_receipts,
+    'rebuild-search': rebuild_search,
+}
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2 or sys.argv[1] not in COMMANDS:
+        print(__doc__)
+        sys.exit(2)
+
+    args = [int(arg) for arg in sys.argv[2:]]
+    app = create_app()
+    with app.app_context():
+        sys.exit(COMMANDS[sys.argv[1]](*args))
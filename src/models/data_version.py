@@ -0,0 +1,38 @@
+"""Per-user version counter for data derived from expenses.
+
+Every write path that changes a user's expenses bumps the counter in the same
+transaction, so any worker can tell whether a cached analytics response is
+still current with one primary-key lookup.
+"""
+from sqlalchemy import select
+from src.models.user import db
+from src.models.engine import upsert_insert
+
+
+class DataVersion(db.Model):
+    __tablename__ = 'data_version'
+
+    user_id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<DataVersion user {self.user_id}: {self.version}>'
+
+
+def bump_data_versions(session, user_ids):
+    """Increment the version of each user within the current transaction"""
+    params = [{'user_id': user_id, 'version': 1} for user_id in set(user_ids)]
+    if not params:
+        return
+    stmt = upsert_insert(session, DataVersion)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['user_id'],
+        set_={'version': DataVersion.version + 1}
+    )
+    session.execute(stmt, params)
+
+
+def get_data_version(session, user_id):
+    """Current version for a user; 0 until their first write"""
+    version = session.execute(select(DataVersion.version).where(DataVersion.user_id == user_id)).scalar()
+    return version or 0
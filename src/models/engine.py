@@ -0,0 +1,84 @@
+"""Database engine settings, read from the environment.
+
+DATABASE_URL selects the database; without it the bundled SQLite file is
+used. Server databases get a connection pool sized by DB_POOL_SIZE,
+DB_MAX_OVERFLOW, DB_POOL_TIMEOUT and DB_POOL_RECYCLE, with pre-ping on by
+default so connections dropped by the server are replaced transparently.
+
+SQLite connections are tuned by PRAGMAs on connect: WAL lets readers carry
+on while one writer commits, synchronous=NORMAL is safe under WAL and avoids
+an fsync per commit, and busy_timeout makes writers from other gunicorn
+workers wait for the lock instead of failing with "database is locked".
+Set SQLITE_TUNING=0 to connect with SQLite's defaults.
+"""
+import os
+from sqlalchemy import event
+
+DEFAULT_SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 10000,        # milliseconds
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,     # negative means KiB, i.e. 64 MiB per connection
+    'temp_store': 'MEMORY',
+}
+
+
+def database_uri(default_sqlite_path):
+    """SQLAlchemy URL from DATABASE_URL, falling back to a local SQLite file"""
+    url = os.environ.get('DATABASE_URL')
+    if not url:
+        return f"sqlite:///{default_sqlite_path}"
+    # Heroku still hands out postgres:// URLs, which SQLAlchemy no longer accepts
+    if url.startswith('postgres://'):
+        url = 'postgresql://' + url[len('postgres://'):]
+    return url
+
+
+def engine_options(uri):
+    """create_engine() keyword arguments for the given database URL"""
+    if uri.startswith('sqlite'):
+        return {}
+    return {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 30)),
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+        'pool_pre_ping': os.environ.get('DB_POOL_PRE_PING', '1') != '0',
+    }
+
+
+def sqlite_pragmas():
+    """PRAGMAs to run on every new SQLite connection, overridable as SQLITE_<NAME>"""
+    if os.environ.get('SQLITE_TUNING', '1') == '0':
+        return {}
+    return {
+        name: os.environ.get(f'SQLITE_{name.upper()}', default)
+        for name, default in DEFAULT_SQLITE_PRAGMAS.items()
+    }
+
+
+def configure_engine(engine, pragmas):
+    """Apply the SQLite PRAGMAs to each connection the engine opens"""
+    if engine.dialect.name != 'sqlite' or not pragmas:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+
+
+def upsert_insert(session, model):
+    """INSERT .. ON CONFLICT construct for the session's dialect.
+
+    Only the dialect in use is imported; loading the PostgreSQL dialect on a
+    SQLite deployment costs tens of milliseconds at startup for nothing.
+    """
+    if session.get_bind().dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(model)
@@ -1,34 +1,113 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
+from operator import itemgetter
 from src.models.user import db
+from src.utils.money import DEFAULT_CURRENCY, cents_to_number, format_cents
 
 class Expense(db.Model):
+    __table_args__ = (
+        # Serves the expense list (keyset on date, id), month ranges and daily trends
+        db.Index('ix_expense_user_date', 'user_id', 'date', 'id'),
+        # Serves category filters and per-category breakdowns within a month
+        db.Index('ix_expense_user_category_date', 'user_id', 'category', 'date'),
+        # Serves the payment method breakdown
+        db.Index('ix_expense_user_payment_method', 'user_id', 'payment_method'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    amount = db.Column(db.Float, nullable=False)
+    # Exact amount in minor units (cents) and its ISO 4217 currency; see src/utils/money.py
+    amount_cents = db.Column(db.BigInteger, nullable=False, server_default=db.text('0'))
+    currency = db.Column(db.String(3), nullable=False, default=DEFAULT_CURRENCY,
+                         server_default=db.text(f"'{DEFAULT_CURRENCY}'"))
     category = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text, nullable=True)
     date = db.Column(db.Date, nullable=False, default=datetime.utcnow().date())
     payment_method = db.Column(db.String(50), nullable=False)
     receipt_image_path = db.Column(db.String(255), nullable=True)
+    # Content hash of the receipt in the blob store (see src/utils/blob_store.py)
+    receipt_blob_hash = db.Column(db.String(64), nullable=True, index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
-    # Relationship with User
-    user = db.relationship('User', backref=db.backref('expenses', lazy=True))
+    # Relationship with User. Neither side lazy-loads: touching expense.user or user.expenses
+    # without selectinload() in the query raises instead of issuing one query per row.
+    # User deletion removes expenses with set-based SQL (see routes/user.py), so the ORM never loads them.
+    user = db.relationship('User', lazy='raise', backref=db.backref('expenses', lazy='raise', passive_deletes='all'))
 
     def __repr__(self):
-        return f'<Expense {self.id}: {self.amount} - {self.category}>'
+        return f'<Expense {self.id}: {format_cents(self.amount_cents)} {self.currency} - {self.category}>'
 
     def to_dict(self):
         return {
             'id': self.id,
             'user_id': self.user_id,
-            'amount': self.amount,
+            'amount': cents_to_number(self.amount_cents),
+            'amount_decimal': format_cents(self.amount_cents),
+            'amount_cents': self.amount_cents,
+            'currency': self.currency,
             'category': self.category,
             'description': self.description,
             'date': self.date.isoformat() if self.date else None,
             'payment_method': self.payment_method,
             'receipt_image_path': self.receipt_image_path,
+            'receipt_blob_hash': self.receipt_blob_hash,
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
+    @staticmethod
+    def row_to_dict(row, fields):
+        """Serialize a column-projected query row, keeping only the requested fields"""
+        result = {}
+        for field in fields:
+            if field == 'amount':
+                value = cents_to_number(row.amount_cents)
+            elif field == 'amount_decimal':
+                value = format_cents(row.amount_cents)
+            else:
+                value = getattr(row, field)
+                if field in ('date', 'created_at') and value is not None:
+                    value = value.isoformat()
+            result[field] = value
+        return result
+
+    @staticmethod
+    def serialize_rows(rows, fields):
+        """Serialize column-projected query rows for jsonify without a Python call per field.
+
+        Dates are left as date objects; the app's JSON provider writes them as ISO 8601.
+        """
+        if not rows:
+            return []
+        names = rows[0]._fields
+        stored = [field for field in fields if field not in DERIVED_FIELDS]
+        derived = [DERIVED_SERIALIZERS[field] for field in fields if field in DERIVED_FIELDS]
+        keys = [field for field in fields if field in DERIVED_FIELDS] + stored
+        positions = [names.index(field) for field in stored]
+        if len(positions) == 1:
+            position = positions[0]
+            stored_values = lambda row: (row[position],)
+        else:
+            stored_values = itemgetter(*positions) if positions else lambda row: ()
+        if not derived:
+            return [dict(zip(keys, stored_values(row))) for row in rows]
+        cents = names.index('amount_cents')
+        return [
+            dict(zip(keys, (*[serialize(row[cents]) for serialize in derived], *stored_values(row))))
+            for row in rows
+        ]
+
+    @staticmethod
+    def columns_for(fields):
+        """Stored columns to select in order to serialize the given fields"""
+        return [getattr(Expense, name) for name in dict.fromkeys(DERIVED_FIELDS.get(field, field) for field in fields)]
+
+
+# Columns that may be requested through the `fields=` projection
+EXPENSE_FIELDS = (
+    'id', 'user_id', 'amount', 'amount_decimal', 'amount_cents', 'currency', 'category', 'description', 'date',
+    'payment_method', 'receipt_image_path', 'receipt_blob_hash', 'created_at'
+)
+# Fields computed from another column when serialized
+DERIVED_FIELDS = {'amount': 'amount_cents', 'amount_decimal': 'amount_cents'}
+DERIVED_SERIALIZERS = {'amount': cents_to_number, 'amount_decimal': format_cents}
+
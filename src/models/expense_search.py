@@ -0,0 +1,122 @@
+"""Full-text search over expense descriptions and categories.
+
+On SQLite an FTS5 table indexes each expense's description and category
+(merchant names from receipts end up in the description), plus an `owner`
+token ("u<user_id>") so a search only reads the postings of that user's
+expenses. It is an external content table: it stores only the index and
+reads the text back through the `expense_search_source` view. Triggers keep
+it in step with every insert, update and delete, including bulk Core
+statements. `python src/manage.py migrate` creates it and
+backfills existing rows.
+
+Other databases have no FTS5, so search falls back to unindexed ILIKE
+matching, ordered by date.
+
+Rebuild the index with:
+    python src/manage.py rebuild-search
+"""
+import re
+from sqlalchemy import inspect, literal_column, or_, select, text
+from src.models.user import db
+from src.models.expense import Expense
+
+SEARCH_TABLE = 'expense_fts'
+MAX_SEARCH_TERMS = 8
+SEARCH_SOURCE = 'expense_search_source'
+# bm25 column weights: the owner token never counts, a hit in the description counts for more than one in the category
+RANK = literal_column(f'bm25({SEARCH_TABLE}, 0.0, 2.0, 1.0)')
+
+_TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+_SEARCH_DDL = [
+    f"""CREATE VIEW IF NOT EXISTS {SEARCH_SOURCE} AS
+        SELECT id, 'u' || user_id AS owner, description, category FROM expense""",
+    # Prefix indexes for 2 and 3 characters keep short prefix queries ("ub*") off a full term scan
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(
+        owner, description, category,
+        content='{SEARCH_SOURCE}', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS expense_fts_insert AFTER INSERT ON expense BEGIN
+        INSERT INTO {SEARCH_TABLE}(rowid, owner, description, category)
+        VALUES (new.id, 'u' || new.user_id, new.description, new.category);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS expense_fts_delete AFTER DELETE ON expense BEGIN
+        INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, owner, description, category)
+        VALUES ('delete', old.id, 'u' || old.user_id, old.description, old.category);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS expense_fts_update AFTER UPDATE OF user_id, description, category ON expense BEGIN
+        INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, owner, description, category)
+        VALUES ('delete', old.id, 'u' || old.user_id, old.description, old.category);
+        INSERT INTO {SEARCH_TABLE}(rowid, owner, description, category)
+        VALUES (new.id, 'u' || new.user_id, new.description, new.category);
+    END""",
+]
+
+
+def search_supported():
+    """Whether the database has the FTS5 index (SQLite only)"""
+    return db.engine.dialect.name == 'sqlite'
+
+
+def search_terms(query):
+    """Words of a search string, lowercased, at most MAX_SEARCH_TERMS"""
+    return [term.lower() for term in _TERM_RE.findall(query or '')][:MAX_SEARCH_TERMS]
+
+
+def match_expression(terms, user_id):
+    """FTS5 query for the user's expenses containing every term, the last one as a prefix.
+
+    Terms are quoted so user input is never parsed as FTS5 syntax; the prefix
+    on the last term lets results update while the user is still typing.
+    """
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += '*'
+    return f'owner : "u{int(user_id)}" AND {{description category}} : ({" ".join(quoted)})'
+
+
+def create_search_index():
+    """Create the FTS5 table and its triggers if missing, backfilling existing expenses.
+
+    Returns True if the index was created.
+    """
+    if not search_supported():
+        return False
+    created = not inspect(db.engine).has_table(SEARCH_TABLE)
+    with db.engine.begin() as connection:
+        for ddl in _SEARCH_DDL:
+            connection.exec_driver_sql(ddl)
+        if created:
+            connection.exec_driver_sql(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('rebuild')")
+    return created
+
+
+def rebuild_search_index():
+    """Re-read every expense into the FTS5 index and merge its segments"""
+    with db.engine.begin() as connection:
+        connection.exec_driver_sql(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('rebuild')")
+        connection.exec_driver_sql(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('optimize')")
+
+
+def search_matches(terms, user_id):
+    """Selectable of (id, score) for the user's expenses matching all terms; lower scores rank higher.
+
+    Without FTS5 the score is always 0 and the terms are matched with ILIKE.
+    """
+    if search_supported():
+        # Materialized so the index is read once up front; as a plain subquery SQLite
+        # may walk the user's expenses in date order and run the MATCH for each one
+        return (
+            select(literal_column('rowid').label('id'), RANK.label('score'))
+            .select_from(text(SEARCH_TABLE))
+            .where(text(f'{SEARCH_TABLE} MATCH :match').bindparams(match=match_expression(terms, user_id)))
+            .cte('matches')
+            .prefix_with('MATERIALIZED')
+        )
+    conditions = [
+        or_(Expense.description.icontains(term, autoescape=True), Expense.category.icontains(term, autoescape=True))
+        for term in terms
+    ]
+    return select(Expense.id.label('id'), literal_column('0.0').label('score')).where(
+        Expense.user_id == user_id, *conditions
+    ).subquery('matches')
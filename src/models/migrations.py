@@ -0,0 +1,115 @@
+"""Idempotent schema migrations for existing databases.
+
+`db.create_all()` only creates missing tables; it never touches tables that
+already exist, so columns and indexes added to the models later have to be
+brought onto old `app.db` files here. Every step checks the live schema first,
+so running it again is a no-op.
+
+Migrations are a deploy step, not part of app startup: python src/manage.py migrate
+On Heroku the release phase migrates an external DATABASE_URL (files it writes
+are thrown away, so it skips SQLite), and gunicorn.conf.py migrates a SQLite
+database in the master before the workers fork.
+"""
+from sqlalchemy import inspect, text
+from src.models.user import db
+from src.models.expense import Expense  # Import to ensure table creation
+from src.models.ocr_job import OcrJob  # Import to ensure table creation
+from src.models.data_version import DataVersion  # Import to ensure table creation
+from src.models.ocr_cache import OcrCacheEntry  # Import to ensure table creation
+from src.models.receipt_blob import ReceiptBlob  # Import to ensure table creation
+from src.models.rollup import ROLLUP_MODELS, rebuild_rollups
+from src.models.expense_search import SEARCH_TABLE, create_search_index
+from src.utils.money import to_cents
+
+
+def add_missing_columns():
+    """Add model-declared columns that are missing from existing tables"""
+    inspector = inspect(db.engine)
+    preparer = db.engine.dialect.identifier_preparer
+    added = []
+    for table in db.metadata.sorted_tables:
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            if not column.nullable and column.server_default is None:
+                raise RuntimeError(f'Cannot add NOT NULL column {table.name}.{column.name} without a server default')
+            ddl = (
+                f'ALTER TABLE {preparer.quote(table.name)} ADD COLUMN {preparer.quote(column.name)} '
+                f'{column.type.compile(dialect=db.engine.dialect)}'
+            )
+            if column.server_default is not None:
+                ddl += f' DEFAULT {column.server_default.arg}'
+            if not column.nullable:
+                ddl += ' NOT NULL'
+            with db.engine.begin() as connection:
+                connection.exec_driver_sql(ddl)
+            added.append(f'{table.name}.{column.name}')
+    return added
+
+
+def create_missing_indexes():
+    """Create any model-declared index that is missing from the database"""
+    inspector = inspect(db.engine)
+    created = []
+    for table in db.metadata.sorted_tables:
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(bind=db.engine)
+                created.append(index.name)
+    return created
+
+
+def drop_float_rollups():
+    """Drop rollup tables that still hold float totals; they are recreated and rebuilt from the expenses"""
+    inspector = inspect(db.engine)
+    dropped = []
+    for model in ROLLUP_MODELS:
+        table = model.__table__
+        if not inspector.has_table(table.name):
+            continue
+        if 'total_amount' in {column['name'] for column in inspector.get_columns(table.name)}:
+            table.drop(bind=db.engine)
+            dropped.append(table.name)
+    return dropped
+
+
+def convert_float_amounts(batch_size=10000):
+    """Move expense.amount (float) into the integer amount_cents column and drop the float column"""
+    if 'amount' not in {column['name'] for column in inspect(db.engine).get_columns('expense')}:
+        return False
+    # Rounded by to_cents, like amounts sent to the API: ROUND(amount * 100) in SQL
+    # would see 1.005 * 100 as 100.4999... and round it down
+    select_batch = text('SELECT id, amount FROM expense WHERE id > :after ORDER BY id LIMIT :limit')
+    update_cents = text('UPDATE expense SET amount_cents = :cents WHERE id = :id')
+    with db.engine.begin() as connection:
+        after = 0
+        while True:
+            rows = connection.execute(select_batch, {'after': after, 'limit': batch_size}).all()
+            if not rows:
+                break
+            connection.execute(update_cents, [{'id': row.id, 'cents': to_cents(row.amount)} for row in rows])
+            after = rows[-1].id
+        connection.exec_driver_sql('ALTER TABLE expense DROP COLUMN amount')
+    return True
+
+
+def run_migrations():
+    """Bring the database schema up to date with the models"""
+    # Dropped rollup tables are recreated below and, being new, rebuilt
+    drop_float_rollups()
+    existing_tables = set(inspect(db.engine).get_table_names())
+    db.create_all()
+    added = add_missing_columns()
+    if convert_float_amounts():
+        added.append('expense.amount -> expense.amount_cents')
+    created = create_missing_indexes()
+    if create_search_index():
+        created.append(SEARCH_TABLE)
+
+    # Rollup tables added to an existing database start out empty; backfill them
+    if any(model.__tablename__ not in existing_tables for model in ROLLUP_MODELS):
+        rebuild_rollups()
+    return added, created
+
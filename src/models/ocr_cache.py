@@ -0,0 +1,16 @@
+from datetime import datetime
+from src.models.user import db
+
+
+class OcrCacheEntry(db.Model):
+    __tablename__ = 'ocr_cache'
+
+    key = db.Column(db.String(64), primary_key=True)
+    result = db.Column(db.Text, nullable=False)
+    size = db.Column(db.Integer, nullable=False)
+    hits = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_used_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    def __repr__(self):
+        return f'<OcrCacheEntry {self.key[:12]}: {self.size} bytes>'
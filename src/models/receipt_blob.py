@@ -0,0 +1,27 @@
+from datetime import datetime
+from src.models.user import db
+
+
+class ReceiptBlob(db.Model):
+    __tablename__ = 'receipt_blob'
+
+    # SHA-256 of the file contents; also its name in the blob store
+    hash = db.Column(db.String(64), primary_key=True)
+    size = db.Column(db.Integer, nullable=False)
+    content_type = db.Column(db.String(100), nullable=False)
+    # Number of expenses pointing at this blob
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_used_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    def __repr__(self):
+        return f'<ReceiptBlob {self.hash[:12]}: {self.size} bytes, {self.ref_count} refs>'
+
+    def to_dict(self):
+        return {
+            'hash': self.hash,
+            'size': self.size,
+            'content_type': self.content_type,
+            'ref_count': self.ref_count,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
@@ -0,0 +1,213 @@
+"""Per-user aggregate tables kept in step with the expense table.
+
+Each write path in `src/routes/expense.py` passes the expenses it adds and
+removes to `apply_expense_changes` before committing, so the rollups change in
+the same transaction as the expense rows. The analytics endpoints read these
+tables instead of re-aggregating the whole expense history.
+
+Rebuild or check the tables with:
+    python src/manage.py rebuild-rollups [user_id]
+    python src/manage.py verify-rollups [user_id]
+"""
+from sqlalchemy import bindparam, delete, extract, func, insert, select
+from src.models.user import db
+from src.models.engine import upsert_insert
+from src.models.data_version import bump_data_versions
+from src.models.expense import Expense
+
+
+class MonthlyRollup(db.Model):
+    __tablename__ = 'rollup_month'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    year = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.Integer, primary_key=True)
+    total_cents = db.Column(db.BigInteger, nullable=False, default=0)
+    transaction_count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class CategoryMonthRollup(db.Model):
+    __tablename__ = 'rollup_category_month'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    year = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.Integer, primary_key=True)
+    category = db.Column(db.String(100), primary_key=True)
+    total_cents = db.Column(db.BigInteger, nullable=False, default=0)
+    transaction_count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class DailyRollup(db.Model):
+    __tablename__ = 'rollup_day'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    date = db.Column(db.Date, primary_key=True)
+    total_cents = db.Column(db.BigInteger, nullable=False, default=0)
+    transaction_count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class PaymentMethodRollup(db.Model):
+    __tablename__ = 'rollup_payment_method'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    payment_method = db.Column(db.String(50), primary_key=True)
+    total_cents = db.Column(db.BigInteger, nullable=False, default=0)
+    transaction_count = db.Column(db.Integer, nullable=False, default=0)
+
+
+ROLLUP_MODELS = (MonthlyRollup, CategoryMonthRollup, DailyRollup, PaymentMethodRollup)
+
+
+def expense_entry(expense):
+    """Capture the fields of an expense that the rollups depend on"""
+    return (expense.user_id, expense.date, expense.category, expense.payment_method, expense.amount_cents)
+
+
+def _bucket_keys(entry):
+    user_id, day, category, payment_method, _ = entry
+    return (
+        (MonthlyRollup, (('user_id', user_id), ('year', day.year), ('month', day.month))),
+        (CategoryMonthRollup, (('user_id', user_id), ('year', day.year), ('month', day.month), ('category', category))),
+        (DailyRollup, (('user_id', user_id), ('date', day))),
+        (PaymentMethodRollup, (('user_id', user_id), ('payment_method', payment_method))),
+    )
+
+
+def _upsert_many(session, model, key_names, params):
+    stmt = upsert_insert(session, model)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(key_names),
+        set_={
+            'total_cents': model.total_cents + stmt.excluded.total_cents,
+            'transaction_count': model.transaction_count + stmt.excluded.transaction_count,
+        }
+    )
+    session.execute(stmt, params)
+
+
+def apply_expense_changes(session, added=(), removed=()):
+    """Fold added/removed expense entries into the rollup tables within the current transaction"""
+    totals = {}
+    for entries, sign in ((added, 1), (removed, -1)):
+        for user_id, day, category, payment_method, cents in entries:
+            key = (user_id, day, category, payment_method)
+            total_cents, transaction_count = totals.get(key, (0, 0))
+            totals[key] = (total_cents + sign * cents, transaction_count + sign)
+    apply_expense_totals(session, totals)
+
+
+def expense_totals(session, *conditions):
+    """Sum the matching expenses into {(user_id, date, category, payment_method): (cents, count)} with one GROUP BY"""
+    rows = session.execute(
+        select(Expense.user_id, Expense.date, Expense.category, Expense.payment_method,
+               func.sum(Expense.amount_cents), func.count())
+        .where(*conditions)
+        .group_by(Expense.user_id, Expense.date, Expense.category, Expense.payment_method)
+    )
+    return {(user_id, day, category, payment_method): (int(cents), count)
+            for user_id, day, category, payment_method, cents, count in rows}
+
+
+def apply_expense_totals(session, totals):
+    """Apply pre-aggregated {(user_id, date, category, payment_method): (cents, count)} deltas"""
+    deltas = {}
+    for (user_id, day, category, payment_method), (cents, count) in totals.items():
+        for model, key in _bucket_keys((user_id, day, category, payment_method, cents)):
+            total_cents, transaction_count = deltas.get((model, key), (0, 0))
+            deltas[(model, key)] = (total_cents + cents, transaction_count + count)
+
+    # One executemany upsert per rollup table, however many buckets were touched
+    upserts = {}
+    emptied = {}
+    for (model, key), (total_cents, transaction_count) in deltas.items():
+        if total_cents == 0 and transaction_count == 0:
+            continue  # e.g. an update that did not move the expense out of this bucket
+        key_names = tuple(name for name, _ in key)
+        params = dict(key)
+        upserts.setdefault((model, key_names), []).append(
+            dict(params, total_cents=total_cents, transaction_count=transaction_count)
+        )
+        if transaction_count < 0:
+            emptied.setdefault((model, key_names), []).append(params)
+
+    for (model, key_names), params in upserts.items():
+        _upsert_many(session, model, key_names, params)
+
+    # Drop buckets that no longer hold any expense
+    for (model, key_names), params in emptied.items():
+        stmt = delete(model).where(
+            *[getattr(model, name) == bindparam(f'key_{name}') for name in key_names],
+            model.transaction_count <= 0
+        )
+        # Core-level executemany; the ORM session does not do bulk DELETE with parameter lists
+        session.connection().execute(stmt, [{f'key_{name}': value for name, value in key.items()} for key in params])
+
+
+def delete_user_rollups(session, user_id):
+    """Drop every rollup bucket of a user within the current transaction"""
+    for model in ROLLUP_MODELS:
+        session.execute(delete(model).where(model.user_id == user_id))
+
+
+def _source_queries(user_id=None):
+    """Aggregate the expense table at each rollup grain, keyed by rollup model"""
+    year = extract('year', Expense.date)
+    month = extract('month', Expense.date)
+    total = func.sum(Expense.amount_cents)
+    count = func.count(Expense.id)
+    queries = {
+        MonthlyRollup: select(Expense.user_id, year, month, total, count).group_by(Expense.user_id, year, month),
+        CategoryMonthRollup: select(Expense.user_id, year, month, Expense.category, total, count).group_by(
+            Expense.user_id, year, month, Expense.category
+        ),
+        DailyRollup: select(Expense.user_id, Expense.date, total, count).group_by(Expense.user_id, Expense.date),
+        PaymentMethodRollup: select(Expense.user_id, Expense.payment_method, total, count).group_by(
+            Expense.user_id, Expense.payment_method
+        ),
+    }
+    if user_id is not None:
+        queries = {model: query.where(Expense.user_id == user_id) for model, query in queries.items()}
+    return queries
+
+
+def _columns(model):
+    return [column.name for column in model.__table__.columns]
+
+
+def rebuild_rollups(user_id=None):
+    """Recompute the rollup tables from the expense table, for one user or everyone"""
+    if user_id is not None:
+        user_ids = [user_id]
+    else:
+        user_ids = db.session.execute(
+            select(Expense.user_id).union(select(MonthlyRollup.user_id))
+        ).scalars().all()
+    for model, query in _source_queries(user_id).items():
+        stmt = delete(model)
+        if user_id is not None:
+            stmt = stmt.where(model.user_id == user_id)
+        db.session.execute(stmt)
+        db.session.execute(insert(model).from_select(_columns(model), query))
+    # Cached analytics for these users may have been computed from the old rollups
+    bump_data_versions(db.session, user_ids)
+    db.session.commit()
+
+
+def verify_rollups(user_id=None):
+    """Compare the rollup tables with a fresh aggregation and return every mismatching bucket"""
+    mismatches = []
+    for model, query in _source_queries(user_id).items():
+        key_length = len(_columns(model)) - 2
+        expected = {tuple(row[:key_length]): tuple(row[key_length:]) for row in db.session.execute(query)}
+        stored_query = select(*[getattr(model, name) for name in _columns(model)])
+        if user_id is not None:
+            stored_query = stored_query.where(model.user_id == user_id)
+        stored = {tuple(row[:key_length]): tuple(row[key_length:]) for row in db.session.execute(stored_query)}
+
+        for key in expected.keys() | stored.keys():
+            want = expected.get(key, (0, 0))
+            have = stored.get(key, (0, 0))
+            if want != have:
+                mismatches.append((model.__tablename__, key, want, have))
+    return mismatches
+
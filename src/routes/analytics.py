@@ -1,30 +1,26 @@
 from flask import Blueprint, jsonify, request
-from sqlalchemy import func, extract
-from src.models.expense import Expense, db
-from collections import defaultdict
+from sqlalchemy import String, cast, func, literal, select, union_all
+from src.models.expense import EXPENSE_FIELDS, Expense, db
+from src.models.rollup import CategoryMonthRollup, DailyRollup, MonthlyRollup, PaymentMethodRollup
+from src.utils.dates import month_range
+from src.routes.expense import expense_page
+from src.utils.money import cents_to_number, format_cents
+from src.utils.pagination import parse_limit
+from src.utils.response_cache import cached_per_user, response_cache
+from datetime import date
 import calendar
 
 analytics_bp = Blueprint('analytics', __name__)
 
-@analytics_bp.route('/metrics/monthly', methods=['GET'])
-def get_monthly_metrics():
-    # For now, we'll assume user_id=1 (we'll add proper auth later)
-    user_id = request.args.get('user_id', 1, type=int)
-    
-    # Get monthly spending totals
-    monthly_data = db.session.query(
-        extract('year', Expense.date).label('year'),
-        extract('month', Expense.date).label('month'),
-        func.sum(Expense.amount).label('total')
-    ).filter_by(user_id=user_id).group_by(
-        extract('year', Expense.date),
-        extract('month', Expense.date)
-    ).order_by(
-        extract('year', Expense.date),
-        extract('month', Expense.date)
-    ).all()
-    
-    # Format the data
+TREND_DAYS = 30
+DASHBOARD_PARTS = ('monthly', 'category', 'trends', 'expenses')
+MAX_ROLLING_WINDOW = 365
+# Longest start..end range /metrics/rolling reports day by day (about ten years)
+MAX_ROLLING_DAYS = 3660
+DEFAULT_PERCENTILES = (50, 90, 99)
+
+def format_monthly(monthly_data):
+    """Monthly summary from (year, month, total_cents) rows in date order"""
     monthly_summary = []
     for year, month, total in monthly_data:
         month_name = calendar.month_name[int(month)]
@@ -32,98 +28,307 @@ def get_monthly_metrics():
             'year': int(year),
             'month': int(month),
             'month_name': month_name,
-            'total_amount': float(total),
-            'period': f"{year}-{month:02d}"
+            'total_amount': cents_to_number(total),
+            'total_amount_decimal': format_cents(total),
+            'period': f"{year}-{int(month):02d}"
         })
     
-    return jsonify({
+    return {
         'monthly_summary': monthly_summary,
         'total_months': len(monthly_summary)
-    })
+    }
 
-@analytics_bp.route('/metrics/category', methods=['GET'])
-def get_category_metrics():
-    # For now, we'll assume user_id=1 (we'll add proper auth later)
-    user_id = request.args.get('user_id', 1, type=int)
-    month = request.args.get('month')  # Format: YYYY-MM
-    
-    query = db.session.query(
-        Expense.category,
-        func.sum(Expense.amount).label('total'),
-        func.count(Expense.id).label('count')
-    ).filter_by(user_id=user_id)
-    
-    if month:
-        try:
-            year, month_num = map(int, month.split('-'))
-            query = query.filter(
-                extract('year', Expense.date) == year,
-                extract('month', Expense.date) == month_num
-            )
-        except ValueError:
-            return jsonify({'error': 'Invalid month format. Use YYYY-MM'}), 400
-    
-    category_data = query.group_by(Expense.category).order_by(func.sum(Expense.amount).desc()).all()
-    
-    # Format the data
+def format_category(category_data):
+    """Category summary from (category, total_cents, count) rows, largest first"""
+    # Sums are integer cents, so the grand total is exact
+    total_cents = sum(total for _, total, _ in category_data)
+    
     category_summary = []
-    total_amount = 0
     for category, total, count in category_data:
         category_summary.append({
             'category': category,
-            'total_amount': float(total),
+            'total_amount': cents_to_number(total),
+            'total_amount_decimal': format_cents(total),
             'transaction_count': count,
-            'average_amount': float(total) / count if count > 0 else 0
+            'average_amount': round(total / count / 100, 2) if count > 0 else 0,
+            'percentage': (total / total_cents * 100) if total_cents > 0 else 0
         })
-        total_amount += float(total)
-    
-    # Calculate percentages
-    for item in category_summary:
-        item['percentage'] = (item['total_amount'] / total_amount * 100) if total_amount > 0 else 0
     
-    return jsonify({
+    return {
         'category_summary': category_summary,
-        'total_amount': total_amount,
+        'total_amount': cents_to_number(total_cents),
+        'total_amount_decimal': format_cents(total_cents),
         'total_categories': len(category_summary)
-    })
+    }
+
+def format_trends(daily_data, payment_data):
+    """Trends from (date, total_cents) rows, newest first, and (payment_method, total_cents, count) rows"""
+    daily_trends = []
+    for day, total in daily_data:
+        daily_trends.append({
+            'date': day.isoformat(),
+            'amount': cents_to_number(total),
+            'amount_decimal': format_cents(total)
+        })
+    
+    payment_methods = []
+    for method, total, count in payment_data:
+        payment_methods.append({
+            'payment_method': method,
+            'total_amount': cents_to_number(total),
+            'total_amount_decimal': format_cents(total),
+            'transaction_count': count
+        })
+    
+    return {
+        'daily_trends': daily_trends,
+        'payment_methods': payment_methods
+    }
+
+def category_query(user_id, month_start=None):
+    """Per-category totals, all time or for the month starting at month_start"""
+    query = select(
+        CategoryMonthRollup.category,
+        func.sum(CategoryMonthRollup.total_cents).label('total'),
+        func.sum(CategoryMonthRollup.transaction_count).label('count')
+    ).where(CategoryMonthRollup.user_id == user_id)
+    if month_start:
+        query = query.where(CategoryMonthRollup.year == month_start.year, CategoryMonthRollup.month == month_start.month)
+    return query.group_by(CategoryMonthRollup.category)
+
+def parse_month():
+    """Read the optional month (YYYY-MM) argument, returning (first day or None, error response)"""
+    month = request.args.get('month')
+    if not month:
+        return None, None
+    try:
+        start, _ = month_range(month)
+    except ValueError:
+        return None, (jsonify({'error': 'Invalid month format. Use YYYY-MM'}), 400)
+    return start, None
+
+@analytics_bp.route('/metrics/monthly', methods=['GET'])
+@cached_per_user
+def get_monthly_metrics():
+    # For now, we'll assume user_id=1 (we'll add proper auth later)
+    user_id = request.args.get('user_id', 1, type=int)
+    
+    # Get monthly spending totals from the month rollup
+    monthly_data = db.session.query(
+        MonthlyRollup.year,
+        MonthlyRollup.month,
+        MonthlyRollup.total_cents
+    ).filter_by(user_id=user_id).order_by(
+        MonthlyRollup.year,
+        MonthlyRollup.month
+    ).all()
+    
+    return jsonify(format_monthly(monthly_data))
+
+@analytics_bp.route('/metrics/category', methods=['GET'])
+@cached_per_user
+def get_category_metrics():
+    # For now, we'll assume user_id=1 (we'll add proper auth later)
+    user_id = request.args.get('user_id', 1, type=int)
+    month_start, error = parse_month()
+    if error:
+        return error
+    
+    query = category_query(user_id, month_start)
+    category_data = db.session.execute(query.order_by(func.sum(CategoryMonthRollup.total_cents).desc())).all()
+    
+    return jsonify(format_category(category_data))
 
 @analytics_bp.route('/metrics/trends', methods=['GET'])
+@cached_per_user
 def get_spending_trends():
     # For now, we'll assume user_id=1 (we'll add proper auth later)
     user_id = request.args.get('user_id', 1, type=int)
     
     # Get daily spending for the last 30 days
     daily_data = db.session.query(
-        Expense.date,
-        func.sum(Expense.amount).label('daily_total')
-    ).filter_by(user_id=user_id).group_by(Expense.date).order_by(Expense.date.desc()).limit(30).all()
+        DailyRollup.date,
+        DailyRollup.total_cents
+    ).filter_by(user_id=user_id).order_by(DailyRollup.date.desc()).limit(TREND_DAYS).all()
     
     # Get payment method breakdown
     payment_data = db.session.query(
-        Expense.payment_method,
-        func.sum(Expense.amount).label('total'),
-        func.count(Expense.id).label('count')
-    ).filter_by(user_id=user_id).group_by(Expense.payment_method).all()
+        PaymentMethodRollup.payment_method,
+        PaymentMethodRollup.total_cents,
+        PaymentMethodRollup.transaction_count
+    ).filter_by(user_id=user_id).all()
     
-    # Format daily data
-    daily_trends = []
-    for date, total in daily_data:
-        daily_trends.append({
-            'date': date.isoformat(),
-            'amount': float(total)
-        })
+    return jsonify(format_trends(daily_data, payment_data))
+
+@analytics_bp.route('/dashboard', methods=['GET'])
+@cached_per_user
+def get_dashboard():
+    """Monthly, category and trend metrics plus the first page of expenses in one response"""
+    # For now, we'll assume user_id=1 (we'll add proper auth later)
+    user_id = request.args.get('user_id', 1, type=int)
     
-    # Format payment method data
-    payment_methods = []
-    for method, total, count in payment_data:
-        payment_methods.append({
-            'payment_method': method,
-            'total_amount': float(total),
-            'transaction_count': count
-        })
+    include = request.args.get('include')
+    include = [part.strip() for part in include.split(',') if part.strip()] if include else list(DASHBOARD_PARTS)
+    unknown = [part for part in include if part not in DASHBOARD_PARTS]
+    if unknown:
+        return jsonify({'error': f'Unknown include: {", ".join(unknown)}. Use {", ".join(DASHBOARD_PARTS)}'}), 400
+    month_start, error = parse_month()
+    if error:
+        return error
+    try:
+        limit = parse_limit(request.args.get('limit'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # Every rollup summary comes back from a single UNION ALL, tagged by kind
+    rows = {'monthly': [], 'category': [], 'daily': [], 'payment': []}
+    selects = []
+    if 'monthly' in include:
+        selects.append(select(
+            literal('monthly'), cast(MonthlyRollup.year, String), cast(MonthlyRollup.month, String),
+            MonthlyRollup.total_cents, MonthlyRollup.transaction_count
+        ).where(MonthlyRollup.user_id == user_id))
+    if 'category' in include:
+        categories = category_query(user_id, month_start).subquery()
+        selects.append(select(
+            literal('category'), categories.c.category, literal(''), categories.c.total, categories.c.count
+        ))
+    if 'trends' in include:
+        days = select(DailyRollup.date, DailyRollup.total_cents, DailyRollup.transaction_count).where(
+            DailyRollup.user_id == user_id
+        ).order_by(DailyRollup.date.desc()).limit(TREND_DAYS).subquery()
+        selects.append(select(
+            literal('daily'), cast(days.c.date, String), literal(''), days.c.total_cents, days.c.transaction_count
+        ))
+        selects.append(select(
+            literal('payment'), PaymentMethodRollup.payment_method, literal(''),
+            PaymentMethodRollup.total_cents, PaymentMethodRollup.transaction_count
+        ).where(PaymentMethodRollup.user_id == user_id))
+    if selects:
+        for kind, first_key, second_key, total, count in db.session.execute(union_all(*selects)):
+            rows[kind].append((first_key, second_key, total, count))
+    
+    result = {}
+    if 'monthly' in include:
+        monthly_data = sorted((int(year), int(month), total) for year, month, total, _ in rows['monthly'])
+        result['monthly'] = format_monthly(monthly_data)
+    if 'category' in include:
+        category_data = sorted(((name, total, count) for name, _, total, count in rows['category']),
+                               key=lambda row: row[1], reverse=True)
+        result['category'] = format_category(category_data)
+    if 'trends' in include:
+        daily_data = sorted(((date.fromisoformat(day), total) for day, _, total, _ in rows['daily']), reverse=True)
+        payment_data = [(method, total, count) for method, _, total, count in rows['payment']]
+        result['trends'] = format_trends(daily_data, payment_data)
+    if 'expenses' in include:
+        query = db.session.query(*Expense.columns_for(EXPENSE_FIELDS)).filter(Expense.user_id == user_id)
+        expenses, next_cursor = expense_page(query, limit)
+        result['expenses'] = {
+            'items': Expense.serialize_rows(expenses, EXPENSE_FIELDS),
+            'next_cursor': next_cursor
+        }
+    
+    return jsonify(result)
+
+def parse_period():
+    """Read optional start/end (YYYY-MM-DD) arguments, returning (start, end, error response)"""
+    try:
+        start = date.fromisoformat(request.args['start']) if request.args.get('start') else None
+        end = date.fromisoformat(request.args['end']) if request.args.get('end') else None
+    except ValueError:
+        return None, None, (jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400)
+    return start, end, None
+
+def expense_columns(user_id):
+    """Load the user's expenses as NumPy columns; numpy is imported on first use, not at boot"""
+    from src.utils.expense_columns import load_columns
+    return load_columns(db.session, user_id)
+
+@analytics_bp.route('/metrics/rolling', methods=['GET'])
+@cached_per_user
+def get_rolling_average():
+    """Daily totals with a trailing N-day average"""
+    from src.utils.expense_columns import rolling_average, rolling_days
+    
+    # For now, we'll assume user_id=1 (we'll add proper auth later)
+    user_id = request.args.get('user_id', 1, type=int)
+    window = request.args.get('window', 30, type=int)
+    if window < 1 or window > MAX_ROLLING_WINDOW:
+        return jsonify({'error': f'window must be between 1 and {MAX_ROLLING_WINDOW} days'}), 400
+    start, end, error = parse_period()
+    if error:
+        return error
     
+    columns = expense_columns(user_id)
+    if rolling_days(columns, start, end) > MAX_ROLLING_DAYS:
+        return jsonify({'error': f'start to end must span at most {MAX_ROLLING_DAYS} days'}), 400
+    days = rolling_average(columns, window, start, end)
     return jsonify({
-        'daily_trends': daily_trends,
-        'payment_methods': payment_methods
+        'window': window,
+        'daily': days,
+        'total_days': len(days)
+    })
+
+@analytics_bp.route('/metrics/month-over-month', methods=['GET'])
+@cached_per_user
+def get_month_over_month():
+    """Monthly totals with the change from the previous month, optionally for one category"""
+    from src.utils.expense_columns import between, month_over_month
+    
+    # For now, we'll assume user_id=1 (we'll add proper auth later)
+    user_id = request.args.get('user_id', 1, type=int)
+    category = request.args.get('category')
+    start, end, error = parse_period()
+    if error:
+        return error
+    
+    months = month_over_month(between(expense_columns(user_id), start, end), category)
+    return jsonify({
+        'category': category,
+        'months': months,
+        'total_months': len(months)
+    })
+
+@analytics_bp.route('/metrics/pivot', methods=['GET'])
+@cached_per_user
+def get_category_month_pivot():
+    """Category x month table of spending"""
+    from src.utils.expense_columns import between, category_month_pivot
+    
+    # For now, we'll assume user_id=1 (we'll add proper auth later)
+    user_id = request.args.get('user_id', 1, type=int)
+    start, end, error = parse_period()
+    if error:
+        return error
+    
+    return jsonify(category_month_pivot(between(expense_columns(user_id), start, end)))
+
+@analytics_bp.route('/metrics/percentiles', methods=['GET'])
+@cached_per_user
+def get_category_percentiles():
+    """Percentiles of expense amounts per category"""
+    from src.utils.expense_columns import between, category_percentiles
+    
+    # For now, we'll assume user_id=1 (we'll add proper auth later)
+    user_id = request.args.get('user_id', 1, type=int)
+    try:
+        percentiles = [float(q) for q in request.args['q'].split(',')] if request.args.get('q') else list(DEFAULT_PERCENTILES)
+    except ValueError:
+        return jsonify({'error': 'q must be a comma-separated list of percentiles'}), 400
+    if not all(0 <= q <= 100 for q in percentiles):
+        return jsonify({'error': 'Percentiles must be between 0 and 100'}), 400
+    start, end, error = parse_period()
+    if error:
+        return error
+    
+    categories = category_percentiles(between(expense_columns(user_id), start, end), percentiles)
+    return jsonify({
+        'percentiles': [f'p{q:g}' for q in percentiles],
+        'categories': categories,
+        'total_categories': len(categories)
     })
 
+@analytics_bp.route('/metrics/cache/stats', methods=['GET'])
+def get_analytics_cache_stats():
+    """Hit ratio and memory use of the analytics response cache in this worker"""
+    return jsonify(response_cache.stats())
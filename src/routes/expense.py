@@ -1,100 +1,423 @@
-from flask import Blueprint, jsonify, request
-from datetime import datetime
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context, url_for
+from datetime import date as date_type, datetime
+from sqlalchemy import and_, delete, func, or_, select, update
+from werkzeug.exceptions import RequestEntityTooLarge
 import os
+import io
 import base64
-from src.models.expense import Expense, db
+from src.models.expense import Expense, EXPENSE_FIELDS, db
 from src.models.user import User
+from src.models.data_version import bump_data_versions
+from src.models.expense_search import search_matches, search_supported, search_terms
+from src.models.rollup import apply_expense_changes, apply_expense_totals, expense_entry, expense_totals
+from src.routes.receipt import receipt_url, save_uploaded_receipt
+from src.utils.blob_store import BlobTooLarge, UnsupportedImage, blob_store
+from src.utils.dates import month_range
+from src.utils.expense_export import EXPORT_CHUNK_SIZE, gzip_stream, iter_csv, iter_ndjson
+from src.utils.expense_import import detect_format, insert_expense_rows, iter_import_rows
+from src.utils.money import DEFAULT_CURRENCY, parse_currency, to_cents
+from src.utils.pagination import (
+    decode_cursor, decode_search_cursor, encode_cursor, encode_search_cursor, parse_limit
+)
 
 expense_bp = Blueprint('expense', __name__)
 
+IMPORT_BATCH_SIZE = 5000
+MAX_IMPORT_ERRORS = 1000
+MAX_BATCH_IDS = 5000
+# Fields a batch update may set, all to the same value
+BATCH_UPDATE_FIELDS = ('amount', 'currency', 'category', 'description', 'payment_method', 'date')
+SEARCH_SORTS = ('relevance', 'date')
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv', iter_csv),
+    'ndjson': ('application/x-ndjson', 'ndjson', iter_ndjson),
+}
+
+def expense_page(query, limit):
+    """Run an expense query newest first, returning (up to `limit` rows, cursor for the next page or None)"""
+    rows = query.order_by(Expense.date.desc(), Expense.id.desc()).limit(limit + 1).all()
+    
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].date, rows[-1].id)
+    return rows, next_cursor
+
+def parse_fields(args):
+    """Read the `fields` projection, returning (field names, None) or (None, error message)"""
+    fields = args.get('fields')
+    if not fields:
+        return list(EXPENSE_FIELDS), None
+    fields = [field.strip() for field in fields.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in EXPENSE_FIELDS]
+    if unknown:
+        return None, f'Unknown fields: {", ".join(unknown)}'
+    return fields, None
+
+def parse_expense_filters(args):
+    """Read the `month` (YYYY-MM) and `category` filters, returning (SQL conditions, None) or (None, error message)"""
+    conditions = []
+    month = args.get('month')
+    if month:
+        try:
+            start, end = month_range(month)
+        except ValueError:
+            return None, 'Invalid month format. Use YYYY-MM'
+        conditions += [Expense.date >= start, Expense.date < end]
+    category = args.get('category')
+    if category:
+        conditions.append(Expense.category == category)
+    return conditions, None
+
 @expense_bp.route('/expenses', methods=['GET'])
 def get_expenses():
     # For now, we'll assume user_id=1 (we'll add proper auth later)
     user_id = request.args.get('user_id', 1, type=int)
-    month = request.args.get('month')  # Format: YYYY-MM
-    category = request.args.get('category')
+    cursor = request.args.get('cursor')
     
-    query = Expense.query.filter_by(user_id=user_id)
+    try:
+        limit = parse_limit(request.args.get('limit'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    if month:
+    # Projection: only select the requested columns (plus the cursor keys)
+    fields, error = parse_fields(request.args)
+    if error:
+        return jsonify({'error': error}), 400
+    
+    query = db.session.query(*Expense.columns_for(fields + ['date', 'id'])).filter(
+        Expense.user_id == user_id
+    )
+    
+    conditions, error = parse_expense_filters(request.args)
+    if error:
+        return jsonify({'error': error}), 400
+    query = query.filter(*conditions)
+    
+    # Keyset pagination: newest first, continuing strictly after the cursor position
+    if cursor:
         try:
-            year, month_num = map(int, month.split('-'))
-            query = query.filter(
-                db.extract('year', Expense.date) == year,
-                db.extract('month', Expense.date) == month_num
-            )
-        except ValueError:
-            return jsonify({'error': 'Invalid month format. Use YYYY-MM'}), 400
+            cursor_date, cursor_id = decode_cursor(cursor)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        query = query.filter(or_(
+            Expense.date < cursor_date,
+            and_(Expense.date == cursor_date, Expense.id < cursor_id)
+        ))
     
-    if category:
-        query = query.filter(Expense.category == category)
+    rows, next_cursor = expense_page(query, limit)
     
-    expenses = query.order_by(Expense.date.desc()).all()
-    return jsonify([expense.to_dict() for expense in expenses])
+    response = jsonify(Expense.serialize_rows(rows, fields))
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+        args = request.args.to_dict()
+        args['cursor'] = next_cursor
+        response.headers['Link'] = f'<{url_for(".get_expenses", **args)}>; rel="next"'
+    return response
 
-@expense_bp.route('/expenses', methods=['POST'])
-def create_expense():
-    data = request.json
+@expense_bp.route('/expenses/search', methods=['GET'])
+def search_expenses():
+    """Full-text search over descriptions and categories, paged like the expense list"""
+    # For now, we'll assume user_id=1 (we'll add proper auth later)
+    user_id = request.args.get('user_id', 1, type=int)
+    terms = search_terms(request.args.get('q'))
+    cursor = request.args.get('cursor')
+    sort = request.args.get('sort', 'relevance')
     
+    if not terms:
+        return jsonify({'error': 'q must contain at least one word'}), 400
+    if sort not in SEARCH_SORTS:
+        return jsonify({'error': 'Invalid sort. Use relevance or date'}), 400
+    # Without the FTS index there is no relevance score to order by
+    if not search_supported():
+        sort = 'date'
+    
+    try:
+        limit = parse_limit(request.args.get('limit'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    fields, error = parse_fields(request.args)
+    if error:
+        return jsonify({'error': error}), 400
+    
+    # The index yields the user's matching ids, which are then looked up by primary key
+    matches = search_matches(terms, user_id)
+    query = db.session.query(*Expense.columns_for(fields + ['date', 'id']), matches.c.score).join(
+        matches, matches.c.id == Expense.id
+    ).filter(Expense.user_id == user_id)
+    
+    conditions, error = parse_expense_filters(request.args)
+    if error:
+        return jsonify({'error': error}), 400
+    query = query.filter(*conditions)
+    
+    # Keyset pagination on (score, date, id) for relevance, on (date, id) like the list for date
+    if cursor:
+        try:
+            if sort == 'relevance':
+                cursor_score, cursor_date, cursor_id = decode_search_cursor(cursor)
+            else:
+                cursor_date, cursor_id = decode_cursor(cursor)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        position = or_(
+            Expense.date < cursor_date,
+            and_(Expense.date == cursor_date, Expense.id < cursor_id)
+        )
+        if sort == 'relevance':
+            position = or_(matches.c.score > cursor_score, and_(matches.c.score == cursor_score, position))
+        query = query.filter(position)
+    
+    order = [Expense.date.desc(), Expense.id.desc()]
+    if sort == 'relevance':
+        order.insert(0, matches.c.score)
+    rows = query.order_by(*order).limit(limit + 1).all()
+    
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        if sort == 'relevance':
+            next_cursor = encode_search_cursor(last.score, last.date, last.id)
+        else:
+            next_cursor = encode_cursor(last.date, last.id)
+    
+    response = jsonify(Expense.serialize_rows(rows, fields))
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+        args = request.args.to_dict()
+        args['cursor'] = next_cursor
+        response.headers['Link'] = f'<{url_for(".search_expenses", **args)}>; rel="next"'
+    return response
+
+@expense_bp.route('/expenses/export', methods=['GET'])
+def export_expenses():
+    """Stream a user's full expense history as CSV or NDJSON, optionally gzipped"""
     # For now, we'll assume user_id=1 (we'll add proper auth later)
-    user_id = data.get('user_id', 1)
+    user_id = request.args.get('user_id', 1, type=int)
+    export_format = request.args.get('format', 'csv').lower()
+    compress = request.args.get('gzip', '').lower() in ('1', 'true', 'yes')
+    
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'error': 'Invalid format. Use csv or ndjson'}), 400
     
+    fields = list(EXPENSE_FIELDS)
+    query = db.session.query(*Expense.columns_for(fields)).filter(
+        Expense.user_id == user_id
+    )
+    
+    conditions, error = parse_expense_filters(request.args)
+    if error:
+        return jsonify({'error': error}), 400
+    query = query.filter(*conditions)
+    
+    # yield_per streams rows from the cursor in batches instead of loading them all
+    rows = query.order_by(Expense.date, Expense.id).execution_options(yield_per=EXPORT_CHUNK_SIZE)
+    
+    mimetype, extension, serializer = EXPORT_FORMATS[export_format]
+    body = serializer(rows, fields, Expense.row_to_dict)
+    filename = f'expenses.{extension}'
+    if compress:
+        body = gzip_stream(body)
+        mimetype = 'application/gzip'
+        filename += '.gz'
+    
+    response = Response(stream_with_context(body), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+def legacy_receipt_path(receipt_image_path):
+    """File of a receipt saved under static/uploads before the blob store"""
+    return os.path.join(os.path.dirname(__file__), '..', 'static', receipt_image_path)
+
+def release_receipts(conditions):
+    """Drop the receipt references of the expenses about to be deleted, in one statement.
+
+    Returns ({blob_hash: references released}, legacy receipt files) for
+    blob_store.cleanup_later once the deleting transaction has committed.
+    """
+    released = dict(db.session.execute(
+        select(Expense.receipt_blob_hash, func.count())
+        .where(*conditions, Expense.receipt_blob_hash.isnot(None))
+        .group_by(Expense.receipt_blob_hash)
+    ).all())
+    legacy_paths = [
+        legacy_receipt_path(path) for path in db.session.execute(
+            select(Expense.receipt_image_path)
+            .where(*conditions, Expense.receipt_blob_hash.is_(None), Expense.receipt_image_path.isnot(None))
+        ).scalars()
+    ]
+    blob_store.release_many(released)
+    return released, legacy_paths
+
+def parse_expense_data(data):
+    """Validate expense input, returning (fields, None) or (None, error message)"""
     # Validate required fields
     required_fields = ['amount', 'category', 'payment_method']
     for field in required_fields:
-        if field not in data:
-            return jsonify({'error': f'Missing required field: {field}'}), 400
+        if field not in data or data[field] in (None, ''):
+            return None, f'Missing required field: {field}'
+    
+    # JSON may carry any type here; the ORM and the bulk import path would store or choke on it
+    for field in ('category', 'payment_method'):
+        if not isinstance(data[field], str):
+            return None, f'{field} must be a string'
+    if data.get('description') is not None and not isinstance(data['description'], str):
+        return None, 'description must be a string'
+    
+    try:
+        amount_cents = to_cents(data['amount'])
+    except ValueError as e:
+        return None, str(e)
+    
+    try:
+        currency = parse_currency(data['currency']) if data.get('currency') else DEFAULT_CURRENCY
+    except ValueError as e:
+        return None, str(e)
     
     # Parse date
     date_str = data.get('date')
     if date_str:
+        if not isinstance(date_str, str):
+            return None, 'Invalid date format. Use YYYY-MM-DD'
         try:
-            date = datetime.strptime(date_str, '%Y-%m-%d').date()
-        except ValueError:
-            return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+            if len(date_str) == 10 and date_str[4] == '-' and date_str[7] == '-':
+                date = date_type.fromisoformat(date_str)  # fast path for the canonical form
+            else:
+                date = datetime.strptime(date_str, '%Y-%m-%d').date()
+        except (TypeError, ValueError):
+            return None, 'Invalid date format. Use YYYY-MM-DD'
     else:
         date = datetime.utcnow().date()
     
+    return {
+        'amount_cents': amount_cents,
+        'currency': currency,
+        'category': data['category'],
+        'description': data.get('description') or '',
+        'date': date,
+        'payment_method': data['payment_method']
+    }, None
+
+@expense_bp.route('/expenses', methods=['POST'])
+def create_expense():
+    # Either JSON, or multipart/form-data with the fields plus a `receipt` file
+    multipart = request.mimetype == 'multipart/form-data'
+    data = request.form.to_dict() if multipart else request.json
+    
+    # For now, we'll assume user_id=1 (we'll add proper auth later)
+    user_id = request.form.get('user_id', 1, type=int) if multipart else data.get('user_id', 1)
+    
+    fields, error = parse_expense_data(data)
+    if error:
+        return jsonify({'error': error}), 400
+    
     # Handle receipt image
-    receipt_image_path = None
-    if 'receipt_image_base64' in data and data['receipt_image_base64']:
+    receipt_blob_hash = data.get('receipt_blob_hash')
+    if multipart:
+        uploaded_hash, error = save_uploaded_receipt()
+        if error:
+            return error
+        receipt_blob_hash = uploaded_hash or receipt_blob_hash
+    elif 'receipt_image_base64' in data and data['receipt_image_base64']:
+        # Kept for older clients; prefer POST /receipts or a multipart upload
         try:
-            # Create uploads directory if it doesn't exist
-            uploads_dir = os.path.join(os.path.dirname(__file__), '..', 'static', 'uploads')
-            os.makedirs(uploads_dir, exist_ok=True)
-            
-            # Decode base64 image
             image_data = base64.b64decode(data['receipt_image_base64'])
-            
-            # Generate filename
-            filename = f"receipt_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.jpg"
-            filepath = os.path.join(uploads_dir, filename)
-            
-            # Save image
-            with open(filepath, 'wb') as f:
-                f.write(image_data)
-            
-            receipt_image_path = f"uploads/{filename}"
-            
+            receipt_blob_hash = blob_store.put(io.BytesIO(image_data))
+        except BlobTooLarge as e:
+            return jsonify({'error': str(e)}), 413
+        except UnsupportedImage as e:
+            return jsonify({'error': str(e)}), 415
         except Exception as e:
             return jsonify({'error': f'Failed to process receipt image: {str(e)}'}), 400
     
     # Create expense
     expense = Expense(
         user_id=user_id,
-        amount=float(data['amount']),
-        category=data['category'],
-        description=data.get('description', ''),
-        date=date,
-        payment_method=data['payment_method'],
-        receipt_image_path=receipt_image_path
+        receipt_image_path=receipt_url(receipt_blob_hash) if receipt_blob_hash else None,
+        receipt_blob_hash=receipt_blob_hash,
+        **fields
     )
     
+    if receipt_blob_hash and not blob_store.add_reference(receipt_blob_hash):
+        db.session.rollback()
+        return jsonify({'error': 'Unknown receipt_blob_hash'}), 400
+    
     db.session.add(expense)
+    apply_expense_changes(db.session, added=[expense_entry(expense)])
+    bump_data_versions(db.session, [user_id])
     db.session.commit()
     
     return jsonify(expense.to_dict()), 201
 
+@expense_bp.route('/expenses/import', methods=['POST'])
+def import_expenses():
+    """Bulk-load expenses from a streamed CSV or NDJSON request body"""
+    # For now, we'll assume user_id=1 (we'll add proper auth later)
+    user_id = request.args.get('user_id', 1, type=int)
+    
+    import_format = detect_format(request.args.get('format'), request.mimetype)
+    if import_format is None:
+        return jsonify({'error': 'Send text/csv or application/x-ndjson, or pass format=csv|ndjson'}), 415
+    
+    # The body is streamed, so this bounds the whole import rather than memory use
+    request.max_content_length = current_app.config['IMPORT_MAX_BYTES']
+    
+    imported = 0
+    failed = 0
+    errors = []
+    batch = []
+    
+    def flush(batch):
+        # One executemany INSERT plus the matching rollup upserts per transaction
+        totals = {}
+        for row in batch:
+            key = (user_id, row['date'], row['category'], row['payment_method'])
+            total_amount, transaction_count = totals.get(key, (0, 0))
+            totals[key] = (total_amount + row['amount_cents'], transaction_count + 1)
+        insert_expense_rows(db.session, Expense.__table__, batch, datetime.utcnow())
+        apply_expense_totals(db.session, totals)
+        bump_data_versions(db.session, [user_id])
+        db.session.commit()
+    
+    try:
+        for row_number, data, error in iter_import_rows(request.stream, import_format):
+            if error is None:
+                fields, error = parse_expense_data(data)
+            if error:
+                failed += 1
+                if len(errors) < MAX_IMPORT_ERRORS:
+                    errors.append({'row': row_number, 'error': error})
+                continue
+            
+            fields['user_id'] = user_id
+            batch.append(fields)
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                flush(batch)
+                imported += len(batch)
+                batch = []
+    except RequestEntityTooLarge:
+        # Batches already committed stay imported; report how far we got
+        db.session.rollback()
+        return jsonify({
+            'error': f"Import is larger than {current_app.config['IMPORT_MAX_BYTES']} bytes",
+            'imported': imported,
+            'failed': failed,
+            'errors': errors
+        }), 413
+    
+    if batch:
+        flush(batch)
+        imported += len(batch)
+    
+    return jsonify({
+        'imported': imported,
+        'failed': failed,
+        'errors': errors,
+        'errors_truncated': failed > len(errors)
+    })
+
 @expense_bp.route('/expenses/<int:expense_id>', methods=['GET'])
 def get_expense(expense_id):
     expense = Expense.query.get_or_404(expense_id)
@@ -104,10 +427,19 @@ def get_expense(expense_id):
 def update_expense(expense_id):
     expense = Expense.query.get_or_404(expense_id)
     data = request.json
+    previous = expense_entry(expense)
     
     # Update fields
     if 'amount' in data:
-        expense.amount = float(data['amount'])
+        try:
+            expense.amount_cents = to_cents(data['amount'])
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+    if 'currency' in data:
+        try:
+            expense.currency = parse_currency(data['currency'])
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
     if 'category' in data:
         expense.category = data['category']
     if 'description' in data:
@@ -120,6 +452,9 @@ def update_expense(expense_id):
         except ValueError:
             return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
     
+    # Move the amount between rollup buckets if the month, category, etc. changed
+    apply_expense_changes(db.session, added=[expense_entry(expense)], removed=[previous])
+    bump_data_versions(db.session, [expense.user_id])
     db.session.commit()
     return jsonify(expense.to_dict())
 
@@ -127,13 +462,183 @@ def update_expense(expense_id):
 def delete_expense(expense_id):
     expense = Expense.query.get_or_404(expense_id)
     
-    # Delete receipt image if exists
-    if expense.receipt_image_path:
-        image_path = os.path.join(os.path.dirname(__file__), '..', 'static', expense.receipt_image_path)
-        if os.path.exists(image_path):
-            os.remove(image_path)
+    # Drop this expense's reference to its receipt; the blob goes once nothing uses it
+    released = []
+    legacy_paths = []
+    if expense.receipt_blob_hash:
+        blob_store.release(expense.receipt_blob_hash)
+        released.append(expense.receipt_blob_hash)
+    elif expense.receipt_image_path:
+        legacy_paths.append(legacy_receipt_path(expense.receipt_image_path))
     
+    apply_expense_changes(db.session, removed=[expense_entry(expense)])
+    bump_data_versions(db.session, [expense.user_id])
     db.session.delete(expense)
     db.session.commit()
+    
+    # Files go after the commit, off the request path
+    blob_store.cleanup_later(released, legacy_paths)
     return '', 204
 
+
+def parse_batch_selection(data, user_id):
+    """Read a batch request's `ids` list or `filter` (month, category).
+
+    Returns (SQL conditions, ids or None, None) or (None, None, error message).
+    """
+    ids = data.get('ids')
+    batch_filter = data.get('filter')
+    if (ids is None) == (batch_filter is None):
+        return None, None, 'Send either ids or filter'
+    
+    conditions = [Expense.user_id == user_id]
+    if ids is not None:
+        if not isinstance(ids, list) or not ids or any(type(i) is not int for i in ids):
+            return None, None, 'ids must be a non-empty list of integers'
+        ids = list(dict.fromkeys(ids))
+        if len(ids) > MAX_BATCH_IDS:
+            return None, None, f'At most {MAX_BATCH_IDS} ids per request'
+        conditions.append(Expense.id.in_(ids))
+        return conditions, ids, None
+    
+    if not isinstance(batch_filter, dict) or not batch_filter:
+        return None, None, 'filter needs month and/or category'
+    unknown = [key for key in batch_filter if key not in ('month', 'category')]
+    if unknown:
+        return None, None, f'Unknown filter: {", ".join(unknown)}'
+    if 'month' in batch_filter:
+        # month_range expects a string; JSON may carry a number or null here
+        if not isinstance(batch_filter['month'], str):
+            return None, None, 'Invalid month format. Use YYYY-MM'
+        try:
+            start, end = month_range(batch_filter['month'])
+        except ValueError:
+            return None, None, 'Invalid month format. Use YYYY-MM'
+        conditions += [Expense.date >= start, Expense.date < end]
+    if 'category' in batch_filter:
+        if not isinstance(batch_filter['category'], str):
+            return None, None, 'category must be a string'
+        conditions.append(Expense.category == batch_filter['category'])
+    return conditions, None, None
+
+def missing_ids(conditions, ids):
+    """Per-id failures for requested ids that match no expense of the user"""
+    if ids is None:
+        return []
+    found = set(db.session.execute(select(Expense.id).where(*conditions)).scalars())
+    return [{'id': expense_id, 'error': 'Expense not found'} for expense_id in ids if expense_id not in found]
+
+def parse_batch_values(values):
+    """Validate a batch update's `set`, returning (column values, None) or (None, error message)"""
+    if not isinstance(values, dict) or not values:
+        return None, f'set needs at least one of: {", ".join(BATCH_UPDATE_FIELDS)}'
+    unknown = [key for key in values if key not in BATCH_UPDATE_FIELDS]
+    if unknown:
+        return None, f'Cannot set: {", ".join(unknown)}'
+    
+    columns = {}
+    for field in ('category', 'payment_method'):
+        if field in values:
+            if not isinstance(values[field], str) or not values[field]:
+                return None, f'{field} must be a non-empty string'
+            columns[field] = values[field]
+    if 'description' in values:
+        columns['description'] = values['description'] or ''
+    try:
+        if 'amount' in values:
+            columns['amount_cents'] = to_cents(values['amount'])
+        if 'currency' in values:
+            columns['currency'] = parse_currency(values['currency'])
+    except ValueError as e:
+        return None, str(e)
+    if 'date' in values:
+        try:
+            columns['date'] = datetime.strptime(values['date'], '%Y-%m-%d').date()
+        except (TypeError, ValueError):
+            return None, 'Invalid date format. Use YYYY-MM-DD'
+    return columns, None
+
+@expense_bp.route('/expenses/batch-update', methods=['POST'])
+def batch_update_expenses():
+    """Set the same fields on many expenses (e.g. re-categorize) with one UPDATE"""
+    data = request.json or {}
+    
+    # For now, we'll assume user_id=1 (we'll add proper auth later)
+    user_id = data.get('user_id', 1)
+    
+    conditions, ids, error = parse_batch_selection(data, user_id)
+    if error:
+        return jsonify({'error': error}), 400
+    columns, error = parse_batch_values(data.get('set'))
+    if error:
+        return jsonify({'error': error}), 400
+    
+    failed = missing_ids(conditions, ids)
+    
+    # Rollup deltas: each (date, category, payment method) group moves to its new bucket.
+    # Worked out from one GROUP BY before the UPDATE, since every row gets the same values.
+    before = expense_totals(db.session, *conditions)
+    totals = {}
+    matched = 0
+    for (row_user_id, day, category, payment_method), (cents, count) in before.items():
+        matched += count
+        new_key = (
+            row_user_id,
+            columns.get('date', day),
+            columns.get('category', category),
+            columns.get('payment_method', payment_method)
+        )
+        new_cents = columns['amount_cents'] * count if 'amount_cents' in columns else cents
+        for key, delta_cents, delta_count in (((row_user_id, day, category, payment_method), -cents, -count),
+                                              (new_key, new_cents, count)):
+            total_cents, transaction_count = totals.get(key, (0, 0))
+            totals[key] = (total_cents + delta_cents, transaction_count + delta_count)
+    
+    if matched:
+        db.session.execute(
+            update(Expense).where(*conditions).values(**columns).execution_options(synchronize_session=False)
+        )
+        apply_expense_totals(db.session, totals)
+        bump_data_versions(db.session, [user_id])
+    db.session.commit()
+    
+    return jsonify({
+        'matched': matched,
+        'updated': matched,
+        'failed': failed
+    })
+
+@expense_bp.route('/expenses/batch-delete', methods=['POST'])
+def batch_delete_expenses():
+    """Delete many expenses with one DELETE; unused receipt files are removed in the background"""
+    data = request.json or {}
+    
+    # For now, we'll assume user_id=1 (we'll add proper auth later)
+    user_id = data.get('user_id', 1)
+    
+    conditions, ids, error = parse_batch_selection(data, user_id)
+    if error:
+        return jsonify({'error': error}), 400
+    
+    failed = missing_ids(conditions, ids)
+    
+    removed = expense_totals(db.session, *conditions)
+    matched = sum(count for _, count in removed.values())
+    released = {}
+    legacy_paths = []
+    if matched:
+        released, legacy_paths = release_receipts(conditions)
+        apply_expense_totals(db.session, {key: (-cents, -count) for key, (cents, count) in removed.items()})
+        db.session.execute(delete(Expense).where(*conditions).execution_options(synchronize_session=False))
+        bump_data_versions(db.session, [user_id])
+    db.session.commit()
+    
+    # Files go after the commit, off the request path
+    blob_store.cleanup_later(released, legacy_paths)
+    
+    return jsonify({
+        'matched': matched,
+        'deleted': matched,
+        'receipts_released': len(released),
+        'failed': failed
+    })
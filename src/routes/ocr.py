@@ -1,64 +1,141 @@
-from flask import Blueprint, jsonify, request
-import os
+from flask import Blueprint, jsonify, request, url_for
 import base64
-from datetime import datetime
-from src.utils.ocr_processor import ReceiptProcessor
+from src.models.ocr_job import JOB_DONE, PENDING_STATUSES, OcrJob
+from src.utils.ocr_cache import ocr_cache
+from src.utils.ocr_queue import QueueFull, ocr_queue
 
 ocr_bp = Blueprint('ocr', __name__)
-processor = ReceiptProcessor()
+
+# Longest a client may hold a connection open waiting for a result
+MAX_WAIT_SECONDS = 60
+processor = None
+
+def get_processor():
+    """Create the ReceiptProcessor on first use so cv2/pytesseract load only when needed"""
+    global processor
+    if processor is None:
+        from src.utils.ocr_processor import ReceiptProcessor
+        processor = ReceiptProcessor()
+    return processor
+
+def read_image_data():
+    """Get the uploaded image bytes from a raw image body or a JSON image_base64 field"""
+    if request.mimetype and request.mimetype.startswith('image/'):
+        image_data = request.get_data()
+        if not image_data:
+            return None, (jsonify({'error': 'No image data provided'}), 400)
+        return image_data, None
+    
+    data = request.get_json(silent=True) or {}
+    if 'image_base64' not in data:
+        return None, (jsonify({'error': 'No image data provided'}), 400)
+    
+    # Decode base64 image
+    try:
+        return base64.b64decode(data['image_base64']), None
+    except Exception:
+        return None, (jsonify({'error': 'Invalid base64 image data'}), 400)
+
+def submit_job(image_data):
+    """Queue an OCR job, returning (job, None) or (None, 429 response) when the queue is full"""
+    try:
+        return ocr_queue.submit(image_data), None
+    except QueueFull as e:
+        response = jsonify({'error': f'OCR queue is full: {str(e)}'})
+        response.headers['Retry-After'] = '5'
+        return None, (response, 429)
+
+def parse_wait(default=0):
+    """Seconds the client is willing to wait for a result (`wait` argument), 0 to MAX_WAIT_SECONDS"""
+    return min(max(request.args.get('wait', default, type=float), 0), MAX_WAIT_SECONDS)
+
+def job_accepted(job):
+    response = jsonify({
+        'job_id': job.id,
+        'status': job.status,
+        'status_url': url_for('ocr.get_ocr_job', job_id=job.id),
+        'result_url': url_for('ocr.get_ocr_job_result', job_id=job.id)
+    })
+    response.headers['Location'] = url_for('ocr.get_ocr_job', job_id=job.id)
+    return response, 202
+
+def job_result(job):
+    """Format a finished job the way /process-receipt always has"""
+    if job.status == JOB_DONE:
+        result = job.to_dict()['result']
+        return jsonify({
+            'success': True,
+            'data': {
+                'amount': result.get('amount'),
+                'date': result.get('date'),
+                'merchant': result.get('merchant'),
+                'suggested_category': result.get('suggested_category'),
+                'extracted_text': result.get('extracted_text'),
+                'confidence': result.get('confidence', 'low')
+            }
+        })
+    return jsonify({
+        'success': False,
+        'error': job.error or 'Unknown error occurred'
+    }), 400
+
+@ocr_bp.route('/ocr/jobs', methods=['POST'])
+def create_ocr_job():
+    """Queue a receipt image for OCR and return the job id immediately"""
+    image_data, error = read_image_data()
+    if error:
+        return error
+    
+    job, error = submit_job(image_data)
+    if error:
+        return error
+    return job_accepted(job)
+
+@ocr_bp.route('/ocr/jobs/<job_id>', methods=['GET'])
+def get_ocr_job(job_id):
+    """Poll the status of an OCR job"""
+    job = OcrJob.query.get_or_404(job_id)
+    return jsonify(job.to_dict())
+
+@ocr_bp.route('/ocr/jobs/<job_id>/result', methods=['GET'])
+def get_ocr_job_result(job_id):
+    """Long-poll for an OCR job result, waiting up to `wait` seconds"""
+    job = ocr_queue.wait(job_id, parse_wait())
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    if job.status in PENDING_STATUSES:
+        return jsonify(job.to_dict()), 202
+    return job_result(job)
+
+@ocr_bp.route('/ocr/cache/stats', methods=['GET'])
+def get_ocr_cache_stats():
+    """Hit/miss counters and size of the OCR result cache"""
+    return jsonify(ocr_cache.stats())
 
 @ocr_bp.route('/process-receipt', methods=['POST'])
 def process_receipt():
-    """Process a receipt image and extract information using OCR"""
+    """Process a receipt image and extract information using OCR.
+
+    Responds with the result as before, waiting up to `?wait=<seconds>` (default and
+    maximum MAX_WAIT_SECONDS). `?async=1`, or a result not ready in time, returns 202
+    with the job id to poll instead.
+    """
     try:
-        data = request.json
-        
-        if 'image_base64' not in data:
-            return jsonify({'error': 'No image data provided'}), 400
-        
-        # Decode base64 image
-        try:
-            image_data = base64.b64decode(data['image_base64'])
-        except Exception as e:
-            return jsonify({'error': 'Invalid base64 image data'}), 400
+        image_data, error = read_image_data()
+        if error:
+            return error
         
-        # Create temporary file for processing
-        temp_dir = os.path.join(os.path.dirname(__file__), '..', 'temp')
-        os.makedirs(temp_dir, exist_ok=True)
+        # Run through the job queue so the OCR work happens in the process pool
+        job, error = submit_job(image_data)
+        if error:
+            return error
         
-        temp_filename = f"receipt_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jpg"
-        temp_filepath = os.path.join(temp_dir, temp_filename)
-        
-        # Save image to temporary file
-        with open(temp_filepath, 'wb') as f:
-            f.write(image_data)
-        
-        # Process the receipt
-        result = processor.process_receipt(temp_filepath)
-        
-        # Clean up temporary file
-        try:
-            os.remove(temp_filepath)
-        except:
-            pass  # Ignore cleanup errors
-        
-        if result['success']:
-            return jsonify({
-                'success': True,
-                'data': {
-                    'amount': result.get('amount'),
-                    'date': result.get('date'),
-                    'merchant': result.get('merchant'),
-                    'suggested_category': result.get('suggested_category'),
-                    'extracted_text': result.get('extracted_text'),
-                    'confidence': result.get('confidence', 'low')
-                }
-            })
-        else:
-            return jsonify({
-                'success': False,
-                'error': result.get('error', 'Unknown error occurred')
-            }), 400
+        # Synchronous by default; async clients opt in and poll the job instead
+        run_async = request.args.get('async', '').lower() in ('1', 'true', 'yes')
+        job = ocr_queue.wait(job.id, 0 if run_async else parse_wait(MAX_WAIT_SECONDS))
+        if job.status in PENDING_STATUSES:
+            return job_accepted(job)
+        return job_result(job)
             
     except Exception as e:
         return jsonify({
@@ -70,6 +147,8 @@ def process_receipt():
 def test_ocr():
     """Test endpoint to verify OCR functionality"""
     try:
+        processor = get_processor()
+        
         # Test the OCR processor with sample text
         test_text = """
         WALMART SUPERCENTER
@@ -109,4 +188,3 @@ def test_ocr():
             'success': False,
             'error': f'Test failed: {str(e)}'
         }), 500
-
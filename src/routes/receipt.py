@@ -0,0 +1,102 @@
+from flask import Blueprint, jsonify, request, send_file, url_for
+import re
+from src.utils.blob_store import RECEIPT_CONTENT_TYPES, BlobTooLarge, UnsupportedImage, blob_store
+from src.utils.receipt_derivatives import DERIVATIVE_FORMATS, DERIVATIVE_SIZES, DerivativeError, get_derivative
+
+receipt_bp = Blueprint('receipt', __name__)
+
+BLOB_HASH_RE = re.compile(r'[0-9a-f]{64}')
+RECEIPT_MAX_AGE = 365 * 24 * 3600
+
+def save_uploaded_receipt():
+    """Stream a raw image/* body or a multipart `receipt` file into the blob store.
+
+    The blob store checks the bytes themselves, so the client's Content-Type
+    only tells us where to find the image.
+
+    Returns (blob_hash, None), (None, None) when the request carries no
+    receipt, or (None, error response).
+    """
+    # Refuse obviously oversized bodies up front (with some room for multipart framing);
+    # the store still enforces the exact cap while streaming
+    if request.content_length and request.content_length > blob_store.max_bytes + 64 * 1024:
+        return None, (jsonify({'error': f'Receipt is larger than {blob_store.max_bytes} bytes'}), 413)
+
+    if request.mimetype and request.mimetype.startswith('image/'):
+        stream = request.stream
+    elif request.mimetype == 'multipart/form-data' and 'receipt' in request.files:
+        # Werkzeug spools file parts over 500 KB to a temp file, so this stays bounded too
+        stream = request.files['receipt'].stream
+    else:
+        return None, None
+
+    try:
+        return blob_store.put(stream), None
+    except BlobTooLarge as e:
+        return None, (jsonify({'error': str(e)}), 413)
+    except UnsupportedImage as e:
+        return None, (jsonify({'error': str(e)}), 415)
+    except ValueError as e:
+        return None, (jsonify({'error': str(e)}), 400)
+
+def receipt_url(blob_hash):
+    return url_for('receipt.get_receipt', blob_hash=blob_hash)
+
+@receipt_bp.route('/receipts', methods=['POST'])
+def upload_receipt():
+    """Upload a receipt image ahead of creating the expense that uses it"""
+    blob_hash, error = save_uploaded_receipt()
+    if error:
+        return error
+    if blob_hash is None:
+        return jsonify({'error': 'Send an image/* body or a multipart `receipt` file'}), 415
+
+    blob = blob_store.get(blob_hash)
+    return jsonify(dict(blob.to_dict(), url=receipt_url(blob_hash))), 201
+
+@receipt_bp.route('/receipts/<blob_hash>', methods=['GET'])
+def get_receipt(blob_hash):
+    """Serve a stored receipt, or a resized/re-encoded copy with ?size=thumb|medium|original&format=jpeg|webp"""
+    blob = blob_store.get(blob_hash) if BLOB_HASH_RE.fullmatch(blob_hash) else None
+    if blob is None:
+        return jsonify({'error': 'Receipt not found'}), 404
+    
+    size = request.args.get('size')
+    image_format = request.args.get('format')
+    if size is None and image_format is None:
+        path, mimetype, variant = blob_store.path_for(blob_hash), blob.content_type, 'original'
+        # Blobs stored before uploads were sniffed may be anything; never render those inline
+        download = mimetype not in RECEIPT_CONTENT_TYPES
+        if download:
+            mimetype = 'application/octet-stream'
+    else:
+        size = size or 'original'
+        image_format = image_format or 'jpeg'
+        if size not in DERIVATIVE_SIZES or image_format not in DERIVATIVE_FORMATS:
+            return jsonify({
+                'error': f"size must be one of {', '.join(DERIVATIVE_SIZES)} and format one of {', '.join(DERIVATIVE_FORMATS)}"
+            }), 400
+        try:
+            path = get_derivative(blob_hash, size, image_format)
+        except DerivativeError as e:
+            return jsonify({'error': str(e)}), 415
+        mimetype, variant = DERIVATIVE_FORMATS[image_format][1], f'{size}.{image_format}'
+        download = False
+    
+    # Content-addressed, so every URL always returns the same bytes: a strong
+    # ETag from the hash, Range support and a year-long immutable cache
+    response = send_file(
+        path,
+        mimetype=mimetype,
+        conditional=True,
+        etag=f'{blob_hash}.{variant}',
+        last_modified=blob.created_at,
+        max_age=RECEIPT_MAX_AGE,
+        as_attachment=download,
+        download_name=f'{blob_hash}.bin' if download else None
+    )
+    response.cache_control.immutable = True
+    # Receipts are served from the API origin: even if one is opened as a page, it runs no script
+    response.headers['Content-Security-Policy'] = 'sandbox'
+    response.headers['X-Content-Type-Options'] = 'nosniff'
+    return response
@@ -1,12 +1,72 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, jsonify, request, url_for
+from sqlalchemy import delete, func, select
 from src.models.user import User, db
+from src.models.expense import Expense
+from src.models.data_version import bump_data_versions
+from src.models.rollup import DailyRollup, delete_user_rollups
+from src.routes.expense import release_receipts
+from src.utils.blob_store import blob_store
+from src.utils.money import cents_to_number, format_cents
+from src.utils.pagination import parse_limit
 
 user_bp = Blueprint('user', __name__)
 
 @user_bp.route('/users', methods=['GET'])
 def get_users():
-    users = User.query.all()
-    return jsonify([user.to_dict() for user in users])
+    users = db.session.execute(db.select(User.id, User.username, User.email).order_by(User.id)).all()
+    return jsonify([user._asdict() for user in users])
+
+@user_bp.route('/users/summary', methods=['GET'])
+def get_user_summaries():
+    """Page of users with their expense count, total and date range"""
+    # Keyset cursor: the id of the last user on the previous page
+    cursor = request.args.get('cursor') or '0'
+    if not cursor.isdecimal():
+        return jsonify({'error': 'Invalid cursor'}), 400
+    cursor = int(cursor)
+    try:
+        limit = parse_limit(request.args.get('limit'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # One grouped query over the daily rollups (a row per user and day) rather than a query per user
+    rows = db.session.execute(
+        select(
+            User.id, User.username, User.email,
+            func.coalesce(func.sum(DailyRollup.transaction_count), 0).label('expense_count'),
+            func.coalesce(func.sum(DailyRollup.total_cents), 0).label('total_cents'),
+            func.min(DailyRollup.date).label('first_expense_date'),
+            func.max(DailyRollup.date).label('last_expense_date')
+        )
+        .outerjoin(DailyRollup, DailyRollup.user_id == User.id)
+        .where(User.id > cursor)
+        .group_by(User.id)
+        .order_by(User.id)
+        .limit(limit + 1)
+    ).all()
+    
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = rows[-1].id
+    
+    response = jsonify([{
+        'id': row.id,
+        'username': row.username,
+        'email': row.email,
+        'expense_count': row.expense_count,
+        'total_amount': cents_to_number(row.total_cents),
+        'total_amount_decimal': format_cents(row.total_cents),
+        'total_amount_cents': row.total_cents,
+        'first_expense_date': row.first_expense_date,
+        'last_expense_date': row.last_expense_date
+    } for row in rows])
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = str(next_cursor)
+        args = request.args.to_dict()
+        args['cursor'] = next_cursor
+        response.headers['Link'] = f'<{url_for(".get_user_summaries", **args)}>; rel="next"'
+    return response
 
 @user_bp.route('/users', methods=['POST'])
 def create_user():
@@ -34,6 +94,16 @@ def update_user(user_id):
 @user_bp.route('/users/<int:user_id>', methods=['DELETE'])
 def delete_user(user_id):
     user = User.query.get_or_404(user_id)
+    
+    # Cascade with one statement per table instead of loading and deleting each expense
+    expenses = Expense.user_id == user_id
+    released, legacy_paths = release_receipts([expenses])
+    db.session.execute(delete(Expense).where(expenses).execution_options(synchronize_session=False))
+    delete_user_rollups(db.session, user_id)
+    # Bumped rather than removed: SQLite may hand this id to the next new user
+    bump_data_versions(db.session, [user_id])
     db.session.delete(user)
     db.session.commit()
+    
+    blob_store.cleanup_later(released, legacy_paths)
     return '', 204
@@ -0,0 +1,236 @@
+"""Content-addressed, reference-counted store for receipt images.
+
+Uploads are streamed to a temp file in fixed-size chunks while being hashed,
+so memory per upload stays constant whatever the image size, and anything
+over RECEIPT_MAX_BYTES is rejected part-way through. The file is then moved
+to `<root>/ab/cd/<sha256>`, so identical receipts are stored once and names
+never collide. A `receipt_blob` row tracks how many expenses point at each
+blob; once the delete that drops the last one has committed, the blob goes
+too, and uploads that were never attached to an expense are swept after RECEIPT_ORPHAN_GRACE seconds.
+
+Only JPEG, PNG, WebP and HEIC images are stored. The type is read from the
+file's magic bytes, never from the client's Content-Type, so e.g. an SVG
+(which can carry script) cannot be uploaded under an image/* header.
+
+Files are only published after the row is committed and only unlinked while
+the deleting transaction still holds the row, so an upload of the same bytes
+racing a delete always ends with both the row and the file present.
+
+Sweep orphans with: python src/manage.py sweep-receipts
+"""
+import glob
+import hashlib
+import os
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import bindparam, delete, select, update
+from src.models.engine import upsert_insert
+from src.models.receipt_blob import ReceiptBlob
+from src.models.user import db
+
+CHUNK_SIZE = 64 * 1024
+RECEIPT_CONTENT_TYPES = ('image/jpeg', 'image/png', 'image/webp', 'image/heic')
+# ISO BMFF brands of HEIF files holding HEVC-coded images (HEIC)
+HEIC_BRANDS = {b'heic', b'heix', b'hevc', b'hevx', b'heim', b'heis', b'mif1', b'msf1'}
+
+
+class BlobTooLarge(Exception):
+    """Raised when an upload exceeds RECEIPT_MAX_BYTES"""
+
+
+class UnsupportedImage(Exception):
+    """Raised when an upload is not one of the RECEIPT_CONTENT_TYPES"""
+
+
+def sniff_image_type(head):
+    """Content type of an accepted receipt image from its first bytes, or None"""
+    if head.startswith(b'\xff\xd8\xff'):
+        return 'image/jpeg'
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'image/png'
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+    if head[4:8] == b'ftyp' and head[8:12] in HEIC_BRANDS:
+        return 'image/heic'
+    return None
+
+
+class BlobStore:
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.root = app.config.get('RECEIPT_STORE_DIR') or os.path.join(app.root_path, 'database', 'receipts')
+        self.max_bytes = app.config.get('RECEIPT_MAX_BYTES', 10 * 1024 * 1024)
+        self.orphan_grace = timedelta(seconds=app.config.get('RECEIPT_ORPHAN_GRACE', 86400))
+        app.extensions['blob_store'] = self
+
+    def path_for(self, blob_hash):
+        """Where a blob lives on disk, sharded by the first two bytes of its hash"""
+        return os.path.join(self.root, blob_hash[:2], blob_hash[2:4], blob_hash)
+
+    def derived_path_for(self, blob_hash, suffix):
+        """Where a file derived from a blob (e.g. a thumbnail) is cached"""
+        return os.path.join(self.root, 'derived', blob_hash[:2], blob_hash[2:4], f'{blob_hash}.{suffix}')
+
+    def _write_temp(self, stream):
+        """Copy a stream to a temp file chunk by chunk, returning (hash, size, temp_path)"""
+        temp_dir = os.path.join(self.root, 'tmp')
+        os.makedirs(temp_dir, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=temp_dir)
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                while True:
+                    chunk = stream.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise BlobTooLarge(f'Receipt is larger than {self.max_bytes} bytes')
+                    digest.update(chunk)
+                    f.write(chunk)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        return digest.hexdigest(), size, temp_path
+
+    def put(self, stream):
+        """Store an image stream as a blob (deduplicated by content) and return its hash.
+
+        Raises UnsupportedImage unless the bytes are a JPEG, PNG, WebP or HEIC image.
+
+        The blob starts with no references; attach it to an expense with
+        `add_reference` or it will eventually be swept.
+        """
+        blob_hash, size, temp_path = self._write_temp(stream)
+        try:
+            if size == 0:
+                raise ValueError('Empty receipt upload')
+            with open(temp_path, 'rb') as f:
+                content_type = sniff_image_type(f.read(16))
+            if content_type is None:
+                raise UnsupportedImage('Receipt must be a JPEG, PNG, WebP or HEIC image')
+
+            now = datetime.utcnow()
+            stmt = upsert_insert(db.session, ReceiptBlob).values(
+                hash=blob_hash, size=size, content_type=content_type, ref_count=0,
+                created_at=now, last_used_at=now
+            )
+            db.session.execute(stmt.on_conflict_do_update(
+                index_elements=['hash'], set_={'last_used_at': now}
+            ))
+            db.session.commit()
+
+            # Always (re)publish: a delete of the same bytes may have removed the
+            # file just before our row was committed
+            final_path = self.path_for(blob_hash)
+            os.makedirs(os.path.dirname(final_path), exist_ok=True)
+            os.replace(temp_path, final_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+        return blob_hash
+
+    def get(self, blob_hash):
+        """Return the ReceiptBlob row for a hash, or None"""
+        return db.session.get(ReceiptBlob, blob_hash)
+
+    def add_reference(self, blob_hash):
+        """Count one more expense using the blob, in the current transaction; False if it does not exist"""
+        return db.session.execute(
+            update(ReceiptBlob)
+            .where(ReceiptBlob.hash == blob_hash)
+            .values(ref_count=ReceiptBlob.ref_count + 1, last_used_at=datetime.utcnow())
+        ).rowcount == 1
+
+    def release(self, blob_hash):
+        """Drop one reference in the current transaction.
+
+        A blob left unused keeps its row and file until delete_unreferenced()
+        runs, usually through cleanup_later() once the transaction has
+        committed, so a rolled-back delete never loses the file.
+        """
+        db.session.execute(
+            update(ReceiptBlob)
+            .where(ReceiptBlob.hash == blob_hash)
+            .values(ref_count=ReceiptBlob.ref_count - 1)
+        )
+
+    def release_many(self, counts):
+        """Drop {blob_hash: references} in one statement in the current transaction.
+
+        As with release(), blobs left unused are deleted by delete_unreferenced();
+        sweep_orphans() catches any that are missed.
+        """
+        if not counts:
+            return
+        stmt = (
+            update(ReceiptBlob.__table__)
+            .where(ReceiptBlob.hash == bindparam('blob_hash'))
+            .values(ref_count=ReceiptBlob.ref_count - bindparam('released'))
+        )
+        db.session.connection().execute(stmt, [
+            {'blob_hash': blob_hash, 'released': released} for blob_hash, released in counts.items()
+        ])
+
+    def delete_unreferenced(self, blob_hashes):
+        """Delete those of the given blobs that no expense uses any more, returning how many went"""
+        deleted = 0
+        for blob_hash in blob_hashes:
+            # Unlinked while this transaction holds the row
+            if db.session.execute(
+                delete(ReceiptBlob).where(ReceiptBlob.hash == blob_hash, ReceiptBlob.ref_count <= 0)
+            ).rowcount:
+                self._unlink(blob_hash)
+                deleted += 1
+        db.session.commit()
+        return deleted
+
+    def cleanup_later(self, blob_hashes, paths=()):
+        """Delete released blobs and remove legacy receipt files on a background thread"""
+        blob_hashes, paths = list(blob_hashes), list(paths)
+        if not blob_hashes and not paths:
+            return None
+        app = current_app._get_current_object()
+
+        def cleanup():
+            with app.app_context():
+                if blob_hashes:
+                    self.delete_unreferenced(blob_hashes)
+            for path in paths:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+        thread = threading.Thread(target=cleanup, name='receipt-cleanup', daemon=True)
+        thread.start()
+        return thread
+
+    def sweep_orphans(self):
+        """Delete blobs that were uploaded but never attached within the grace period"""
+        cutoff = datetime.utcnow() - self.orphan_grace
+        condition = (ReceiptBlob.ref_count <= 0, ReceiptBlob.last_used_at < cutoff)
+        swept = 0
+        for blob_hash in db.session.execute(select(ReceiptBlob.hash).where(*condition)).scalars().all():
+            # Re-check per row: the blob may have been attached since the select
+            if db.session.execute(delete(ReceiptBlob).where(ReceiptBlob.hash == blob_hash, *condition)).rowcount:
+                self._unlink(blob_hash)
+                swept += 1
+        db.session.commit()
+        return swept
+
+    def _unlink(self, blob_hash):
+        for path in [self.path_for(blob_hash)] + glob.glob(self.derived_path_for(blob_hash, '*')):
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+
+blob_store = BlobStore()
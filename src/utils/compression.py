@@ -0,0 +1,70 @@
+"""Response compression for large JSON and text payloads.
+
+Responses of at least COMPRESS_MIN_BYTES with a compressible mimetype are
+compressed with brotli when the client accepts it and the `brotli` package
+is installed, and with gzip otherwise. Streamed responses (such as
+/api/expenses/export, which compresses itself) are left alone.
+
+A compressed body is a different representation, so a strong ETag is
+weakened; If-None-Match uses weak comparison, so revalidation still works.
+"""
+import gzip
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # optional: pip install brotli
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {'application/json', 'application/x-ndjson', 'text/csv', 'text/plain', 'text/html'}
+
+
+class Compressor:
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('COMPRESS_ENABLED', True)
+        self.min_bytes = app.config.get('COMPRESS_MIN_BYTES', 1024)
+        self.gzip_level = app.config.get('COMPRESS_GZIP_LEVEL', 6)
+        self.brotli_quality = app.config.get('COMPRESS_BROTLI_QUALITY', 4)
+        app.after_request(self.after_request)
+        app.extensions['compressor'] = self
+
+    def choose_encoding(self, accept_encodings):
+        """Pick 'br', 'gzip' or None from a request's Accept-Encoding"""
+        if brotli is not None and accept_encodings['br']:
+            return 'br'
+        if accept_encodings['gzip']:
+            return 'gzip'
+        return None
+
+    def compress(self, data, encoding):
+        if encoding == 'br':
+            return brotli.compress(data, quality=self.brotli_quality)
+        return gzip.compress(data, compresslevel=self.gzip_level, mtime=0)
+
+    def after_request(self, response):
+        if not self.enabled or response.mimetype not in COMPRESSIBLE_MIMETYPES:
+            return response
+        response.vary.add('Accept-Encoding')
+        if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+                or 'Content-Encoding' in response.headers or request.method == 'HEAD'):
+            return response
+        encoding = self.choose_encoding(request.accept_encodings)
+        if encoding is None:
+            return response
+        data = response.get_data()
+        if len(data) < self.min_bytes:
+            return response
+
+        response.set_data(self.compress(data, encoding))
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+
+
+compressor = Compressor()
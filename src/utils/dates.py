@@ -0,0 +1,12 @@
+from datetime import date
+
+
+def month_range(month):
+    """Turn a YYYY-MM string into a half-open [start, end) date range, raising ValueError if malformed"""
+    year, month_num = map(int, month.split('-'))
+    start = date(year, month_num, 1)
+    if month_num == 12:
+        end = date(year + 1, 1, 1)
+    else:
+        end = date(year, month_num + 1, 1)
+    return start, end
@@ -0,0 +1,248 @@
+"""Vectorized multi-period reports over a user's whole expense history.
+
+A user's expenses are read once into compact NumPy columns: the date as int32
+days since 1970-01-01, the amount as int64 cents and the category as an int32
+code into a sorted list of names. Rows are ordered by date, so a date range
+is two binary searches and a slice. Reports are then a handful of bincount,
+cumsum and sort calls over the whole history instead of a Python loop per row
+or one SQL query per period.
+
+Loaded columns are kept in a small LRU keyed by the user's data version, so
+a dashboard asking for several reports reads the expense table once and a
+write makes the next request load fresh columns.
+
+This module imports numpy; the analytics routes import it on first use so
+workers that never serve these reports do not load it.
+"""
+import threading
+from collections import OrderedDict, namedtuple
+import numpy as np
+from sqlalchemy import String, cast, select
+from src.models.data_version import get_data_version
+from src.models.expense import Expense
+
+# Loaded users kept per worker; about 16 bytes per expense each
+COLUMN_CACHE_ENTRIES = 8
+EPOCH = np.datetime64('1970-01-01', 'D')
+
+ExpenseColumns = namedtuple('ExpenseColumns', ['days', 'cents', 'category_codes', 'categories'])
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def load_columns(session, user_id):
+    """Return a user's expenses as ExpenseColumns, sorted by date"""
+    key = (user_id, get_data_version(session, user_id))
+    with _cache_lock:
+        columns = _cache.get(key)
+        if columns is not None:
+            _cache.move_to_end(key)
+            return columns
+
+    # Core rather than ORM execution: no per-row ORM processing. Dates come
+    # back as ISO strings and are parsed by NumPy in one go.
+    rows = session.connection().execute(
+        select(cast(Expense.date, String), Expense.amount_cents, Expense.category)
+        .where(Expense.user_id == user_id)
+        .order_by(Expense.date)
+    ).all()
+    if rows:
+        dates, cents, categories = zip(*rows)
+        days = (np.array(dates, dtype='datetime64[D]') - EPOCH).astype(np.int32)
+        # Code categories in order of appearance, then renumber them alphabetically
+        seen = {}
+        codes = np.fromiter((seen.setdefault(name, len(seen)) for name in categories), np.int32, len(categories))
+        names = sorted(seen)
+        renumber = np.empty(len(names), np.int32)
+        renumber[[seen[name] for name in names]] = np.arange(len(names), dtype=np.int32)
+        columns = ExpenseColumns(days, np.array(cents, dtype=np.int64), renumber[codes], names)
+    else:
+        columns = ExpenseColumns(np.empty(0, np.int32), np.empty(0, np.int64), np.empty(0, np.int32), [])
+
+    with _cache_lock:
+        # Older versions of this user's columns can never be asked for again
+        for stale in [k for k in _cache if k[0] == user_id]:
+            del _cache[stale]
+        _cache[key] = columns
+        while len(_cache) > COLUMN_CACHE_ENTRIES:
+            _cache.popitem(last=False)
+    return columns
+
+
+def to_day(value):
+    """Day number for a datetime.date"""
+    return int((np.datetime64(value, 'D') - EPOCH).astype(np.int32))
+
+
+def day_strings(days):
+    """ISO dates for an array of day numbers"""
+    return (EPOCH + days.astype('timedelta64[D]')).astype(str).tolist()
+
+
+def month_strings(months):
+    """YYYY-MM periods for an array of month numbers (months since 1970-01)"""
+    return months.astype('datetime64[M]').astype(str).tolist()
+
+
+def months_of(days):
+    """Month number of each day number"""
+    return (EPOCH + days.astype('timedelta64[D]')).astype('datetime64[M]').astype(np.int32)
+
+
+def _slice_days(columns, first=None, last=None):
+    lo = 0 if first is None else int(np.searchsorted(columns.days, first, side='left'))
+    hi = len(columns.days) if last is None else int(np.searchsorted(columns.days, last, side='right'))
+    return ExpenseColumns(columns.days[lo:hi], columns.cents[lo:hi], columns.category_codes[lo:hi],
+                          columns.categories)
+
+
+def between(columns, start=None, end=None):
+    """Rows dated within [start, end] (datetime.date, either may be None), as views into the columns"""
+    return _slice_days(columns, None if start is None else to_day(start), None if end is None else to_day(end))
+
+
+def _money(cents):
+    """Amounts in cents as JSON numbers in currency units, rounded half up to the cent"""
+    return (np.floor(np.asarray(cents) + 0.5) / 100).tolist()
+
+
+def _day_range(columns, start=None, end=None):
+    """(first, last) day numbers of [start, end], open ends taken from the data"""
+    first = columns.days[0] if start is None else to_day(start)
+    last = columns.days[-1] if end is None else to_day(end)
+    return int(first), int(last)
+
+
+def rolling_days(columns, start=None, end=None):
+    """Number of days rolling_average reports for [start, end]"""
+    if not len(columns.days):
+        return 0
+    first, last = _day_range(columns, start, end)
+    return max(last - first + 1, 0)
+
+
+def rolling_average(columns, window, start=None, end=None):
+    """Daily totals and their trailing `window`-day average for every day in [start, end]"""
+    if not len(columns.days):
+        return []
+    first, last = _day_range(columns, start, end)
+    if last < first:
+        return []
+
+    # Include the window-1 days before the range so its first averages are complete
+    origin = first - (window - 1)
+    selected = _slice_days(columns, origin, last)
+    totals = np.bincount(selected.days - origin, weights=selected.cents, minlength=int(last - origin + 1))
+    running = np.concatenate(([0.0], np.cumsum(totals)))
+    averages = (running[window:] - running[:-window]) / window
+
+    dates = day_strings(np.arange(first, last + 1))
+    return [
+        {'date': date, 'total_amount': total, 'rolling_average': average}
+        for date, total, average in zip(dates, _money(totals[window - 1:]), _money(averages))
+    ]
+
+
+def month_over_month(columns, category=None):
+    """Monthly totals from the first to the last month with spending, with the change from the month before"""
+    if category is not None:
+        if category not in columns.categories:
+            return []
+        mask = columns.category_codes == columns.categories.index(category)
+        columns = ExpenseColumns(columns.days[mask], columns.cents[mask], columns.category_codes[mask],
+                                 columns.categories)
+    if not len(columns.days):
+        return []
+
+    months = months_of(columns.days)
+    first = months[0]
+    totals = np.bincount(months - first, weights=columns.cents)
+    counts = np.bincount(months - first)
+    previous = np.concatenate(([np.nan], totals[:-1]))
+    changes = totals - previous
+    with np.errstate(divide='ignore', invalid='ignore'):
+        percents = np.where(previous > 0, changes / previous * 100, np.nan)
+
+    periods = month_strings(np.arange(first, first + len(totals)))
+    return [
+        {
+            'period': period,
+            'total_amount': total,
+            'transaction_count': count,
+            'change': None if np.isnan(change) else change,
+            'change_percent': None if np.isnan(percent) else percent
+        }
+        for period, total, count, change, percent in zip(
+            periods, _money(totals), counts.tolist(), _money(changes), np.round(percents, 2).tolist()
+        )
+    ]
+
+
+def category_month_pivot(columns):
+    """Category x month table of totals, with row and column totals"""
+    if not len(columns.days):
+        return {'periods': [], 'categories': [], 'rows': [], 'column_totals': []}
+
+    months = months_of(columns.days)
+    first = months[0]
+    month_count = int(months[-1] - first + 1)
+    category_count = len(columns.categories)
+    cells = np.bincount(
+        columns.category_codes * month_count + (months - first),
+        weights=columns.cents,
+        minlength=category_count * month_count
+    ).reshape(category_count, month_count)
+
+    # Drop categories with no spending in the range
+    present = np.flatnonzero(np.bincount(columns.category_codes, minlength=category_count))
+    cells = cells[present]
+    categories = [columns.categories[i] for i in present]
+    return {
+        'periods': month_strings(np.arange(first, first + month_count)),
+        'categories': categories,
+        'rows': [
+            {'category': category, 'totals': totals, 'total_amount': total}
+            for category, totals, total in zip(categories, _money(cells), _money(cells.sum(axis=1)))
+        ],
+        'column_totals': _money(cells.sum(axis=0))
+    }
+
+
+def category_percentiles(columns, percentiles):
+    """Percentiles of single-expense amounts per category (linear interpolation, as numpy.percentile)"""
+    if not len(columns.days):
+        return []
+
+    category_count = len(columns.categories)
+    order = np.lexsort((columns.cents, columns.category_codes))
+    sorted_cents = columns.cents[order]
+    counts = np.bincount(columns.category_codes, minlength=category_count)
+    sums = np.bincount(columns.category_codes, weights=columns.cents, minlength=category_count)
+    starts = np.cumsum(counts) - counts
+
+    present = np.flatnonzero(counts)
+    counts, sums, starts = counts[present], sums[present], starts[present]
+    # Fractional position of every requested percentile within each category's sorted run
+    positions = (counts[:, None] - 1) * (np.asarray(percentiles, dtype=np.float64)[None, :] / 100)
+    below = np.floor(positions).astype(np.int64)
+    above = np.minimum(below + 1, counts[:, None] - 1)
+    fraction = positions - below
+    low = sorted_cents[starts[:, None] + below]
+    high = sorted_cents[starts[:, None] + above]
+    values = low + (high - low) * fraction
+
+    return [
+        {
+            'category': columns.categories[code],
+            'transaction_count': count,
+            'average_amount': average,
+            'min_amount': smallest,
+            'max_amount': largest,
+            'percentiles': {f'p{percentile:g}': value for percentile, value in zip(percentiles, row)}
+        }
+        for code, count, average, smallest, largest, row in zip(
+            present.tolist(), counts.tolist(), _money(sums / counts),
+            _money(sorted_cents[starts]), _money(sorted_cents[starts + counts - 1]), _money(values)
+        )
+    ]
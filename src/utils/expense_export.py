@@ -0,0 +1,50 @@
+import csv
+import io
+import json
+import zlib
+
+EXPORT_CHUNK_SIZE = 1000
+
+
+def _chunks(rows, size=EXPORT_CHUNK_SIZE):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def iter_csv(rows, fields, serialize):
+    """Yield CSV-encoded bytes, one chunk of rows at a time"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    for chunk in _chunks(rows):
+        for row in chunk:
+            record = serialize(row, fields)
+            writer.writerow([record[field] for field in fields])
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    tail = buffer.getvalue()
+    if tail:
+        yield tail.encode('utf-8')
+
+
+def iter_ndjson(rows, fields, serialize):
+    """Yield newline-delimited JSON bytes, one chunk of rows at a time"""
+    for chunk in _chunks(rows):
+        yield ''.join(json.dumps(serialize(row, fields)) + '\n' for row in chunk).encode('utf-8')
+
+
+def gzip_stream(chunks, level=6):
+    """Gzip-compress a stream of byte chunks without buffering the whole output"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,103 @@
+import csv
+import io
+import json
+
+CSV_MIMETYPES = ('text/csv', 'application/csv')
+NDJSON_MIMETYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl', 'application/json-lines')
+# Longer NDJSON lines are skipped (and reported) without being held in memory
+MAX_LINE_LENGTH = 64 * 1024
+
+
+def detect_format(format_arg, mimetype):
+    """Pick 'csv' or 'ndjson' from an explicit format argument or the request Content-Type"""
+    if format_arg:
+        format_arg = format_arg.lower()
+        return format_arg if format_arg in ('csv', 'ndjson') else None
+    if mimetype in CSV_MIMETYPES:
+        return 'csv'
+    if mimetype in NDJSON_MIMETYPES:
+        return 'ndjson'
+    return None
+
+
+class _WSGIInputReader(io.RawIOBase):
+    """Adapt a WSGI input stream (only guaranteed to have read()) to the io interface"""
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self.stream.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def iter_import_rows(stream, import_format):
+    """Yield (row_number, data, error) for each record in a binary stream, reading it incrementally"""
+    # Servers such as gunicorn hand over a bare wsgi.input without readable()/readinto()
+    text = io.TextIOWrapper(io.BufferedReader(_WSGIInputReader(stream)), encoding='utf-8', newline='')
+    if import_format == 'csv':
+        reader = csv.DictReader(text)
+        try:
+            for row_number, row in enumerate(reader, start=1):
+                yield row_number, row, None
+        except (csv.Error, UnicodeDecodeError) as e:
+            yield reader.line_num, None, f'Malformed CSV: {e}'
+    else:
+        row_number = 0
+        try:
+            while True:
+                line = text.readline(MAX_LINE_LENGTH + 1)
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                row_number += 1
+                if len(line) > MAX_LINE_LENGTH and not line.endswith('\n'):
+                    while line and not line.endswith('\n'):
+                        line = text.readline(MAX_LINE_LENGTH)
+                    yield row_number, None, f'Line is longer than {MAX_LINE_LENGTH} characters'
+                    continue
+                try:
+                    data = json.loads(line)
+                except ValueError:
+                    yield row_number, None, 'Invalid JSON'
+                    continue
+                if not isinstance(data, dict):
+                    yield row_number, None, 'Each line must be a JSON object'
+                    continue
+                yield row_number, data, None
+        except UnicodeDecodeError as e:
+            yield row_number + 1, None, f'Invalid UTF-8: {e}'
+
+
+IMPORT_COLUMNS = ('user_id', 'amount_cents', 'currency', 'category', 'description', 'date', 'payment_method', 'created_at')
+# Each IMPORT_COLUMNS value of a json_each row, in order
+_JSON_ROW_VALUES = ', '.join(f"json_extract(value, '$[{n}]')" for n in range(len(IMPORT_COLUMNS)))
+
+
+def insert_expense_rows(session, table, rows, created_at):
+    """INSERT validated rows with a single statement in the session's transaction"""
+    connection = session.connection()
+    if connection.dialect.name != 'sqlite':
+        session.execute(table.insert(), [dict(row, created_at=created_at) for row in rows])
+        return
+
+    # On SQLite, skip SQLAlchemy's per-row bind processing and hand the rows over
+    # already in the storage format it would have produced, as one JSON array
+    # expanded by json_each. A single statement rather than an executemany also
+    # lets the expense_fts triggers (src/models/expense_search.py) flush the
+    # search index once per batch instead of once per row.
+    created_at = created_at.strftime('%Y-%m-%d %H:%M:%S.%f')
+    sql = (
+        f"INSERT INTO {table.name} ({', '.join(IMPORT_COLUMNS)}) "
+        f"SELECT {_JSON_ROW_VALUES} FROM json_each(?)"
+    )
+    connection.exec_driver_sql(sql, (json.dumps([
+        (row['user_id'], row['amount_cents'], row['currency'], row['category'], row['description'],
+         row['date'].isoformat(), row['payment_method'], created_at)
+        for row in rows
+    ]),))
@@ -0,0 +1,61 @@
+"""JSON provider used for every jsonify() response.
+
+Encodes with orjson when it is installed and falls back to the standard
+library otherwise, so the output is the same JSON either way. Dates and
+datetimes are written natively as ISO 8601 strings (the same text as
+.isoformat()), so list endpoints can hand rows over without formatting each
+date in Python first; see Expense.serialize_rows.
+"""
+from datetime import date
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional: pip install orjson
+    orjson = None
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    @staticmethod
+    def default(o):
+        if isinstance(o, date):
+            return o.isoformat()
+        return DefaultJSONProvider.default(o)
+
+    def _options(self):
+        options = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        return options
+
+    def _encode(self, obj):
+        """UTF-8 JSON bytes for obj, or None if orjson is unavailable or cannot encode it"""
+        if orjson is None:
+            return None
+        try:
+            return orjson.dumps(obj, default=self.default, option=self._options())
+        except orjson.JSONEncodeError:
+            # e.g. integers wider than 64 bits; the standard library handles those
+            return None
+
+    def dumps(self, obj, **kwargs):
+        if not kwargs:
+            encoded = self._encode(obj)
+            if encoded is not None:
+                return encoded.decode()
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        # Pretty-printed debug output goes through the standard library
+        if self.compact is False or (self.compact is None and self._app.debug):
+            return super().response(obj)
+        encoded = self._encode(obj)
+        if encoded is None:
+            return super().response(obj)
+        return self._app.response_class(encoded + b'\n', mimetype=self.mimetype)
@@ -0,0 +1,377 @@
+"""Request-level performance metrics, exposed in Prometheus text format on /metrics.
+
+For every request this records, labelled by method and route rule (e.g.
+/api/expenses/<int:expense_id>, so ids do not explode the label set):
+    http_requests_total                 counter, also labelled by status
+    http_request_duration_seconds       histogram
+    http_request_sql_statements         histogram of SQL statements issued
+    http_request_sql_duration_seconds   histogram of time spent in them
+    http_response_size_bytes            histogram of bodies as sent (after compression)
+    http_requests_in_flight             gauge
+SQL is timed through SQLAlchemy engine events, so statements issued outside a
+request (the OCR queue, migrations) are not attributed to one.
+
+Each gunicorn worker keeps its own numbers and writes them to
+METRICS_DIR/<pid>.json from a background thread every METRICS_FLUSH_SECONDS
+(and when it exits). /metrics adds up every worker's file, so a scrape answered by any
+worker reports the whole server. When a worker exits, the master marks its
+file dead (see gunicorn.conf.py) and the next scrape folds it into
+archive.json, so counters never go backwards. Without METRICS_DIR, /metrics reports only the current process.
+
+SLOW_REQUEST_MS turns on a log of requests slower than that, with the SQL
+they ran. SLOW_REQUEST_PROFILE_DIR additionally runs every request under
+cProfile and dumps the profile of slow ones there (.prof files, open with
+pstats or snakeviz); profiling roughly doubles request CPU time, so enable
+it only while investigating.
+"""
+import cProfile
+import fcntl
+import glob
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from src.models.user import db
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+STATEMENT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+COUNTERS = {
+    'http_requests_total': 'Requests served, by method, route and status',
+}
+HISTOGRAMS = {
+    'http_request_duration_seconds': ('Request latency in seconds', DURATION_BUCKETS),
+    'http_request_sql_statements': ('SQL statements issued per request', STATEMENT_BUCKETS),
+    'http_request_sql_duration_seconds': ('Time spent in SQL per request, in seconds', DURATION_BUCKETS),
+    'http_response_size_bytes': ('Response body size in bytes, as sent', SIZE_BUCKETS),
+}
+IN_FLIGHT = 'http_requests_in_flight'
+
+ARCHIVE_FILE = 'archive.json'
+DEAD_PREFIX = 'dead-'
+LOCK_FILE = '.lock'
+# Statements kept per request for the slow-request log, and characters of each
+SLOW_LOG_STATEMENTS = 50
+SLOW_LOG_STATEMENT_CHARS = 500
+
+
+def empty_snapshot():
+    return {'in_flight': 0, 'counters': {}, 'histograms': {}}
+
+
+def merge_snapshot(total, snapshot, include_in_flight=True):
+    """Add one process's numbers into `total` (both as produced by RequestMetrics.snapshot)"""
+    if include_in_flight:
+        total['in_flight'] += snapshot.get('in_flight', 0)
+    for key, value in snapshot['counters'].items():
+        total['counters'][key] = total['counters'].get(key, 0) + value
+    for key, (counts, value_sum) in snapshot['histograms'].items():
+        if key in total['histograms']:
+            merged_counts, merged_sum = total['histograms'][key]
+            total['histograms'][key] = [[a + b for a, b in zip(merged_counts, counts)], merged_sum + value_sum]
+        else:
+            total['histograms'][key] = [list(counts), value_sum]
+    return total
+
+
+def _read_snapshot(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_snapshot(path, snapshot):
+    fd, temporary = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(snapshot, f, separators=(',', ':'))
+    os.replace(temporary, path)
+
+
+@contextmanager
+def _locked(directory):
+    """Hold the metrics directory lock across worker processes"""
+    with open(os.path.join(directory, LOCK_FILE), 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def mark_process_dead(pid, directory=None):
+    """Mark an exited worker's numbers for folding into the archive on the next scrape.
+
+    Called by the gunicorn master from its SIGCHLD handling, which can re-enter
+    itself, so this only renames a file and never takes the lock.
+    """
+    directory = directory or os.environ.get('METRICS_DIR')
+    if not directory:
+        return
+    try:
+        os.replace(os.path.join(directory, f'{pid}.json'), os.path.join(directory, f'{DEAD_PREFIX}{pid}.json'))
+    except FileNotFoundError:
+        pass
+
+
+def _fold_dead_workers(directory):
+    """Merge exited workers' counters into the archive, dropping their in-flight gauge; caller holds the lock"""
+    dead = glob.glob(os.path.join(directory, f'{DEAD_PREFIX}*.json'))
+    if not dead:
+        return
+    archive_path = os.path.join(directory, ARCHIVE_FILE)
+    archive = _read_snapshot(archive_path) or empty_snapshot()
+    for path in dead:
+        snapshot = _read_snapshot(path)
+        if snapshot is not None:
+            merge_snapshot(archive, snapshot, include_in_flight=False)
+    _write_snapshot(archive_path, archive)
+    for path in dead:
+        os.remove(path)
+
+
+def reset_metrics_dir(directory=None):
+    """Remove numbers left over from a previous server run"""
+    directory = directory or os.environ.get('METRICS_DIR')
+    if not directory:
+        return
+    os.makedirs(directory, exist_ok=True)
+    for path in glob.glob(os.path.join(directory, '*.json')):
+        os.remove(path)
+
+
+def _key(name, labels):
+    # Snapshots go through JSON files, so series are keyed by a JSON string of [name, [[label, value], ...]]
+    return json.dumps([name, labels])
+
+
+def _split_key(key):
+    return json.loads(key)
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(pairs, extra=None):
+    pairs = pairs + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{label}="{_escape(value)}"' for label, value in pairs) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(snapshot):
+    """Prometheus text exposition (format 0.0.4) of a merged snapshot"""
+    lines = [f'# HELP {IN_FLIGHT} Requests being served right now',
+             f'# TYPE {IN_FLIGHT} gauge',
+             f"{IN_FLIGHT} {snapshot['in_flight']}"]
+
+    for name, description in COUNTERS.items():
+        lines += [f'# HELP {name} {description}', f'# TYPE {name} counter']
+        for key in sorted(snapshot['counters']):
+            key_name, pairs = _split_key(key)
+            if key_name == name:
+                lines.append(f"{name}{_labels(pairs)} {_number(snapshot['counters'][key])}")
+
+    for name, (description, buckets) in HISTOGRAMS.items():
+        lines += [f'# HELP {name} {description}', f'# TYPE {name} histogram']
+        for key in sorted(snapshot['histograms']):
+            key_name, pairs = _split_key(key)
+            if key_name != name:
+                continue
+            counts, value_sum = snapshot['histograms'][key]
+            cumulative = 0
+            for bound, count in zip(buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else _number(bound)
+                lines.append(f"{name}_bucket{_labels(pairs, ['le', le])} {cumulative}")
+            lines.append(f'{name}_sum{_labels(pairs)} {_number(value_sum)}')
+            lines.append(f'{name}_count{_labels(pairs)} {cumulative}')
+    return '\n'.join(lines) + '\n'
+
+
+class RequestMetrics:
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._state = empty_snapshot()
+        self._flush_lock = threading.Lock()
+        self._flusher_pid = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.directory = app.config.get('METRICS_DIR')
+        self.flush_seconds = app.config.get('METRICS_FLUSH_SECONDS', 1.0)
+        self.slow_ms = app.config.get('SLOW_REQUEST_MS')
+        self.profile_dir = app.config.get('SLOW_REQUEST_PROFILE_DIR') if self.slow_ms is not None else None
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+        if self.profile_dir:
+            os.makedirs(self.profile_dir, exist_ok=True)
+
+        app.before_request(self.before_request)
+        app.after_request(self.after_request)
+        app.teardown_request(self.teardown_request)
+        app.add_url_rule('/metrics', 'metrics', self.metrics_view)
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(db.engine, 'after_cursor_execute', self._after_cursor_execute)
+        app.extensions['request_metrics'] = self
+
+    # SQL accounting, per request
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if has_request_context() and 'metrics_sql' in g:
+            conn.info.setdefault('metrics_query_start', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if not (has_request_context() and 'metrics_sql' in g):
+            return
+        starts = conn.info.get('metrics_query_start')
+        if not starts:
+            return
+        elapsed = time.perf_counter() - starts.pop()
+        g.metrics_sql[0] += 1
+        g.metrics_sql[1] += elapsed
+        if g.metrics_statements is not None and len(g.metrics_statements) < SLOW_LOG_STATEMENTS:
+            g.metrics_statements.append((elapsed, statement))
+
+    # Request lifecycle
+
+    def before_request(self):
+        g.metrics_start = time.perf_counter()
+        g.metrics_sql = [0, 0.0]
+        g.metrics_statements = [] if self.slow_ms is not None else None
+        with self._lock:
+            self._state['in_flight'] += 1
+        if self.profile_dir:
+            g.metrics_profile = cProfile.Profile()
+            g.metrics_profile.enable()
+
+    def after_request(self, response):
+        if 'metrics_start' not in g:
+            return response
+        profile = g.pop('metrics_profile', None)
+        if profile is not None:
+            profile.disable()
+        duration = time.perf_counter() - g.metrics_start
+        statements, sql_seconds = g.metrics_sql
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        labels = [('method', request.method), ('route', route)]
+        size = response.calculate_content_length()
+
+        with self._lock:
+            counters = self._state['counters']
+            key = _key('http_requests_total', labels + [('status', str(response.status_code))])
+            counters[key] = counters.get(key, 0) + 1
+            self._observe('http_request_duration_seconds', labels, duration)
+            self._observe('http_request_sql_statements', labels, statements)
+            self._observe('http_request_sql_duration_seconds', labels, sql_seconds)
+            if size is not None:
+                self._observe('http_response_size_bytes', labels, size)
+
+        if self.slow_ms is not None and duration * 1000 >= self.slow_ms:
+            self._log_slow(route, response.status_code, duration, statements, sql_seconds, profile)
+        return response
+
+    def teardown_request(self, exc=None):
+        if 'metrics_start' not in g:
+            return
+        profile = g.pop('metrics_profile', None)
+        if profile is not None:
+            profile.disable()
+        with self._lock:
+            self._state['in_flight'] -= 1
+        g.pop('metrics_start')
+        if self.directory and self._flusher_pid != os.getpid():
+            self._start_flusher()
+
+    def _observe(self, name, labels, value):
+        # Caller holds the lock
+        buckets = HISTOGRAMS[name][1]
+        key = _key(name, labels)
+        histogram = self._state['histograms'].get(key)
+        if histogram is None:
+            histogram = self._state['histograms'][key] = [[0] * (len(buckets) + 1), 0]
+        histogram[0][bisect_left(buckets, value)] += 1
+        histogram[1] += value
+
+    def _log_slow(self, route, status, duration, statements, sql_seconds, profile):
+        message = [f'Slow request: {request.method} {request.full_path.rstrip("?")} ({route}) -> {status} '
+                   f'in {duration * 1000:.1f} ms, {statements} SQL statements in {sql_seconds * 1000:.1f} ms']
+        for elapsed, statement in g.metrics_statements:
+            message.append(f'  {elapsed * 1000:8.2f} ms  {" ".join(statement.split())[:SLOW_LOG_STATEMENT_CHARS]}')
+        if statements > len(g.metrics_statements):
+            message.append(f'  ... {statements - len(g.metrics_statements)} more')
+        if profile is not None:
+            name = re.sub(r'[^A-Za-z0-9]+', '_', route).strip('_') or 'root'
+            stamp = f'{time.strftime("%Y%m%d-%H%M%S")}-{time.time_ns() % 10 ** 9:09d}'
+            path = os.path.join(self.profile_dir, f'{stamp}-{os.getpid()}-{request.method}-{name}.prof')
+            profile.dump_stats(path)
+            message.append(f'  profile: {path}')
+        current_app.logger.warning('\n'.join(message))
+
+    # Aggregation and exposition
+
+    def snapshot(self):
+        """This process's numbers, as plain JSON-serializable data"""
+        with self._lock:
+            return {
+                'in_flight': self._state['in_flight'],
+                'counters': dict(self._state['counters']),
+                'histograms': {key: [list(counts), value_sum] for key, (counts, value_sum) in self._state['histograms'].items()}
+            }
+
+    def _start_flusher(self):
+        # One background thread per worker process (started after the fork), so idle workers publish their last requests too
+        with self._lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+        threading.Thread(target=self._flush_periodically, name='metrics-flush', daemon=True).start()
+
+    def _flush_periodically(self):
+        while True:
+            self.flush()
+            time.sleep(self.flush_seconds)
+
+    def flush(self):
+        """Write this process's numbers to METRICS_DIR for the other workers to read"""
+        if not self.directory:
+            return
+        with self._flush_lock:
+            _write_snapshot(os.path.join(self.directory, f'{os.getpid()}.json'), self.snapshot())
+
+    def collect(self):
+        """Numbers for the whole server: every worker's last flush, the archive, and this process live"""
+        total = empty_snapshot()
+        if self.directory:
+            own = os.path.join(self.directory, f'{os.getpid()}.json')
+            # Exclusive, since folding rewrites the archive; scrapes are rare
+            with _locked(self.directory):
+                _fold_dead_workers(self.directory)
+                for path in glob.glob(os.path.join(self.directory, '*.json')):
+                    if path == own:
+                        continue
+                    snapshot = _read_snapshot(path)
+                    if snapshot is not None:
+                        merge_snapshot(total, snapshot)
+        return merge_snapshot(total, self.snapshot())
+
+    def metrics_view(self):
+        return current_app.response_class(render(self.collect()), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+request_metrics = RequestMetrics()
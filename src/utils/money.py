@@ -0,0 +1,56 @@
+"""Exact money amounts as integer minor units.
+
+Amounts are stored, summed and grouped as integer cents (hundredths of the
+currency unit), so totals over any number of expenses are exact. Responses
+carry both `amount`, a JSON number kept for existing clients, and
+`amount_decimal`, an exact decimal string such as "12.50".
+"""
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+import re
+
+DEFAULT_CURRENCY = 'USD'
+CENT = Decimal('0.01')
+# Well inside both BIGINT and the range where cents / 100 is an exact float
+MAX_CENTS = 10 ** 15
+_CURRENCY_RE = re.compile(r'[A-Z]{3}')
+
+
+def to_cents(value):
+    """Parse an amount (number or decimal string) into integer cents, raising ValueError if invalid.
+
+    Values with more than two decimals are rounded half up, as they were when
+    amounts were floats.
+    """
+    if isinstance(value, bool):
+        raise ValueError('Invalid amount')
+    if isinstance(value, int):
+        cents = value * 100
+    else:
+        try:
+            # str() of a float is its shortest repr, so 12.1 parses as 12.1 and not 12.0999...
+            cents = int(Decimal(str(value).strip()).quantize(CENT, rounding=ROUND_HALF_UP) * 100)
+        except (InvalidOperation, ValueError, OverflowError):
+            raise ValueError('Invalid amount')
+    if abs(cents) >= MAX_CENTS:
+        raise ValueError('Amount is too large')
+    return cents
+
+
+def format_cents(cents):
+    """Exact decimal string for an amount in cents, e.g. 1250 -> '12.50'"""
+    sign = '-' if cents < 0 else ''
+    cents = abs(int(cents))
+    return f'{sign}{cents // 100}.{cents % 100:02d}'
+
+
+def cents_to_number(cents):
+    """JSON number for an amount in cents; below MAX_CENTS it prints as the exact decimal"""
+    return int(cents) / 100
+
+
+def parse_currency(value):
+    """Validate an ISO 4217 code, returning it upper-cased or raising ValueError"""
+    code = str(value).strip().upper()
+    if not _CURRENCY_RE.fullmatch(code):
+        raise ValueError('Invalid currency. Use a 3-letter ISO 4217 code')
+    return code
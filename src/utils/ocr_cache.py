@@ -0,0 +1,127 @@
+"""Content-addressed cache of OCR results.
+
+Results are keyed by the SHA-256 of the decoded image bytes together with a
+fingerprint of the processor config and pipeline version, so re-uploads of
+the same receipt skip Tesseract entirely. Lookups go to a small in-process
+LRU first and then to the `ocr_cache` table, which survives restarts, is
+shared by all workers and is trimmed back under OCR_CACHE_MAX_BYTES by
+evicting the least recently used entries.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from sqlalchemy import delete, func, select
+from src.models.ocr_cache import OcrCacheEntry
+from src.models.user import db
+from src.utils.ocr_config import config_fingerprint, effective_config
+
+
+class OcrResultCache:
+    def __init__(self, app=None):
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.memory_entries = app.config.get('OCR_CACHE_MEMORY_ENTRIES', 256)
+        self.max_bytes = app.config.get('OCR_CACHE_MAX_BYTES', 64 * 1024 * 1024)
+        self.fingerprint = config_fingerprint(effective_config(app.config.get('OCR_PROCESSOR_CONFIG')))
+        app.extensions['ocr_cache'] = self
+
+    def key_for(self, image_data):
+        """Cache key for an image under the current processor config"""
+        digest = hashlib.sha256(image_data)
+        digest.update(self.fingerprint.encode())
+        return digest.hexdigest()
+
+    def _count(self, counter, amount=1):
+        with self._lock:
+            self.counters[counter] += amount
+
+    def _remember(self, key, payload):
+        with self._lock:
+            self._memory[key] = payload
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def get(self, key):
+        """Return the cached result for a key, or None"""
+        with self._lock:
+            payload = self._memory.get(key)
+            if payload is not None:
+                self._memory.move_to_end(key)
+                self.counters['memory_hits'] += 1
+        if payload is not None:
+            return json.loads(payload)
+
+        entry = db.session.get(OcrCacheEntry, key)
+        if entry is None:
+            self._count('misses')
+            return None
+
+        entry.hits += 1
+        entry.last_used_at = datetime.utcnow()
+        db.session.commit()
+        self._count('disk_hits')
+        self._remember(key, entry.result)
+        return json.loads(entry.result)
+
+    def put(self, key, result):
+        """Store a result in both tiers, evicting old disk entries if over the size cap"""
+        payload = json.dumps(result)
+        self._remember(key, payload)
+        db.session.merge(OcrCacheEntry(key=key, result=payload, size=len(payload), hits=0))
+        db.session.commit()
+        self._count('stores')
+        self._evict()
+
+    def _evict(self):
+        total = db.session.query(func.coalesce(func.sum(OcrCacheEntry.size), 0)).scalar()
+        if total <= self.max_bytes:
+            return
+
+        # Trim to 90% of the cap so we are not evicting on every store
+        target = self.max_bytes * 0.9
+        victims = []
+        oldest = db.session.execute(
+            select(OcrCacheEntry.key, OcrCacheEntry.size).order_by(OcrCacheEntry.last_used_at)
+        )
+        for key, size in oldest:
+            if total <= target:
+                break
+            victims.append(key)
+            total -= size
+        oldest.close()
+
+        db.session.execute(delete(OcrCacheEntry).where(OcrCacheEntry.key.in_(victims)))
+        db.session.commit()
+        with self._lock:
+            for key in victims:
+                self._memory.pop(key, None)
+        self._count('evictions', len(victims))
+
+    def stats(self):
+        """Hit/miss counters for this process plus the size of both tiers"""
+        entries, size = db.session.query(
+            func.count(OcrCacheEntry.key), func.coalesce(func.sum(OcrCacheEntry.size), 0)
+        ).one()
+        with self._lock:
+            counters = dict(self.counters)
+            memory_entries = len(self._memory)
+        lookups = counters['memory_hits'] + counters['disk_hits'] + counters['misses']
+        return dict(
+            counters,
+            hit_ratio=(counters['memory_hits'] + counters['disk_hits']) / lookups if lookups else 0,
+            memory_entries=memory_entries,
+            disk_entries=entries,
+            disk_bytes=size,
+            max_bytes=self.max_bytes
+        )
+
+
+ocr_cache = OcrResultCache()
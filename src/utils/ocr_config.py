@@ -0,0 +1,35 @@
+"""OCR settings shared by the web process and the OCR pool.
+
+Kept free of cv2/pytesseract imports so the web process can build OCR cache
+keys without loading the image stack.
+"""
+import hashlib
+import json
+
+# Bump whenever a change to preprocessing or text extraction would change
+# the results for the same image, so cached results are not reused
+PIPELINE_VERSION = 2
+
+DEFAULT_PREPROCESS_CONFIG = {
+    'mode': 'adaptive',            # 'adaptive', or 'legacy' for the original full-resolution pipeline
+    'crop': True,                  # find the receipt and crop away the background
+    'deskew': True,                # straighten the receipt using its outline
+    'min_receipt_area': 0.15,      # smallest fraction of the frame accepted as the receipt
+    'target_text_height': 30,      # rescale so glyphs are about this tall (0 disables)
+    'max_scale': 2.0,              # largest upscaling factor for small text
+    'max_side': 4000,              # longest side allowed after rescaling
+    'denoise': 'auto',             # 'auto', 'nlmeans', 'median' or 'none'
+    'clean_noise_threshold': 3.0,  # noise sigma below which no denoising is done in auto mode
+    'morph_kernel': 0,             # closing kernel size; values below 2 skip the stage
+}
+
+
+def effective_config(overrides=None):
+    """Merge overrides into the default preprocessing config"""
+    return dict(DEFAULT_PREPROCESS_CONFIG, **(overrides or {}))
+
+
+def config_fingerprint(config):
+    """Stable hash of a processor config plus the pipeline version"""
+    payload = json.dumps({'version': PIPELINE_VERSION, 'config': config}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
@@ -1,72 +1,216 @@
 import pytesseract
 import cv2
 import numpy as np
-from PIL import Image
-import re
-import os
+import subprocess
+import time
+from contextlib import contextmanager
+from src.utils.ocr_config import effective_config
+from src.utils.receipt_text import categorize_text, pick_amount, pick_date, scan_receipt_text
+
+# Longest side used when looking for the receipt outline
+DETECTION_SIDE = 800
+
+
+@contextmanager
+def stage_timer(timings, stage):
+    """Add the milliseconds spent in the block to timings[stage]"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = timings.get(stage, 0) + (time.perf_counter() - start) * 1000
 
 class ReceiptProcessor:
-    def __init__(self):
-        # Common patterns for extracting information from receipts
-        self.amount_patterns = [
-            r'\$?(\d+\.?\d{0,2})',  # Dollar amounts
-            r'total[:\s]*\$?(\d+\.?\d{0,2})',  # Total amounts
-            r'amount[:\s]*\$?(\d+\.?\d{0,2})',  # Amount
-        ]
-        
-        self.date_patterns = [
-            r'(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})',  # MM/DD/YYYY or MM-DD-YYYY
-            r'(\d{4}[/-]\d{1,2}[/-]\d{1,2})',    # YYYY/MM/DD or YYYY-MM-DD
-        ]
-        
-        # Common merchant/store patterns
-        self.merchant_patterns = [
-            r'^([A-Z\s&]+)(?:\n|\r)',  # Store name usually at top
-            r'([A-Z][A-Za-z\s&]+)\s*(?:STORE|SHOP|MARKET|RESTAURANT)',
-        ]
+    def __init__(self, config=None):
+        self.config = effective_config(config)
 
-    def preprocess_image(self, image_path):
-        """Preprocess the image for better OCR results"""
+    def decode_image(self, image_data):
+        """Decode encoded image bytes (JPEG, PNG, ...) straight into a grayscale array"""
+        buffer = np.frombuffer(memoryview(image_data), dtype=np.uint8)
+        image = cv2.imdecode(buffer, cv2.IMREAD_GRAYSCALE)
+        if image is None:
+            raise ValueError("Could not decode image")
+        return image
+
+    def load_image(self, image_path):
+        """Read an image file and decode it once"""
+        with open(image_path, 'rb') as f:
+            return self.decode_image(f.read())
+
+    def preprocess_array(self, image, timings=None):
+        """Preprocess a decoded image array for better OCR results.
+        
+        Runs the stages enabled in self.config; if `timings` is a dict, the
+        milliseconds spent in each stage are recorded in it.
+        """
+        if timings is None:
+            timings = {}
         try:
-            # Read image
-            image = cv2.imread(image_path)
-            if image is None:
-                raise ValueError("Could not read image")
-            
-            # Convert to grayscale
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+            # Convert to grayscale if the caller passed a color image
+            with stage_timer(timings, 'grayscale'):
+                gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
             
-            # Apply noise reduction
-            denoised = cv2.fastNlMeansDenoising(gray)
+            if self.config['mode'] == 'legacy':
+                # Original pipeline: non-local means on the full-resolution photo
+                with stage_timer(timings, 'denoise'):
+                    denoised = cv2.fastNlMeansDenoising(gray)
+            else:
+                if self.config['crop']:
+                    with stage_timer(timings, 'crop'):
+                        gray = self.crop_receipt(gray)
+                if self.config['target_text_height']:
+                    with stage_timer(timings, 'normalize'):
+                        gray = self.normalize_resolution(gray)
+                with stage_timer(timings, 'denoise'):
+                    denoised = self.denoise(gray)
             
             # Apply threshold to get binary image
-            _, thresh = cv2.threshold(denoised, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+            with stage_timer(timings, 'threshold'):
+                _, thresh = cv2.threshold(denoised, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
             
-            # Morphological operations to clean up the image
-            kernel = np.ones((1, 1), np.uint8)
-            cleaned = cv2.morphologyEx(thresh, cv2.MORPH_CLOSE, kernel)
+            # Morphological closing to fill small gaps in strokes (a kernel below 2x2 is a no-op)
+            kernel_size = self.config['morph_kernel']
+            if kernel_size >= 2:
+                with stage_timer(timings, 'morphology'):
+                    kernel = np.ones((kernel_size, kernel_size), np.uint8)
+                    thresh = cv2.morphologyEx(thresh, cv2.MORPH_CLOSE, kernel)
             
-            return cleaned
+            return thresh
             
         except Exception as e:
             print(f"Error preprocessing image: {str(e)}")
             return None
 
-    def extract_text_from_image(self, image_path):
-        """Extract text from receipt image using OCR"""
+    def crop_receipt(self, gray):
+        """Find the receipt (the largest bright quadrilateral), deskew it and crop to it"""
+        height, width = gray.shape
+        detect_scale = min(1.0, DETECTION_SIDE / max(height, width))
+        small = cv2.resize(gray, None, fx=detect_scale, fy=detect_scale, interpolation=cv2.INTER_AREA) if detect_scale < 1 else gray
+        
+        blurred = cv2.GaussianBlur(small, (5, 5), 0)
+        _, mask = cv2.threshold(blurred, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        # Close the text inside the paper so the receipt becomes one solid blob
+        mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, np.ones((9, 9), np.uint8))
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        if not contours:
+            return gray
+        
+        contour = max(contours, key=cv2.contourArea)
+        area_ratio = cv2.contourArea(contour) / float(small.shape[0] * small.shape[1])
+        if area_ratio < self.config['min_receipt_area'] or area_ratio > 0.98:
+            return gray  # no clear receipt region, or the receipt already fills the frame
+        
+        corners = cv2.boxPoints(cv2.minAreaRect(contour)) / detect_scale
+        if not self.config['deskew']:
+            x, y, w, h = cv2.boundingRect(corners.astype(np.int32))
+            return gray[max(y, 0):y + h, max(x, 0):x + w]
+        
+        # Order corners as top-left, top-right, bottom-right, bottom-left, then warp the
+        # rotated rectangle straight out of the full-resolution image in a single pass
+        sums = corners.sum(axis=1)
+        diffs = corners[:, 1] - corners[:, 0]
+        top_left, bottom_right = corners[np.argmin(sums)], corners[np.argmax(sums)]
+        top_right, bottom_left = corners[np.argmin(diffs)], corners[np.argmax(diffs)]
+        out_w = int(round(np.linalg.norm(top_right - top_left)))
+        out_h = int(round(np.linalg.norm(bottom_left - top_left)))
+        if out_w < 2 or out_h < 2:
+            return gray
+        source = np.array([top_left, top_right, bottom_right, bottom_left], dtype=np.float32)
+        target = np.array([[0, 0], [out_w - 1, 0], [out_w - 1, out_h - 1], [0, out_h - 1]], dtype=np.float32)
+        matrix = cv2.getPerspectiveTransform(source, target)
+        return cv2.warpPerspective(gray, matrix, (out_w, out_h), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+
+    def estimate_text_height(self, gray):
+        """Estimate the typical glyph height in pixels from connected components of dark ink"""
+        height, width = gray.shape
+        scale = min(1.0, DETECTION_SIDE * 2 / max(height, width))
+        small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1 else gray
+        _, ink = cv2.threshold(small, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+        count, _, stats, _ = cv2.connectedComponentsWithStats(ink, connectivity=8)
+        heights = stats[1:, cv2.CC_STAT_HEIGHT]
+        widths = stats[1:, cv2.CC_STAT_WIDTH]
+        # Keep glyph-like blobs: not specks, not rules or whole-line smears
+        glyphs = heights[(heights >= 3) & (heights <= small.shape[0] / 4) & (widths <= heights * 3)]
+        if len(glyphs) < 5:
+            return None
+        return float(np.median(glyphs)) / scale
+
+    def normalize_resolution(self, gray):
+        """Resize so text is about target_text_height pixels tall"""
+        text_height = self.estimate_text_height(gray)
+        if text_height:
+            factor = self.config['target_text_height'] / text_height
+        else:
+            factor = 1.0
+        # Never blow a photo up past max_side on its longest edge
+        factor = min(factor, self.config['max_scale'], self.config['max_side'] / max(gray.shape))
+        if abs(factor - 1.0) < 0.1:
+            return gray
+        interpolation = cv2.INTER_AREA if factor < 1 else cv2.INTER_CUBIC
+        return cv2.resize(gray, None, fx=factor, fy=factor, interpolation=interpolation)
+
+    def estimate_noise(self, gray):
+        """Fast noise sigma estimate (Immerkaer's Laplacian-difference method)"""
+        kernel = np.array([[1, -2, 1], [-2, 4, -2], [1, -2, 1]], dtype=np.float32)
+        response = cv2.filter2D(gray.astype(np.float32), -1, kernel)
+        height, width = gray.shape
+        return float(np.abs(response[1:-1, 1:-1]).sum() * np.sqrt(np.pi / 2) / (6.0 * (width - 2) * (height - 2)))
+
+    def denoise(self, gray):
+        """Denoise with the configured filter, or pick one from the estimated noise level"""
+        method = self.config['denoise']
+        if method == 'auto':
+            sigma = self.estimate_noise(gray)
+            threshold = self.config['clean_noise_threshold']
+            if sigma < threshold:
+                method = 'none'
+            elif sigma < threshold * 2:
+                method = 'median'
+            else:
+                method = 'nlmeans'
+        
+        if method == 'none':
+            return gray
+        if method == 'median':
+            return cv2.medianBlur(gray, 3)
+        if method == 'nlmeans':
+            return cv2.fastNlMeansDenoising(gray)
+        raise ValueError(f"Unknown denoise method: {method}")
+
+    def preprocess_image(self, image_path):
+        """Preprocess the image for better OCR results"""
         try:
-            # Preprocess the image
-            processed_image = self.preprocess_image(image_path)
+            image = self.load_image(image_path)
+        except (OSError, ValueError) as e:
+            print(f"Error preprocessing image: {str(e)}")
+            return None
+        return self.preprocess_array(image)
+
+    def run_tesseract(self, image):
+        """OCR a grayscale array by piping it to tesseract as PGM, without temp files or PIL"""
+        ok, encoded = cv2.imencode('.pgm', image)
+        if not ok:
+            raise ValueError("Could not encode image for tesseract")
+        
+        # OCR Engine Mode 3, Page Segmentation Mode 6
+        command = [pytesseract.pytesseract.tesseract_cmd, 'stdin', 'stdout', '--oem', '3', '--psm', '6']
+        completed = subprocess.run(command, input=encoded.tobytes(), capture_output=True)
+        if completed.returncode != 0:
+            raise RuntimeError(completed.stderr.decode('utf-8', 'replace').strip() or 'tesseract failed')
+        return completed.stdout.decode('utf-8', 'replace')
+
+    def extract_text_from_array(self, image, timings=None):
+        """Extract text from a decoded receipt image using OCR"""
+        if timings is None:
+            timings = {}
+        try:
+            # Preprocess the image, falling back to the decoded original
+            processed_image = self.preprocess_array(image, timings)
             if processed_image is None:
-                # Fallback to original image
-                processed_image = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+                processed_image = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
             
-            # Convert to PIL Image for pytesseract
-            pil_image = Image.fromarray(processed_image)
-            
-            # Extract text using pytesseract
-            custom_config = r'--oem 3 --psm 6'  # OCR Engine Mode 3, Page Segmentation Mode 6
-            text = pytesseract.image_to_string(pil_image, config=custom_config)
+            with stage_timer(timings, 'ocr'):
+                text = self.run_tesseract(processed_image)
             
             return text.strip()
             
@@ -74,77 +218,46 @@ class ReceiptProcessor:
             print(f"Error extracting text from image: {str(e)}")
             return ""
 
+    def extract_text_from_image(self, image_path):
+        """Extract text from receipt image using OCR"""
+        try:
+            image = self.load_image(image_path)
+        except (OSError, ValueError) as e:
+            print(f"Error extracting text from image: {str(e)}")
+            return ""
+        return self.extract_text_from_array(image)
+
     def extract_amount(self, text):
-        """Extract monetary amounts from text"""
-        amounts = []
-        
-        for pattern in self.amount_patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            for match in matches:
-                try:
-                    amount = float(match.replace('$', '').replace(',', ''))
-                    if 0.01 <= amount <= 10000:  # Reasonable range for expenses
-                        amounts.append(amount)
-                except ValueError:
-                    continue
-        
-        # Return the largest amount found (likely the total)
-        return max(amounts) if amounts else None
+        """Extract the receipt total from text"""
+        return pick_amount(scan_receipt_text(text))
 
     def extract_date(self, text):
         """Extract date from text"""
-        for pattern in self.date_patterns:
-            matches = re.findall(pattern, text)
-            if matches:
-                return matches[0]  # Return first date found
-        return None
+        return pick_date(scan_receipt_text(text))
 
     def extract_merchant(self, text):
         """Extract merchant/store name from text"""
-        lines = text.split('\n')
-        
-        # Try to find merchant name in first few lines
-        for i, line in enumerate(lines[:5]):
-            line = line.strip()
-            if len(line) > 3 and line.isupper():
-                # Clean up the merchant name
-                merchant = re.sub(r'[^\w\s&]', '', line).strip()
-                if len(merchant) > 2:
-                    return merchant
-        
-        return None
+        return scan_receipt_text(text).merchant
 
     def categorize_expense(self, merchant_name, text):
         """Attempt to categorize the expense based on merchant and text content"""
-        if not merchant_name:
-            merchant_name = ""
-        
-        text_lower = text.lower()
-        merchant_lower = merchant_name.lower()
-        
-        # Define category keywords
-        categories = {
-            'Food & Dining': ['restaurant', 'cafe', 'coffee', 'pizza', 'burger', 'food', 'dining', 'kitchen', 'grill', 'bar'],
-            'Transportation': ['gas', 'fuel', 'station', 'uber', 'lyft', 'taxi', 'metro', 'bus', 'parking'],
-            'Shopping': ['store', 'shop', 'retail', 'mall', 'market', 'walmart', 'target', 'amazon'],
-            'Healthcare': ['pharmacy', 'hospital', 'clinic', 'medical', 'doctor', 'cvs', 'walgreens'],
-            'Entertainment': ['movie', 'theater', 'cinema', 'game', 'entertainment', 'netflix', 'spotify'],
-            'Bills & Utilities': ['electric', 'water', 'internet', 'phone', 'utility', 'bill'],
+        return categorize_text(text, merchant_name)
+
+    def extract_fields(self, text):
+        """Extract amount, date, merchant and category with a single scan of the text"""
+        fields = scan_receipt_text(text)
+        return {
+            'amount': pick_amount(fields),
+            'date': pick_date(fields),
+            'merchant': fields.merchant,
+            'suggested_category': categorize_text(text, fields.merchant),
         }
-        
-        # Check merchant name and text for category keywords
-        for category, keywords in categories.items():
-            for keyword in keywords:
-                if keyword in merchant_lower or keyword in text_lower:
-                    return category
-        
-        return 'Other'
 
-    def process_receipt(self, image_path):
-        """Main method to process a receipt image and extract information"""
+    def process_receipt_array(self, image, timings=None):
+        """Process a decoded receipt image array and extract information"""
         try:
             # Extract text from image
-            text = self.extract_text_from_image(image_path)
+            text = self.extract_text_from_array(image, timings)
             
             if not text:
                 return {
@@ -153,19 +266,13 @@ class ReceiptProcessor:
                 }
             
             # Extract information
-            amount = self.extract_amount(text)
-            date = self.extract_date(text)
-            merchant = self.extract_merchant(text)
-            category = self.categorize_expense(merchant, text)
+            fields = self.extract_fields(text)
             
             return {
                 'success': True,
                 'extracted_text': text,
-                'amount': amount,
-                'date': date,
-                'merchant': merchant,
-                'suggested_category': category,
-                'confidence': 'medium' if amount and (date or merchant) else 'low'
+                **fields,
+                'confidence': 'medium' if fields['amount'] and (fields['date'] or fields['merchant']) else 'low'
             }
             
         except Exception as e:
@@ -174,6 +281,38 @@ class ReceiptProcessor:
                 'error': f'Error processing receipt: {str(e)}'
             }
 
+    def process_receipt_bytes(self, image_data):
+        """Process encoded receipt image bytes entirely in memory"""
+        try:
+            image = self.decode_image(image_data)
+        except Exception as e:
+            return {
+                'success': False,
+                'error': f'Error processing receipt: {str(e)}'
+            }
+        return self.process_receipt_array(image)
+
+    def process_receipt(self, image_path):
+        """Main method to process a receipt image and extract information"""
+        try:
+            with open(image_path, 'rb') as f:
+                image_data = f.read()
+        except OSError as e:
+            return {
+                'success': False,
+                'error': f'Error processing receipt: {str(e)}'
+            }
+        return self.process_receipt_bytes(image_data)
+
+_worker_processors = {}
+
+def process_receipt_data(image_data, config=None):
+    """Process-pool entry point: run the receipt pipeline on raw image bytes"""
+    key = tuple(sorted((config or {}).items()))
+    if key not in _worker_processors:
+        _worker_processors[key] = ReceiptProcessor(config)
+    return _worker_processors[key].process_receipt_bytes(image_data)
+
 # Test function
 def test_ocr():
     processor = ReceiptProcessor()
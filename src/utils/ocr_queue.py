@@ -0,0 +1,268 @@
+"""Background OCR job queue.
+
+Submitted receipts are stored as `OcrJob` rows and picked up by a dispatcher
+thread in each web worker, which claims them with an atomic UPDATE and hands
+the image to a process pool. Because the job table is the queue, jobs that
+were still queued when the server stopped are picked up again on the next
+boot, and several gunicorn workers can share one queue without running a job
+twice. Jobs left in `processing` by a crashed worker are re-queued once they
+are older than OCR_STALE_AFTER seconds. If a pool worker dies (e.g. tesseract
+crashes), the broken pool is replaced and its jobs are re-queued, up to
+OCR_MAX_ATTEMPTS runs per job.
+"""
+import json
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from functools import partial
+from sqlalchemy import delete, update
+from src.models.ocr_job import JOB_DONE, JOB_FAILED, JOB_PROCESSING, JOB_QUEUED, PENDING_STATUSES, OcrJob
+from src.models.user import db
+from src.utils.ocr_cache import ocr_cache
+
+POLL_INTERVAL = 0.5
+# An idle dispatcher backs off to this; jobs submitted in its own process still wake it at once
+IDLE_POLL_INTERVAL = 5
+MAINTENANCE_INTERVAL = 60
+
+
+class QueueFull(Exception):
+    """Raised when too many OCR jobs are already waiting"""
+
+
+def _run_job(image_data, config):
+    # Imported in the pool process only, so the web process never loads cv2/pytesseract
+    from src.utils.ocr_processor import process_receipt_data
+    return process_receipt_data(image_data, config)
+
+
+class OcrJobQueue:
+    def __init__(self, app=None):
+        self.app = None
+        self._pid = None
+        self._executor = None
+        self._in_flight = 0
+        self._last_maintenance = 0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._finished = threading.Condition()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.max_workers = app.config.get('OCR_MAX_WORKERS') or os.cpu_count() or 1
+        self.max_pending = app.config.get('OCR_MAX_PENDING', 32)
+        self.max_attempts = app.config.get('OCR_MAX_ATTEMPTS', 3)
+        self.stale_after = timedelta(seconds=app.config.get('OCR_STALE_AFTER', 600))
+        self.retention = timedelta(seconds=app.config.get('OCR_JOB_RETENTION', 86400))
+        self.processor_config = app.config.get('OCR_PROCESSOR_CONFIG')
+        app.extensions['ocr_queue'] = self
+        # Start the dispatcher lazily in every (possibly forked) worker process
+        app.before_request(self.ensure_started)
+
+    def ensure_started(self):
+        """Start this process's dispatcher thread if it is not running yet"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._executor = None
+            self._in_flight = 0
+            threading.Thread(target=self._dispatch_loop, name='ocr-dispatcher', daemon=True).start()
+
+    def submit(self, image_data):
+        """Persist a new job and wake the dispatcher, raising QueueFull when the backlog is too long"""
+        self.ensure_started()
+        
+        # A receipt we have already read completes immediately from the cache
+        cached = ocr_cache.get(ocr_cache.key_for(image_data))
+        if cached is not None:
+            now = datetime.utcnow()
+            job = OcrJob(id=uuid.uuid4().hex, status=JOB_DONE, result=json.dumps(cached),
+                         started_at=now, finished_at=now)
+            db.session.add(job)
+            db.session.commit()
+            return job
+        
+        pending = OcrJob.query.filter(OcrJob.status.in_(PENDING_STATUSES)).count()
+        if pending >= self.max_pending:
+            raise QueueFull(f'{pending} OCR jobs are already pending')
+
+        job = OcrJob(id=uuid.uuid4().hex, status=JOB_QUEUED, image_data=image_data)
+        db.session.add(job)
+        db.session.commit()
+        self._wakeup.set()
+        return job
+
+    def wait(self, job_id, timeout):
+        """Block until the job finishes or the timeout passes, then return its latest state"""
+        deadline = time.monotonic() + timeout
+        while True:
+            db.session.rollback()  # end the read transaction so we see other workers' updates
+            job = db.session.get(OcrJob, job_id, populate_existing=True)
+            if job is None or job.status not in PENDING_STATUSES:
+                return job
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return job
+            with self._finished:
+                self._finished.wait(min(remaining, POLL_INTERVAL))
+
+    def _get_executor(self):
+        if self._executor is None:
+            # spawn keeps the pool independent of this process's threads and DB connections
+            context = multiprocessing.get_context('spawn')
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context)
+        return self._executor
+
+    def _discard_executor(self, executor):
+        """Drop a broken pool so the next claimed job starts a fresh one"""
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False)
+
+    def _dispatch_loop(self):
+        interval = POLL_INTERVAL
+        while True:
+            woken = self._wakeup.wait(timeout=interval)
+            self._wakeup.clear()
+            claimed = 0
+            try:
+                with self.app.app_context():
+                    self._requeue_stale()
+                    claimed = self._claim_jobs()
+            except Exception:
+                self.app.logger.exception('OCR dispatcher error')
+            # Poll the table quickly while there is work about, and back off while idle
+            if woken or claimed or self._in_flight:
+                interval = POLL_INTERVAL
+            else:
+                interval = min(interval * 2, IDLE_POLL_INTERVAL)
+
+    def _requeue_stale(self):
+        if time.monotonic() - self._last_maintenance < MAINTENANCE_INTERVAL:
+            return
+        self._last_maintenance = time.monotonic()
+        now = datetime.utcnow()
+        db.session.execute(
+            update(OcrJob)
+            .where(OcrJob.status == JOB_PROCESSING, OcrJob.started_at < now - self.stale_after)
+            .values(status=JOB_QUEUED, started_at=None)
+        )
+        db.session.execute(
+            delete(OcrJob).where(
+                OcrJob.status.in_((JOB_DONE, JOB_FAILED)),
+                OcrJob.finished_at < now - self.retention
+            )
+        )
+        db.session.commit()
+
+    def _claim_jobs(self):
+        """Hand queued jobs to the pool, returning how many this worker claimed"""
+        # Only claim as many jobs as there are free pool workers; the rest stay
+        # queued in the table where another web worker may pick them up
+        claimed_jobs = 0
+        while self._in_flight < self.max_workers:
+            job_id = db.session.query(OcrJob.id).filter_by(status=JOB_QUEUED).order_by(
+                OcrJob.created_at
+            ).limit(1).scalar()
+            if job_id is None:
+                return claimed_jobs
+
+            claimed = db.session.execute(
+                update(OcrJob)
+                .where(OcrJob.id == job_id, OcrJob.status == JOB_QUEUED)
+                .values(status=JOB_PROCESSING, started_at=datetime.utcnow(), attempts=OcrJob.attempts + 1)
+            ).rowcount
+            db.session.commit()
+            if not claimed:
+                continue  # another worker got there first
+
+            image_data = db.session.query(OcrJob.image_data).filter_by(id=job_id).scalar()
+            with self._lock:
+                self._in_flight += 1
+            executor = self._get_executor()
+            try:
+                future = executor.submit(_run_job, image_data, self.processor_config)
+            except (BrokenProcessPool, RuntimeError):
+                # The pool broke after its last job finished; the job never ran, so it keeps its attempt
+                self.app.logger.warning('OCR pool is broken, starting a new one')
+                self._discard_executor(executor)
+                db.session.execute(
+                    update(OcrJob).where(OcrJob.id == job_id).values(
+                        status=JOB_QUEUED, started_at=None, attempts=OcrJob.attempts - 1
+                    )
+                )
+                db.session.commit()
+                with self._lock:
+                    self._in_flight -= 1
+                self._wakeup.set()
+                return claimed_jobs
+            claimed_jobs += 1
+            future.add_done_callback(partial(self._job_finished, job_id, ocr_cache.key_for(image_data), executor))
+        return claimed_jobs
+
+    def _requeue_crashed(self, job_id):
+        """Put a job whose pool worker died back in the queue, or fail it once it has used up its attempts"""
+        db.session.execute(
+            update(OcrJob)
+            .where(OcrJob.id == job_id, OcrJob.status == JOB_PROCESSING, OcrJob.attempts < self.max_attempts)
+            .values(status=JOB_QUEUED, started_at=None)
+        )
+        db.session.execute(
+            update(OcrJob).where(OcrJob.id == job_id, OcrJob.status == JOB_PROCESSING).values(
+                status=JOB_FAILED,
+                error=f'OCR worker crashed {self.max_attempts} times processing this receipt',
+                image_data=None,
+                finished_at=datetime.utcnow()
+            )
+        )
+        db.session.commit()
+
+    def _job_finished(self, job_id, cache_key, executor, future):
+        try:
+            if isinstance(future.exception(), BrokenProcessPool):
+                # A worker died and took the whole pool down with it
+                self.app.logger.warning('OCR pool worker died, re-queueing job %s', job_id)
+                self._discard_executor(executor)
+                with self.app.app_context():
+                    self._requeue_crashed(job_id)
+                return
+
+            try:
+                result = future.result()
+                error = None if result.get('success') else result.get('error', 'Unknown error occurred')
+            except Exception as e:
+                result = None
+                error = f'Error processing receipt: {str(e)}'
+
+            with self.app.app_context():
+                db.session.execute(
+                    update(OcrJob).where(OcrJob.id == job_id).values(
+                        status=JOB_FAILED if error else JOB_DONE,
+                        result=json.dumps(result) if result and not error else None,
+                        error=error,
+                        image_data=None,
+                        finished_at=datetime.utcnow()
+                    )
+                )
+                db.session.commit()
+                if not error:
+                    ocr_cache.put(cache_key, result)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+            with self._finished:
+                self._finished.notify_all()
+            self._wakeup.set()
+
+ocr_queue = OcrJobQueue()
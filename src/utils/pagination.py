@@ -0,0 +1,48 @@
+import base64
+import json
+from datetime import date
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def parse_limit(value, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """Parse a page size argument, raising ValueError if it is out of range"""
+    if value is None or value == '':
+        return default
+    limit = int(value)
+    if limit < 1 or limit > maximum:
+        raise ValueError(f'limit must be between 1 and {maximum}')
+    return limit
+
+
+def encode_cursor(expense_date, expense_id):
+    """Build an opaque cursor token pointing just past (date, id)"""
+    payload = json.dumps([expense_date.isoformat(), expense_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Decode a cursor token back into (date, id), raising ValueError if malformed"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        date_str, expense_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return date.fromisoformat(date_str), int(expense_id)
+    except (TypeError, ValueError, UnicodeDecodeError) as e:
+        raise ValueError('Invalid cursor') from e
+
+
+def encode_search_cursor(score, expense_date, expense_id):
+    """Cursor token for relevance-ordered search results, pointing just past (score, date, id)"""
+    payload = json.dumps([score, expense_date.isoformat(), expense_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_search_cursor(token):
+    """Decode a search cursor back into (score, date, id), raising ValueError if malformed"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        score, date_str, expense_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return float(score), date.fromisoformat(date_str), int(expense_id)
+    except (TypeError, ValueError, UnicodeDecodeError) as e:
+        raise ValueError('Invalid cursor') from e
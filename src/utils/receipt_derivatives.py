@@ -0,0 +1,111 @@
+"""Resized and re-encoded copies of stored receipts.
+
+Derivatives are made on first request and cached on disk next to the blob
+store as `<root>/derived/ab/cd/<sha256>.<size>.<ext>`. Blobs never change,
+so a derivative never goes stale; the blob store removes it together with
+its blob.
+
+Large JPEGs are decoded at 1/2, 1/4 or 1/8 scale when that is still big
+enough for the requested size, which skips most of the decode work for
+thumbnails. cv2 is imported on first use so it only loads in workers that
+actually resize something.
+"""
+import os
+import tempfile
+import threading
+from src.utils.blob_store import blob_store
+
+# Longest side in pixels; None keeps the original dimensions
+DERIVATIVE_SIZES = {
+    'thumb': 256,
+    'medium': 1024,
+    'original': None,
+}
+DERIVATIVE_FORMATS = {
+    'jpeg': ('jpg', 'image/jpeg'),
+    'webp': ('webp', 'image/webp'),
+}
+QUALITY = 80
+
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+class DerivativeError(Exception):
+    """Raised when a receipt cannot be decoded as an image"""
+
+
+def derivative_path(blob_hash, size, image_format):
+    """Where a derivative of a blob is cached on disk"""
+    extension, _ = DERIVATIVE_FORMATS[image_format]
+    return blob_store.derived_path_for(blob_hash, f'{size}.{extension}')
+
+
+def _decode(source_path, max_side):
+    import cv2
+    import numpy as np
+
+    data = np.fromfile(source_path, dtype=np.uint8)
+    reductions = (
+        (8, cv2.IMREAD_REDUCED_COLOR_8),
+        (4, cv2.IMREAD_REDUCED_COLOR_4),
+        (2, cv2.IMREAD_REDUCED_COLOR_2),
+        (1, cv2.IMREAD_COLOR),
+    )
+    for factor, flag in reductions:
+        if max_side is None and factor > 1:
+            continue
+        image = cv2.imdecode(data, flag)
+        if image is None:
+            raise DerivativeError('Receipt is not a decodable image')
+        # Good enough once the reduced decode is still at least the target size
+        if factor == 1 or max(image.shape[:2]) >= max_side:
+            return image
+
+
+def _render(source_path, target_path, size, image_format):
+    import cv2
+
+    max_side = DERIVATIVE_SIZES[size]
+    image = _decode(source_path, max_side)
+    if max_side is not None and max(image.shape[:2]) > max_side:
+        scale = max_side / max(image.shape[:2])
+        image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+    extension, _ = DERIVATIVE_FORMATS[image_format]
+    params = [cv2.IMWRITE_WEBP_QUALITY if image_format == 'webp' else cv2.IMWRITE_JPEG_QUALITY, QUALITY]
+    ok, encoded = cv2.imencode(f'.{extension}', image, params)
+    if not ok:
+        raise DerivativeError(f'Could not encode receipt as {image_format}')
+
+    # Write then rename, so readers never see a half-written file
+    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(target_path))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(encoded.tobytes())
+        os.replace(temp_path, target_path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def get_derivative(blob_hash, size, image_format):
+    """Return the path of a derivative, rendering and caching it on first use"""
+    target_path = derivative_path(blob_hash, size, image_format)
+    if os.path.exists(target_path):
+        return target_path
+
+    # One render per derivative at a time in this process; concurrent
+    # requests for the same thumbnail wait for it instead of repeating it
+    key = (blob_hash, size, image_format)
+    with _locks_guard:
+        lock = _locks.setdefault(key, threading.Lock())
+    try:
+        with lock:
+            if not os.path.exists(target_path):
+                _render(blob_store.path_for(blob_hash), target_path, size, image_format)
+    finally:
+        with _locks_guard:
+            _locks.pop(key, None)
+    return target_path
@@ -0,0 +1,153 @@
+"""Field extraction and categorization for receipt text.
+
+All patterns are compiled once at import. `scan_receipt_text` finds every
+number in one regex pass and sorts the runs into dates and amounts, then
+re-reads only the TOTAL lines and the first few lines for the merchant.
+`categorize_text` searches for each category's keywords with one trie-shaped
+regex per category, in priority order.
+The module has no OCR dependencies, so it can also be used to re-categorize
+existing expense descriptions in bulk.
+"""
+import re
+from collections import namedtuple
+
+CATEGORY_KEYWORDS = {
+    'Food & Dining': ['restaurant', 'cafe', 'coffee', 'pizza', 'burger', 'food', 'dining', 'kitchen', 'grill', 'bar'],
+    'Transportation': ['gas', 'fuel', 'station', 'uber', 'lyft', 'taxi', 'metro', 'bus', 'parking'],
+    'Shopping': ['store', 'shop', 'retail', 'mall', 'market', 'walmart', 'target', 'amazon'],
+    'Healthcare': ['pharmacy', 'hospital', 'clinic', 'medical', 'doctor', 'cvs', 'walgreens'],
+    'Entertainment': ['movie', 'theater', 'cinema', 'game', 'entertainment', 'netflix', 'spotify'],
+    'Bills & Utilities': ['electric', 'water', 'internet', 'phone', 'utility', 'bill'],
+}
+DEFAULT_CATEGORY = 'Other'
+
+
+def _trie_pattern(words):
+    """Regex for a set of words laid out as a trie, e.g. b(?:ar|ill|u(?:rger|s))"""
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        return f'(?:{body})?' if '' in node else body
+
+    return build(trie)
+
+
+# Sharing prefixes keeps backtracking to a minimum, so one search per category is
+# faster than an alternation of its words (or a substring scan per keyword). Each
+# search starts afresh, so keywords overlapping another ("shopizza") are still
+# found and earlier categories win, exactly as with the substring scans
+_CATEGORY_RES = [
+    (category, re.compile(_trie_pattern(keywords))) for category, keywords in CATEGORY_KEYWORDS.items()
+]
+
+# One cheap pass finds every run of digits (with $ , . / -); each run is then
+# classified below. A single alternation of the date and money patterns is
+# several times slower in CPython's backtracking engine.
+_NUMBER_RUN_RE = re.compile(r'[\d$][\d,./-]*')
+_US_DATE_RE = re.compile(r'\d{1,2}[/-]\d{1,2}[/-]\d{2,4}')   # MM/DD/YYYY or MM-DD-YYYY
+_ISO_DATE_RE = re.compile(r'\d{4}[/-]\d{1,2}[/-]\d{1,2}')    # YYYY/MM/DD or YYYY-MM-DD
+_THOUSANDS_RE = re.compile(r'\d{1,3}(?:,\d{3})+')
+TOTAL_KEYWORDS = ('total', 'amount due', 'balance due')
+_MERCHANT_CLEAN_RE = re.compile(r'[^\w\s&]')
+
+MIN_AMOUNT = 0.01
+MAX_AMOUNT = 10000  # Reasonable range for expenses
+MERCHANT_LINES = 5
+
+ReceiptFields = namedtuple('ReceiptFields', ['amounts', 'total_amounts', 'dates', 'merchant'])
+
+
+def _scan_numbers(text, pos=0, endpos=None):
+    """Return (amounts, MM/DD/YYYY dates, YYYY-MM-DD dates) found in text[pos:endpos]"""
+    amounts = []
+    us_dates = []
+    iso_dates = []
+    for run in _NUMBER_RUN_RE.findall(text, pos, len(text) if endpos is None else endpos):
+        run = run.rstrip(',./-')
+        if '/' in run or '-' in run:
+            if _US_DATE_RE.fullmatch(run):
+                us_dates.append(run)
+            elif _ISO_DATE_RE.fullmatch(run):
+                iso_dates.append(run)
+            continue
+        # Money needs either a $ prefix or exactly two decimals, so years, zip
+        # codes, street numbers and times are not mistaken for amounts
+        dollar = run[0] == '$'
+        whole, _, cents = run.lstrip('$ ').partition('.')
+        if not (dollar or len(cents) == 2) or len(cents) > 2 or not cents.isdigit() and cents:
+            continue
+        if not whole.isdigit():
+            if not _THOUSANDS_RE.fullmatch(whole):
+                continue
+            whole = whole.replace(',', '')
+        amount = float(whole + '.' + cents) if cents else float(whole)
+        if MIN_AMOUNT <= amount <= MAX_AMOUNT:
+            amounts.append(amount)
+    return amounts, us_dates, iso_dates
+
+
+def _total_amounts(text):
+    """Amounts following a TOTAL / AMOUNT DUE label on the same line (SUBTOTAL excluded)"""
+    lowered = text.lower()
+    amounts = []
+    for keyword in TOTAL_KEYWORDS:
+        start = lowered.find(keyword)
+        while start != -1:
+            if not lowered.endswith(('sub', 'sub '), 0, start):
+                end = start + len(keyword)
+                line_end = lowered.find('\n', end)
+                amounts.extend(_scan_numbers(text, end, line_end if line_end != -1 else None)[0])
+            start = lowered.find(keyword, start + 1)
+    return amounts
+
+
+def scan_receipt_text(text):
+    """Collect amounts, TOTAL-line amounts, dates and the merchant from the text"""
+    amounts, us_dates, iso_dates = _scan_numbers(text)
+    total_amounts = _total_amounts(text)
+
+    merchant = None
+    for line in text.split('\n', MERCHANT_LINES)[:MERCHANT_LINES]:
+        line = line.strip()
+        if len(line) > 3 and line.isupper():
+            candidate = _MERCHANT_CLEAN_RE.sub('', line).strip()
+            if len(candidate) > 2:
+                merchant = candidate
+                break
+
+    return ReceiptFields(amounts, total_amounts, us_dates + iso_dates, merchant)
+
+
+def pick_amount(fields):
+    """The receipt total: the largest TOTAL-line amount, else the largest amount seen"""
+    if fields.total_amounts:
+        return max(fields.total_amounts)
+    return max(fields.amounts) if fields.amounts else None
+
+
+def pick_date(fields):
+    """First date found, preferring MM/DD/YYYY style over YYYY-MM-DD"""
+    return fields.dates[0] if fields.dates else None
+
+
+def categorize_text(text, merchant=None):
+    """Category whose keywords appear in the merchant or text; earlier categories win"""
+    text = f"{merchant or ''}\n{text or ''}".lower()
+    for category, keywords_re in _CATEGORY_RES:
+        if keywords_re.search(text):
+            return category
+    return DEFAULT_CATEGORY
+
+
+def categorize_many(descriptions):
+    """Categorize an iterable of descriptions, e.g. to re-categorize existing expenses"""
+    return [categorize_text(description) for description in descriptions]
@@ -0,0 +1,157 @@
+"""Per-user cache of analytics responses.
+
+Keys combine the user's data version (see src/models/data_version.py) with
+the request path and query string. A write bumps the version, so old entries
+are never served again and simply age out of the LRU; nothing has to be
+invalidated explicitly, and every worker agrees on what is current because
+the version lives in the database.
+
+Bodies are kept in an in-process LRU bounded by ANALYTICS_CACHE_MAX_BYTES.
+Setting ANALYTICS_CACHE_URL to a Redis URL adds a shared tier (needs
+`pip install redis`), so a response computed by one worker is reused by the
+others and survives restarts. The key doubles as a strong ETag, so clients
+that send If-None-Match get a 304 without the body being looked up at all.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import wraps
+from flask import current_app, request
+from src.models.data_version import get_data_version
+from src.models.user import db
+
+# Bump when the shape of a cached response changes, so old ETags and shared entries stop matching
+RESPONSE_FORMAT_VERSION = 2
+
+
+class ResponseCache:
+    def __init__(self, app=None):
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self.shared = None
+        self.counters = {'memory_hits': 0, 'shared_hits': 0, 'misses': 0, 'not_modified': 0,
+                         'stores': 0, 'evictions': 0, 'shared_errors': 0}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('ANALYTICS_CACHE_ENABLED', True)
+        self.max_bytes = app.config.get('ANALYTICS_CACHE_MAX_BYTES', 8 * 1024 * 1024)
+        self.shared_ttl = app.config.get('ANALYTICS_CACHE_TTL', 24 * 60 * 60)
+        url = app.config.get('ANALYTICS_CACHE_URL')
+        if url:
+            import redis
+            self.shared = redis.Redis.from_url(url, socket_timeout=0.5)
+        app.extensions['response_cache'] = self
+
+    def key_for(self, user_id, version, path, query_string):
+        """Cache key and ETag for one response at one data version"""
+        raw = f'{RESPONSE_FORMAT_VERSION}:{user_id}:{version}:{path}?{query_string}'
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def _count(self, counter, amount=1):
+        with self._lock:
+            self.counters[counter] += amount
+
+    def _remember(self, key, body):
+        with self._lock:
+            previous = self._memory.pop(key, None)
+            if previous is not None:
+                self._memory_bytes -= len(previous)
+            self._memory[key] = body
+            self._memory_bytes += len(body)
+            while self._memory_bytes > self.max_bytes and self._memory:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_bytes -= len(evicted)
+                self.counters['evictions'] += 1
+
+    def get(self, key):
+        """Return the cached body for a key, or None"""
+        with self._lock:
+            body = self._memory.get(key)
+            if body is not None:
+                self._memory.move_to_end(key)
+                self.counters['memory_hits'] += 1
+                return body
+
+        if self.shared is not None:
+            try:
+                body = self.shared.get(f'analytics:{key}')
+            except Exception:
+                self._count('shared_errors')
+            if body is not None:
+                self._count('shared_hits')
+                self._remember(key, body)
+                return body
+
+        self._count('misses')
+        return None
+
+    def put(self, key, body):
+        """Store a body in the in-process LRU and, if configured, the shared tier"""
+        self._remember(key, body)
+        if self.shared is not None:
+            try:
+                self.shared.set(f'analytics:{key}', body, ex=self.shared_ttl)
+            except Exception:
+                self._count('shared_errors')
+        self._count('stores')
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+
+    def stats(self):
+        """Hit/miss counters for this process plus the memory held by cached bodies"""
+        with self._lock:
+            counters = dict(self.counters)
+            entries = len(self._memory)
+            memory_bytes = self._memory_bytes
+        hits = counters['memory_hits'] + counters['shared_hits'] + counters['not_modified']
+        lookups = hits + counters['misses']
+        return dict(
+            counters,
+            hit_ratio=hits / lookups if lookups else 0,
+            memory_entries=entries,
+            memory_bytes=memory_bytes,
+            max_bytes=self.max_bytes,
+            shared=self.shared is not None
+        )
+
+
+response_cache = ResponseCache()
+
+
+def cached_per_user(view):
+    """Serve a per-user JSON view from the response cache, with a strong ETag"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not response_cache.enabled:
+            return view(*args, **kwargs)
+
+        # For now, we'll assume user_id=1 (we'll add proper auth later)
+        user_id = request.args.get('user_id', 1, type=int)
+        version = get_data_version(db.session, user_id)
+        key = response_cache.key_for(user_id, version, request.path, request.query_string.decode())
+
+        # Weak comparison, as If-None-Match requires: compression weakens the ETag
+        if request.if_none_match.contains_weak(key):
+            response_cache._count('not_modified')
+            response = current_app.response_class(status=304)
+        else:
+            body = response_cache.get(key)
+            if body is None:
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                body = response.get_data()
+                response_cache.put(key, body)
+            response = current_app.response_class(body, mimetype='application/json')
+
+        response.set_etag(key)
+        # Always revalidate; the ETag makes that a cheap 304 until the next write
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+    return wrapper
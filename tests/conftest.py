@@ -0,0 +1,33 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.main import create_app
+from src.models.migrations import run_migrations
+from src.models.user import User, db
+
+
+@pytest.fixture
+def app(tmp_path):
+    """App on a migrated temporary SQLite database with one user (id 1)"""
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'app.db'}",
+        'RECEIPT_STORE_DIR': str(tmp_path / 'receipts'),
+        'METRICS_DIR': str(tmp_path / 'metrics'),
+    })
+    with app.app_context():
+        run_migrations()
+        db.session.add(User(id=1, username='test', email='test@example.com'))
+        db.session.commit()
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
@@ -0,0 +1,46 @@
+import pytest
+
+from src.models.expense import Expense
+from src.models.rollup import verify_rollups
+from src.models.user import db
+
+
+@pytest.fixture
+def expense_ids(client):
+    ids = []
+    for day, category in (('2024-01-05', 'Food'), ('2024-01-20', 'Travel'), ('2024-02-03', 'Food')):
+        response = client.post('/api/expenses', json={
+            'amount': 12.5, 'category': category, 'payment_method': 'Cash', 'date': day
+        })
+        assert response.status_code == 201
+        ids.append(response.get_json()['id'])
+    return ids
+
+
+@pytest.mark.parametrize('month', [202401, None, ['2024-01'], '2024', '2024-13'])
+def test_batch_filter_rejects_invalid_month(client, expense_ids, month):
+    for endpoint, extra in (('/api/expenses/batch-update', {'set': {'category': 'Other'}}),
+                            ('/api/expenses/batch-delete', {})):
+        response = client.post(endpoint, json=dict(extra, filter={'month': month}))
+        assert response.status_code == 400
+        assert response.get_json() == {'error': 'Invalid month format. Use YYYY-MM'}
+
+
+def test_batch_update_by_month_keeps_rollups_in_step(app, client, expense_ids):
+    response = client.post('/api/expenses/batch-update', json={
+        'filter': {'month': '2024-01'}, 'set': {'category': 'Groceries'}
+    })
+    assert response.get_json() == {'matched': 2, 'updated': 2, 'failed': []}
+    with app.app_context():
+        assert verify_rollups() == []
+        assert db.session.get(Expense, expense_ids[2]).category == 'Food'
+
+
+def test_batch_delete_reports_missing_ids(app, client, expense_ids):
+    response = client.post('/api/expenses/batch-delete', json={'ids': [expense_ids[0], 999]})
+    assert response.get_json() == {
+        'matched': 1, 'deleted': 1, 'receipts_released': 0,
+        'failed': [{'id': 999, 'error': 'Expense not found'}]
+    }
+    with app.app_context():
+        assert verify_rollups() == []
@@ -0,0 +1,99 @@
+import csv
+import gzip
+import io
+import json
+
+import pytest
+
+from src.models.expense import EXPENSE_FIELDS
+
+ROWS = [
+    ('2024-01-05', 'Food', 12.5, 'Lunch'),
+    ('2024-01-20', 'Travel', 30, 'Train'),
+    ('2024-02-03', 'Food', 1.005, 'Lunch'),
+    ('2024-01-05', 'Food', 0.1, 'Coffee'),
+]
+
+
+@pytest.fixture
+def expenses(client):
+    return [
+        client.post('/api/expenses', json={
+            'amount': amount, 'category': category, 'payment_method': 'Cash', 'date': day, 'description': description
+        }).get_json()['id']
+        for day, category, amount, description in ROWS
+    ]
+
+
+def export(client, **args):
+    response = client.get('/api/expenses/export', query_string=args)
+    assert response.status_code == 200
+    return response
+
+
+def csv_rows(body):
+    return list(csv.DictReader(io.StringIO(body.decode())))
+
+
+def test_csv_header_order_and_cents(client, expenses):
+    response = export(client)
+    assert response.mimetype == 'text/csv'
+    assert response.headers['Content-Disposition'] == 'attachment; filename="expenses.csv"'
+    body = response.get_data()
+    assert body.decode().splitlines()[0] == ','.join(EXPENSE_FIELDS)
+
+    rows = csv_rows(body)
+    # Oldest first, by date then id
+    assert [int(row['id']) for row in rows] == [expenses[0], expenses[3], expenses[1], expenses[2]]
+    assert [(row['amount'], row['amount_decimal'], row['amount_cents']) for row in rows] == [
+        ('12.5', '12.50', '1250'), ('0.1', '0.10', '10'), ('30.0', '30.00', '3000'), ('1.01', '1.01', '101')
+    ]
+
+
+def test_ndjson(client, expenses):
+    response = export(client, format='ndjson')
+    assert response.headers['Content-Disposition'] == 'attachment; filename="expenses.ndjson"'
+    records = [json.loads(line) for line in response.get_data().decode().splitlines()]
+    assert [record['id'] for record in records] == [expenses[0], expenses[3], expenses[1], expenses[2]]
+    assert list(records[0]) == list(EXPENSE_FIELDS)
+    assert (records[0]['amount'], records[0]['amount_decimal'], records[0]['date']) == (12.5, '12.50', '2024-01-05')
+
+
+def test_gzip_matches_plain(client, expenses):
+    response = export(client, gzip='1')
+    assert response.mimetype == 'application/gzip'
+    assert response.headers['Content-Disposition'] == 'attachment; filename="expenses.csv.gz"'
+    assert gzip.decompress(response.get_data()) == export(client).get_data()
+
+
+def test_large_export_is_streamed_in_chunks(client):
+    body = ''.join(
+        json.dumps({'amount': n % 50 + 1, 'category': 'Food', 'payment_method': 'Cash', 'date': '2024-03-01'}) + '\n'
+        for n in range(2500)
+    )
+    client.post('/api/expenses/import', data=body, content_type='application/x-ndjson')
+
+    response = client.get('/api/expenses/export', buffered=False)
+    assert response.is_streamed
+    chunks = list(response.response)
+    response.close()
+    assert len(chunks) >= 3
+    assert len(csv_rows(b''.join(chunks))) == 2500
+
+
+def test_invalid_format(client):
+    assert client.get('/api/expenses/export?format=xml').status_code == 400
+
+
+@pytest.mark.parametrize('filters', [
+    {}, {'month': '2024-01'}, {'category': 'Food'}, {'month': '2024-01', 'category': 'Food'},
+])
+def test_filters_match_list_and_search(client, expenses, filters):
+    exported = csv_rows(export(client, **filters).get_data())
+    listed = client.get('/api/expenses', query_string=dict(filters, fields='id')).get_json()
+    assert sorted(int(row['id']) for row in exported) == sorted(row['id'] for row in listed)
+
+    found = client.get('/api/expenses/search', query_string=dict(filters, q='lunch', fields='id')).get_json()
+    assert sorted(row['id'] for row in found) == sorted(
+        int(row['id']) for row in exported if row['description'] == 'Lunch'
+    )
@@ -0,0 +1,34 @@
+import pytest
+
+ENDPOINTS = ['/api/expenses', '/api/expenses/search?q=lunch', '/api/expenses/export']
+
+
+@pytest.fixture
+def expenses(client):
+    for day, category in (('2024-01-05', 'Food'), ('2024-01-20', 'Travel'), ('2024-02-03', 'Food')):
+        client.post('/api/expenses', json={
+            'amount': 10, 'category': category, 'payment_method': 'Cash', 'date': day, 'description': 'Lunch'
+        })
+
+
+@pytest.mark.parametrize('endpoint', ENDPOINTS)
+def test_invalid_month_is_rejected_alike(client, endpoint):
+    separator = '&' if '?' in endpoint else '?'
+    response = client.get(f'{endpoint}{separator}month=2024-13')
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'Invalid month format. Use YYYY-MM'}
+
+
+@pytest.mark.parametrize('endpoint', ENDPOINTS[:2])
+def test_unknown_fields_are_rejected_alike(client, endpoint):
+    separator = '&' if '?' in endpoint else '?'
+    response = client.get(f'{endpoint}{separator}fields=id,bogus')
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'Unknown fields: bogus'}
+
+
+@pytest.mark.parametrize('endpoint', ENDPOINTS[:2])
+def test_month_and_category_filters_match_alike(client, expenses, endpoint):
+    separator = '&' if '?' in endpoint else '?'
+    response = client.get(f'{endpoint}{separator}month=2024-01&category=Food&fields=date,category')
+    assert response.get_json() == [{'date': '2024-01-05', 'category': 'Food'}]
@@ -0,0 +1,113 @@
+import io
+import json
+
+from src.models.expense import Expense
+from src.models.rollup import verify_rollups
+from src.models.user import db
+from src.routes import expense as expense_routes
+from src.utils.expense_import import MAX_LINE_LENGTH, iter_import_rows
+
+
+def ndjson(*rows):
+    return '\n'.join(row if isinstance(row, str) else json.dumps(row) for row in rows) + '\n'
+
+
+def row(amount=12.5, **fields):
+    return dict({'amount': amount, 'category': 'Food', 'payment_method': 'Cash', 'date': '2024-03-05'}, **fields)
+
+
+def import_body(client, body, content_type='application/x-ndjson', **kwargs):
+    return client.post('/api/expenses/import', data=body, content_type=content_type, **kwargs)
+
+
+def stored(app):
+    with app.app_context():
+        assert verify_rollups() == []
+        return sorted((expense.amount_cents, expense.category) for expense in db.session.query(Expense))
+
+
+def test_import_ndjson(client, app):
+    response = import_body(client, ndjson(row(12.5), row('3.10', category='Travel'), row(1.005)))
+    assert response.get_json() == {'imported': 3, 'failed': 0, 'errors': [], 'errors_truncated': False}
+    assert stored(app) == [(101, 'Food'), (310, 'Travel'), (1250, 'Food')]
+
+
+def test_import_csv(client, app):
+    body = 'amount,category,payment_method,date,description\n12.50,Food,Cash,2024-03-05,Lunch\n7,Travel,Card,2024-03-06,\n'
+    response = import_body(client, body, content_type='text/csv')
+    assert response.get_json()['imported'] == 2
+    assert stored(app) == [(700, 'Travel'), (1250, 'Food')]
+
+
+def test_import_in_several_batches(client, app, monkeypatch):
+    monkeypatch.setattr(expense_routes, 'IMPORT_BATCH_SIZE', 2)
+    response = import_body(client, ndjson(*[row(n) for n in range(1, 6)]))
+    assert response.get_json()['imported'] == 5
+    assert stored(app) == [(n * 100, 'Food') for n in range(1, 6)]
+
+
+def test_malformed_rows_are_reported_per_line(client, app):
+    body = ndjson(
+        '{"amount": ',
+        '[1, 2]',
+        row(category={'name': 'Food'}),
+        row(payment_method=7),
+        row(description=['x']),
+        row(date={'y': 2024}),
+        {'category': 'Food', 'payment_method': 'Cash'},
+        row(amount='abc'),
+        row(4),
+    )
+    response = import_body(client, body)
+    assert response.status_code == 200
+    result = response.get_json()
+    assert (result['imported'], result['failed']) == (1, 8)
+    assert [error['row'] for error in result['errors']] == list(range(1, 9))
+    assert result['errors'][2] == {'row': 3, 'error': 'category must be a string'}
+    assert result['errors'][3] == {'row': 4, 'error': 'payment_method must be a string'}
+    assert stored(app) == [(400, 'Food')]
+
+
+def test_oversized_line_is_skipped(client, app):
+    long_line = json.dumps(row(description='x' * MAX_LINE_LENGTH))
+    result = import_body(client, ndjson(long_line, row(2))).get_json()
+    assert (result['imported'], result['failed']) == (1, 1)
+    assert result['errors'][0]['error'].startswith('Line is longer than')
+    assert stored(app) == [(200, 'Food')]
+
+
+def test_oversized_body_is_refused(client, app):
+    app.config['IMPORT_MAX_BYTES'] = 100
+    response = import_body(client, ndjson(*[row(n) for n in range(1, 6)]))
+    assert response.status_code == 413
+    assert response.get_json()['imported'] == 0
+    assert stored(app) == []
+
+
+def test_oversized_stream_keeps_committed_batches(client, app, monkeypatch):
+    # A chunked body has no Content-Length, so the limit trips part-way through
+    monkeypatch.setattr(expense_routes, 'IMPORT_BATCH_SIZE', 10)
+    body = ndjson(*[row(n, description='x' * 200) for n in range(1, 201)]).encode()
+    app.config['IMPORT_MAX_BYTES'] = len(body) // 2
+    environ = {'wsgi.input_terminated': True, 'HTTP_TRANSFER_ENCODING': 'chunked'}
+    response = client.post('/api/expenses/import', input_stream=io.BytesIO(body),
+                           content_type='application/x-ndjson', environ_overrides=environ)
+    assert response.status_code == 413
+    imported = response.get_json()['imported']
+    assert 0 < imported < 200 and imported % 10 == 0
+    assert len(stored(app)) == imported
+
+
+class BareInput:
+    """Like gunicorn's wsgi.input: read() only"""
+
+    def __init__(self, data):
+        self.data = io.BytesIO(data)
+
+    def read(self, size=-1):
+        return self.data.read(size)
+
+
+def test_reads_a_bare_wsgi_input():
+    rows = list(iter_import_rows(BareInput(ndjson(row(1), row(2)).encode()), 'ndjson'))
+    assert [(number, data['amount'], error) for number, data, error in rows] == [(1, 1, None), (2, 2, None)]
@@ -0,0 +1,103 @@
+import pytest
+
+from src.models.expense_search import RANK, SEARCH_TABLE, match_expression, search_terms
+from src.models.user import User, db
+
+
+def create(client, description, day='2024-01-05', category='Food', user_id=1):
+    response = client.post('/api/expenses', json={
+        'amount': 5, 'category': category, 'payment_method': 'Cash', 'date': day,
+        'description': description, 'user_id': user_id
+    })
+    assert response.status_code == 201
+    return response.get_json()['id']
+
+
+def search(client, q, **args):
+    response = client.get('/api/expenses/search', query_string=dict(args, q=q, fields='id'))
+    assert response.status_code == 200
+    return [row['id'] for row in response.get_json()]
+
+
+def all_pages(client, q, **args):
+    """Follow X-Next-Cursor through every page"""
+    ids, cursor = [], None
+    while True:
+        query = dict(args, q=q, fields='id', **({'cursor': cursor} if cursor else {}))
+        response = client.get('/api/expenses/search', query_string=query)
+        ids += [row['id'] for row in response.get_json()]
+        cursor = response.headers.get('X-Next-Cursor')
+        if not cursor:
+            return ids
+
+
+def test_index_follows_insert_update_and_delete(client):
+    expense_id = create(client, 'Coffee with Sam')
+    assert search(client, 'coffee') == [expense_id]
+    assert search(client, 'cof') == [expense_id]
+
+    client.put(f'/api/expenses/{expense_id}', json={'description': 'Team lunch'})
+    assert search(client, 'coffee') == []
+    assert search(client, 'lunch') == [expense_id]
+
+    client.put(f'/api/expenses/{expense_id}', json={'category': 'Entertainment'})
+    assert search(client, 'entertainment') == [expense_id]
+    assert search(client, 'food') == []
+
+    client.delete(f'/api/expenses/{expense_id}')
+    assert search(client, 'lunch') == []
+
+
+def test_index_follows_bulk_statements(client):
+    first = create(client, 'Bakery order')
+    second = create(client, 'Bakery order', category='Travel')
+    client.post('/api/expenses/import', data='{"amount": 3, "category": "Food", "payment_method": "Cash", '
+                                             '"description": "Bakery run"}\n', content_type='application/x-ndjson')
+    assert len(search(client, 'bakery')) == 3
+
+    client.post('/api/expenses/batch-update', json={'ids': [first], 'set': {'description': 'Florist'}})
+    assert search(client, 'florist') == [first]
+    client.post('/api/expenses/batch-delete', json={'filter': {'category': 'Travel'}})
+    assert second not in search(client, 'bakery')
+    assert len(search(client, 'bakery')) == 1
+
+
+def test_search_is_per_user(app, client):
+    with app.app_context():
+        db.session.add(User(id=2, username='other', email='other@example.com'))
+        db.session.commit()
+    mine = create(client, 'Concert tickets')
+    create(client, 'Concert tickets', user_id=2)
+    assert search(client, 'concert') == [mine]
+
+
+@pytest.fixture
+def ranked(client):
+    descriptions = [
+        'coffee', 'coffee beans and a cake for the office party', 'coffee coffee', 'coffee', 'tea', 'coffee',
+        'cold coffee', 'coffee grinder with a long description of the purchase', 'coffee',
+    ]
+    return [create(client, text, day=f'2024-01-{n % 3 + 1:02d}') for n, text in enumerate(descriptions)]
+
+
+def test_relevance_order_follows_bm25(app, client, ranked):
+    with app.app_context():
+        rows = db.session.execute(db.text(
+            f'SELECT expense.id, {RANK}, expense.date FROM {SEARCH_TABLE} '
+            f'JOIN expense ON expense.id = {SEARCH_TABLE}.rowid WHERE {SEARCH_TABLE} MATCH :match'
+        ), {'match': match_expression(search_terms('coffee'), 1)}).all()
+    expected = [row[0] for row in sorted(rows, key=lambda row: (row[1], -int(row[2].replace('-', '')), -row[0]))]
+    assert len(expected) == 8
+    assert search(client, 'coffee', limit=100) == expected
+
+
+@pytest.mark.parametrize('sort', ['relevance', 'date'])
+def test_cursor_pages_match_one_page(client, ranked, sort):
+    one_page = search(client, 'coffee', sort=sort, limit=100)
+    for limit in (1, 2, 3):
+        assert all_pages(client, 'coffee', sort=sort, limit=limit) == one_page
+
+
+def test_malformed_cursor_is_rejected(client, ranked):
+    response = client.get('/api/expenses/search?q=coffee&cursor=abc')
+    assert response.status_code == 400
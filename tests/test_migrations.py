@@ -0,0 +1,88 @@
+import sqlite3
+
+import pytest
+
+from src.main import create_app
+from src.models.migrations import run_migrations
+from src.models.rollup import MonthlyRollup, verify_rollups
+from src.models.user import db
+
+# Schema of an app.db from before amounts were stored as cents, with a float rollup table
+FLOAT_SCHEMA = """
+CREATE TABLE user (
+    id INTEGER NOT NULL, username VARCHAR(80) NOT NULL, email VARCHAR(120) NOT NULL,
+    PRIMARY KEY (id), UNIQUE (username), UNIQUE (email)
+);
+CREATE TABLE expense (
+    id INTEGER NOT NULL, user_id INTEGER NOT NULL, amount FLOAT NOT NULL,
+    category VARCHAR(100) NOT NULL, description TEXT, date DATE NOT NULL,
+    payment_method VARCHAR(50) NOT NULL, receipt_image_path VARCHAR(255), created_at DATETIME,
+    PRIMARY KEY (id), FOREIGN KEY(user_id) REFERENCES user (id)
+);
+CREATE TABLE rollup_month (
+    user_id INTEGER NOT NULL, year INTEGER NOT NULL, month INTEGER NOT NULL,
+    total_amount FLOAT NOT NULL, transaction_count INTEGER NOT NULL,
+    PRIMARY KEY (user_id, year, month)
+);
+INSERT INTO user VALUES (1, 'test', 'test@example.com');
+"""
+
+# Stored float -> cents, rounded half up as to_cents does
+AMOUNTS = [(25.99, 2599), (1.005, 101), (2.675, 268), (0.125, 13), (1.015, 102), (10.0, 1000), (19.999, 2000)]
+
+
+@pytest.fixture
+def float_app(tmp_path):
+    path = tmp_path / 'app.db'
+    connection = sqlite3.connect(path)
+    connection.executescript(FLOAT_SCHEMA)
+    connection.executemany(
+        "INSERT INTO expense (id, user_id, amount, category, date, payment_method) "
+        "VALUES (?, 1, ?, 'Food', '2024-01-15', 'Cash')",
+        [(i, amount) for i, (amount, _) in enumerate(AMOUNTS, 1)]
+    )
+    connection.execute('INSERT INTO rollup_month VALUES (1, 2024, 1, 61.809, 7)')
+    connection.commit()
+    connection.close()
+
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}',
+        'RECEIPT_STORE_DIR': str(tmp_path / 'receipts'),
+        'METRICS_DIR': str(tmp_path / 'metrics'),
+    })
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+
+def stored_cents():
+    return [row[0] for row in db.session.execute(db.text('SELECT amount_cents FROM expense ORDER BY id'))]
+
+
+def test_float_amounts_become_cents(float_app):
+    with float_app.app_context():
+        added, _ = run_migrations()
+        assert 'expense.amount -> expense.amount_cents' in added
+        assert stored_cents() == [cents for _, cents in AMOUNTS]
+        columns = {column['name'] for column in db.inspect(db.engine).get_columns('expense')}
+        assert 'amount' not in columns
+
+        # The float rollup was dropped and rebuilt from the converted expenses
+        assert verify_rollups() == []
+        assert db.session.get(MonthlyRollup, (1, 2024, 1)).total_cents == sum(cents for _, cents in AMOUNTS)
+
+
+def test_migrations_are_idempotent(float_app):
+    with float_app.app_context():
+        run_migrations()
+        assert run_migrations() == ([], [])
+        assert stored_cents() == [cents for _, cents in AMOUNTS]
+        assert verify_rollups() == []
+
+
+def test_converted_amounts_are_served(float_app):
+    with float_app.app_context():
+        run_migrations()
+    expenses = float_app.test_client().get('/api/expenses?fields=id,amount').get_json()
+    assert sorted(expense['amount'] for expense in expenses) == sorted(cents / 100 for _, cents in AMOUNTS)
@@ -0,0 +1,87 @@
+import os
+import signal
+import time
+
+import pytest
+
+from src.models.ocr_job import JOB_DONE, JOB_FAILED
+from src.routes import ocr as ocr_routes
+from src.utils import ocr_queue as ocr_queue_module
+from src.utils.ocr_queue import OcrJobQueue
+
+
+def fake_ocr(image_data, config):
+    """Stand-in for the OCR pipeline; b'crash' kills the pool worker the way a tesseract segfault does"""
+    if image_data == b'crash':
+        os._exit(1)
+    return {'success': True, 'merchant': image_data.decode()}
+
+
+@pytest.fixture
+def queue(app, monkeypatch):
+    monkeypatch.setattr(ocr_queue_module, '_run_job', fake_ocr)
+    app.config['OCR_MAX_WORKERS'] = 1
+    queue = OcrJobQueue(app)
+    yield queue
+    if queue._executor is not None:
+        queue._executor.shutdown()
+
+
+def run(queue, image_data):
+    job = queue.submit(image_data)
+    return queue.wait(job.id, 60)
+
+
+def test_job_that_crashes_the_pool_is_retried_then_failed(app, queue):
+    with app.app_context():
+        crashed = run(queue, b'crash')
+        assert crashed.status == JOB_FAILED
+        assert crashed.attempts == 3
+
+        job = run(queue, b'corner shop')
+        assert job.status == JOB_DONE
+        assert job.to_dict()['result']['merchant'] == 'corner shop'
+        assert job.attempts == 1
+    assert queue._in_flight == 0
+
+
+def test_killed_worker_is_replaced_for_the_next_job(app, queue):
+    with app.app_context():
+        assert run(queue, b'first').status == JOB_DONE
+        broken = queue._executor
+        for pid in list(broken._processes):
+            os.kill(pid, signal.SIGKILL)
+        # Let the pool notice it lost its worker
+        deadline = time.monotonic() + 10
+        while not broken._broken and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+        job = run(queue, b'second')
+        assert job.status == JOB_DONE
+        assert job.to_dict()['result']['merchant'] == 'second'
+        assert queue._executor is not broken
+    assert queue._in_flight == 0
+
+
+@pytest.fixture
+def ocr_client(app, queue, monkeypatch):
+    monkeypatch.setattr(ocr_routes, 'ocr_queue', queue)
+    return app.test_client()
+
+
+def test_process_receipt_returns_the_result_synchronously(ocr_client):
+    response = ocr_client.post('/api/process-receipt', data=b'corner shop', content_type='image/jpeg')
+    assert response.status_code == 200
+    assert response.get_json()['success'] is True
+    assert response.get_json()['data']['merchant'] == 'corner shop'
+
+
+def test_process_receipt_async_opt_in_returns_the_job(ocr_client):
+    response = ocr_client.post('/api/process-receipt?async=1', data=b'market stall', content_type='image/jpeg')
+    assert response.status_code == 202
+    job_id = response.get_json()['job_id']
+    assert response.headers['Location'].endswith(f'/api/ocr/jobs/{job_id}')
+
+    result = ocr_client.get(f'/api/ocr/jobs/{job_id}/result?wait=60')
+    assert result.status_code == 200
+    assert result.get_json()['data']['merchant'] == 'market stall'
@@ -0,0 +1,78 @@
+"""Check that the read endpoints are served from indexes.
+
+Every SELECT issued while calling the endpoints below is captured through an
+engine event and run again under EXPLAIN QUERY PLAN. Any step that scans the
+expense or rollup tables (or a whole index of them) instead of searching an
+index is reported as a failure.
+"""
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+from src.models.user import db
+
+ENDPOINTS = [
+    '/api/expenses',
+    '/api/expenses?month=2024-01',
+    '/api/expenses?category=Food',
+    '/api/expenses?limit=1',
+    '/api/metrics/monthly',
+    '/api/metrics/category',
+    '/api/metrics/category?month=2024-01',
+    '/api/metrics/trends',
+    '/api/metrics/rolling',
+    '/api/dashboard',
+    '/api/dashboard?include=category&month=2024-01',
+    '/api/expenses/search?q=coffee',
+    '/api/expenses/search?q=gro&sort=date&month=2024-01',
+    '/api/users/summary',
+]
+
+SCANNED_TABLES = ('expense', 'rollup_month', 'rollup_category_month', 'rollup_day', 'rollup_payment_method')
+
+
+@contextmanager
+def capture_statements(engine):
+    """Collect (statement, parameters) for every SELECT (including CTEs) executed on the engine"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+            statements.append((statement, parameters))
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def full_scans(plan_rows):
+    """Return the plan details that walk a whole table or one of its indexes"""
+    return [
+        detail for *_, detail in plan_rows
+        if detail.startswith('SCAN ') and detail.split()[1] in SCANNED_TABLES
+    ]
+
+
+@pytest.mark.parametrize('endpoint', ENDPOINTS)
+def test_read_endpoint_is_served_from_indexes(app, client, endpoint):
+    client.post('/api/expenses', json={
+        'amount': 4.5, 'category': 'Food', 'payment_method': 'Cash', 'date': '2024-01-15', 'description': 'Coffee'
+    })
+    with app.app_context():
+        engine = db.engine
+        with capture_statements(engine) as statements:
+            response = client.get(endpoint)
+        assert response.status_code == 200
+        assert statements
+
+        failures = []
+        with engine.connect() as conn:
+            for statement, parameters in statements:
+                plan = conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).fetchall()
+                scans = full_scans(plan)
+                if scans:
+                    failures.append((statement, scans))
+    assert failures == []
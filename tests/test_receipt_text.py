@@ -0,0 +1,39 @@
+import random
+
+import pytest
+
+from src.utils.receipt_text import CATEGORY_KEYWORDS, DEFAULT_CATEGORY, categorize_many, categorize_text
+
+
+def substring_category(text):
+    """The original categorization: the first category with any keyword as a substring"""
+    text = text.lower()
+    for category, keywords in CATEGORY_KEYWORDS.items():
+        if any(keyword in text for keyword in keywords):
+            return category
+    return DEFAULT_CATEGORY
+
+
+@pytest.mark.parametrize('text, category', [
+    ('shopizza', 'Food & Dining'),      # "shop" overlaps "pizza"
+    ('Gastation bar', 'Food & Dining'),
+    ('busstop', 'Transportation'),
+    ('nothing to see', DEFAULT_CATEGORY),
+])
+def test_overlapping_keywords_keep_category_priority(text, category):
+    assert categorize_text(text) == category
+
+
+def test_matches_substring_scan():
+    rng = random.Random(3)
+    keywords = [keyword for keywords in CATEGORY_KEYWORDS.values() for keyword in keywords]
+    # Glue keyword fragments together so keywords overlap and nest in every way
+    texts = [
+        ''.join(rng.choice(keywords)[rng.randint(0, 3):] for _ in range(rng.randint(1, 4)))
+        for _ in range(5000)
+    ]
+    assert categorize_many(texts) == [substring_category(text) for text in texts]
+
+
+def test_merchant_counts_too():
+    assert categorize_text('milk and eggs', merchant='CITY PHARMACY') == 'Healthcare'
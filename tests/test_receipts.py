@@ -0,0 +1,107 @@
+import io
+import os
+import threading
+
+import pytest
+from PIL import Image
+
+from src.models.receipt_blob import ReceiptBlob
+from src.routes import expense as expense_routes
+from src.models.user import db
+from src.utils.blob_store import blob_store, sniff_image_type
+
+SVG = b'<svg xmlns="http://www.w3.org/2000/svg"><script>alert(document.cookie)</script></svg>'
+
+
+def image_bytes(image_format):
+    buffer = io.BytesIO()
+    Image.new('RGB', (8, 8), 'white').save(buffer, image_format)
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize('image_format, content_type', [
+    ('JPEG', 'image/jpeg'), ('PNG', 'image/png'), ('WEBP', 'image/webp'),
+])
+def test_sniff_image_type(image_format, content_type):
+    assert sniff_image_type(image_bytes(image_format)[:16]) == content_type
+
+
+def test_sniff_heic_brand():
+    assert sniff_image_type(b'\x00\x00\x00\x18ftypheic\x00\x00\x00\x00') == 'image/heic'
+    assert sniff_image_type(b'\x00\x00\x00\x18ftypisom\x00\x00\x00\x00') is None
+
+
+def test_upload_stores_the_sniffed_type_not_the_header(client):
+    response = client.post('/api/receipts', data=image_bytes('PNG'), content_type='image/jpeg')
+    assert response.status_code == 201
+    assert response.get_json()['content_type'] == 'image/png'
+
+
+def test_svg_upload_is_refused(client, app):
+    response = client.post('/api/receipts', data=SVG, content_type='image/svg+xml')
+    assert response.status_code == 415
+
+    response = client.post('/api/receipts', data={'receipt': (io.BytesIO(SVG), 'receipt.png', 'image/png')},
+                           content_type='multipart/form-data')
+    assert response.status_code == 415
+    with app.app_context():
+        assert db.session.query(ReceiptBlob).count() == 0
+
+
+def test_receipt_is_served_sandboxed(client):
+    url = client.post('/api/receipts', data=image_bytes('JPEG'), content_type='image/jpeg').get_json()['url']
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.mimetype == 'image/jpeg'
+    assert response.headers['Content-Security-Policy'] == 'sandbox'
+    assert response.headers['X-Content-Type-Options'] == 'nosniff'
+
+
+def test_legacy_unsniffed_blob_is_served_as_a_download(client, app):
+    url = client.post('/api/receipts', data=image_bytes('JPEG'), content_type='image/jpeg').get_json()['url']
+    with app.app_context():
+        db.session.query(ReceiptBlob).update({'content_type': 'image/svg+xml'})
+        db.session.commit()
+    response = client.get(url)
+    assert response.mimetype == 'application/octet-stream'
+    assert response.headers['Content-Disposition'].startswith('attachment')
+
+
+def finish_cleanup():
+    for thread in threading.enumerate():
+        if thread.name == 'receipt-cleanup':
+            thread.join(10)
+
+
+def expense_with_receipt(client):
+    blob_hash = client.post('/api/receipts', data=image_bytes('JPEG'), content_type='image/jpeg').get_json()['hash']
+    expense = client.post('/api/expenses', json={
+        'amount': 9.5, 'category': 'Food', 'payment_method': 'Cash', 'date': '2024-02-01',
+        'receipt_blob_hash': blob_hash
+    }).get_json()
+    return expense['id'], blob_hash
+
+
+def test_deleting_the_last_expense_removes_the_blob_after_commit(client, app):
+    expense_id, blob_hash = expense_with_receipt(client)
+    assert client.delete(f'/api/expenses/{expense_id}').status_code == 204
+    finish_cleanup()
+    with app.app_context():
+        assert blob_store.get(blob_hash) is None
+        assert not os.path.exists(blob_store.path_for(blob_hash))
+
+
+def test_failed_delete_keeps_the_receipt_file(client, app, monkeypatch):
+    expense_id, blob_hash = expense_with_receipt(client)
+
+    def fail(session, user_ids):
+        raise RuntimeError('commit failed')
+    monkeypatch.setattr(expense_routes, 'bump_data_versions', fail)
+    with pytest.raises(RuntimeError):
+        client.delete(f'/api/expenses/{expense_id}')
+    finish_cleanup()
+
+    with app.app_context():
+        assert blob_store.get(blob_hash).ref_count == 1
+        assert os.path.exists(blob_store.path_for(blob_hash))
+    assert client.get(f'/api/receipts/{blob_hash}').status_code == 200
@@ -0,0 +1,36 @@
+import pytest
+
+from src.routes.analytics import MAX_ROLLING_DAYS
+
+
+def add_expense(client, day, amount=10):
+    response = client.post('/api/expenses', json={'amount': amount, 'category': 'Food', 'payment_method': 'Cash',
+                                                  'date': day})
+    assert response.status_code == 201
+
+
+def test_rolling_average_over_a_range(client):
+    add_expense(client, '2024-03-01', 10)
+    add_expense(client, '2024-03-03', 20)
+    body = client.get('/api/metrics/rolling?window=2&start=2024-03-01&end=2024-03-03').get_json()
+    assert body['total_days'] == 3
+    assert [day['total_amount'] for day in body['daily']] == [10, 0, 20]
+    assert [day['rolling_average'] for day in body['daily']] == [5, 5, 10]
+
+
+@pytest.mark.parametrize('query', [
+    'start=0001-01-01&end=9999-12-31',
+    'start=2000-01-01',
+])
+def test_rolling_average_rejects_long_spans(client, query):
+    add_expense(client, '2024-03-01')
+    response = client.get(f'/api/metrics/rolling?{query}')
+    assert response.status_code == 400
+    assert str(MAX_ROLLING_DAYS) in response.get_json()['error']
+
+
+def test_open_ended_span_follows_the_data(client):
+    add_expense(client, '0001-01-01')
+    add_expense(client, '2024-03-01')
+    assert client.get('/api/metrics/rolling').status_code == 400
+    assert client.get('/api/metrics/rolling?start=2024-01-01').status_code == 200
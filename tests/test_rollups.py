@@ -0,0 +1,105 @@
+import pytest
+
+from src.models.rollup import ROLLUP_MODELS, rebuild_rollups, verify_rollups
+from src.models.user import User, db
+
+
+def assert_rollups_current(app):
+    """Rollups match a full recompute, with no emptied buckets left behind"""
+    with app.app_context():
+        assert verify_rollups() == []
+        for model in ROLLUP_MODELS:
+            assert db.session.query(model).filter(model.transaction_count <= 0).count() == 0
+        stored = {model: sorted(map(tuple, db.session.execute(db.select(model.__table__)))) for model in ROLLUP_MODELS}
+        rebuild_rollups()
+        rebuilt = {model: sorted(map(tuple, db.session.execute(db.select(model.__table__)))) for model in ROLLUP_MODELS}
+        assert stored == rebuilt
+
+
+def create(client, amount, day, category='Food', payment_method='Cash', user_id=1):
+    response = client.post('/api/expenses', json={
+        'amount': amount, 'category': category, 'payment_method': payment_method, 'date': day, 'user_id': user_id
+    })
+    assert response.status_code == 201
+    return response.get_json()['id']
+
+
+@pytest.fixture
+def expenses(app, client):
+    with app.app_context():
+        db.session.add(User(id=2, username='other', email='other@example.com'))
+        db.session.commit()
+    return [
+        create(client, 12.5, '2024-01-05'),
+        create(client, 7.25, '2024-01-05', payment_method='Card'),
+        create(client, 30, '2024-01-20', category='Travel'),
+        create(client, 4.1, '2024-02-03'),
+        create(client, 99.99, '2024-01-05', user_id=2),
+    ]
+
+
+def test_create(app, expenses):
+    assert_rollups_current(app)
+
+
+@pytest.mark.parametrize('changes', [
+    {'amount': 15},
+    {'category': 'Shopping'},
+    {'payment_method': 'Card'},
+    {'date': '2024-03-01'},
+    {'description': 'Lunch'},                       # no rollup field changes
+    {'amount': 1, 'category': 'Travel', 'date': '2024-01-20', 'payment_method': 'Card'},
+])
+def test_update(app, client, expenses, changes):
+    assert client.put(f'/api/expenses/{expenses[0]}', json=changes).status_code == 200
+    assert_rollups_current(app)
+
+
+def test_delete_empties_buckets(app, client, expenses):
+    # The only Travel and the only February expense: their buckets must go
+    for expense_id in (expenses[2], expenses[3]):
+        assert client.delete(f'/api/expenses/{expense_id}').status_code == 204
+    assert_rollups_current(app)
+    months = client.get('/api/metrics/monthly').get_json()['monthly_summary']
+    assert [month['period'] for month in months] == ['2024-01']
+
+
+def test_delete_everything(app, client, expenses):
+    for expense_id in expenses:
+        assert client.delete(f'/api/expenses/{expense_id}').status_code == 204
+    assert_rollups_current(app)
+
+
+@pytest.mark.parametrize('body', [
+    {'ids': [1, 2], 'set': {'category': 'Travel'}},
+    {'ids': [1, 3, 4], 'set': {'amount': 5, 'date': '2024-02-03'}},
+    {'filter': {'month': '2024-01'}, 'set': {'payment_method': 'Bank Transfer'}},
+    {'filter': {'category': 'Food'}, 'set': {'category': 'Groceries', 'date': '2023-12-31'}},
+])
+def test_batch_update(app, client, expenses, body):
+    assert client.post('/api/expenses/batch-update', json=body).get_json()['matched'] > 0
+    assert_rollups_current(app)
+
+
+@pytest.mark.parametrize('body', [
+    {'ids': [1, 3]},
+    {'filter': {'month': '2024-01'}},
+    {'filter': {'category': 'Food', 'month': '2024-02'}},
+])
+def test_batch_delete(app, client, expenses, body):
+    assert client.post('/api/expenses/batch-delete', json=body).get_json()['deleted'] > 0
+    assert_rollups_current(app)
+
+
+def test_import(app, client, expenses):
+    body = '\n'.join([
+        '{"amount": 3, "category": "Food", "payment_method": "Cash", "date": "2024-01-05"}',
+        '{"amount": 8, "category": "Books", "payment_method": "Card", "date": "2024-04-01"}',
+    ])
+    assert client.post('/api/expenses/import', data=body, content_type='application/x-ndjson').get_json()['imported'] == 2
+    assert_rollups_current(app)
+
+
+def test_delete_user(app, client, expenses):
+    assert client.delete('/api/users/2').status_code == 204
+    assert_rollups_current(app)
@@ -0,0 +1,31 @@
+import pytest
+
+from src.models.user import User, db
+
+
+@pytest.fixture
+def users(app):
+    with app.app_context():
+        db.session.add_all([User(id=n, username=f'user{n}', email=f'user{n}@example.com') for n in (2, 3)])
+        db.session.commit()
+
+
+def test_summary_pages_follow_the_cursor(client, users):
+    client.post('/api/expenses', json={'amount': 12.5, 'category': 'Food', 'payment_method': 'Cash',
+                                       'date': '2024-01-05'})
+    first = client.get('/api/users/summary?limit=2')
+    assert [user['id'] for user in first.get_json()] == [1, 2]
+    assert first.get_json()[0]['expense_count'] == 1
+    assert first.get_json()[0]['total_amount_cents'] == 1250
+    assert first.headers['X-Next-Cursor'] == '2'
+
+    second = client.get('/api/users/summary?limit=2&cursor=2')
+    assert [user['id'] for user in second.get_json()] == [3]
+    assert 'X-Next-Cursor' not in second.headers
+
+
+@pytest.mark.parametrize('cursor', ['abc', '-1', '1.5', '²'])
+def test_summary_rejects_malformed_cursor(client, cursor):
+    response = client.get(f'/api/users/summary?cursor={cursor}')
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'Invalid cursor'}